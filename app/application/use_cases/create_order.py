@@ -27,10 +27,11 @@ class CreateOrderUseCase:
         await self.order_repo.session.flush()
 
         # 2. Получаем цену из конфига (или дефолтную)
-        product_config = await self.config_repo.get_product_config("poem")
+        snapshot = await self.config_repo.get_snapshot()
+        product_config = snapshot.product("poem")
         price = 4900
-        if product_config and "price" in product_config.value_json:
-            price = product_config.value_json["price"]
+        if product_config and "price" in product_config:
+            price = product_config["price"]
 
         # 3. Создаем этап "Стих"
         stage = OrderStage(
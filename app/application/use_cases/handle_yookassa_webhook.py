@@ -2,10 +2,13 @@ from uuid import UUID
 import structlog
 from typing import Any, Dict
 
-from app.domain.enums import PaymentStatus, OrderStageStatus, StageType, OrderStatus
+from app.domain.enums import PaymentStatus, OrderStageStatus, OrderStatus
 from app.infra.db.repositories.payment_repo import PaymentRepo
 from app.infra.db.repositories.stage_repo import StageRepo
 from app.infra.db.repositories.order_repo import OrderRepo
+from app.infra.db.repositories.outbox_repo import OutboxRepo
+from app.infra.db.models import User
+from app.infra.queue.scheduler import STAGE_TASK_NAMES, SchedulingLane
 
 logger = structlog.get_logger()
 
@@ -74,13 +77,16 @@ class HandleYookassaWebhookUseCase:
         if stage:
             stage.status = OrderStageStatus.PAID
             logger.info("stage_marked_as_paid", stage_id=stage.id, order_id=stage.order_id)
-            
-            # Постановка задачи в Celery для генерации
-            if stage.stage_type == StageType.POEM:
-                from app.infra.queue.tasks import generate_poem_task
-                generate_poem_task.delay(str(stage.id))
+
+            # Постановка генерации пишется в outbox в той же транзакции, что и статус PAID:
+            # без оплаты задачи не будет, а после оплаты она не потеряется
+            if order and stage.stage_type in STAGE_TASK_NAMES:
+                user = await self.payment_repo.session.get(User, order.user_id)
+                await OutboxRepo(self.payment_repo.session).add_stage_enqueue(
+                    stage.stage_type, stage.id, user.telegram_id, SchedulingLane.PAID
+                )
                 logger.info("generation_task_enqueued", stage_id=stage.id, stage_type=stage.stage_type)
-        
+
         await self.payment_repo.session.commit()
         logger.info("payment_success_handled", yookassa_id=yookassa_id)
 
@@ -6,6 +6,7 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, BufferedIn
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.bot.texts.ru import MY_ORDERS_EMPTY_TEXT, MY_ORDERS_HEADER_TEXT, ORDER_INFO_TEMPLATE
+from app.infra.db.repositories.artifact_repo import ArtifactRepo
 from app.infra.db.repositories.order_repo import OrderRepo
 from app.infra.db.repositories.user_repo import UserRepo
 from app.domain.enums import OrderStageStatus, ArtifactType
@@ -93,7 +94,7 @@ async def process_download_poem(callback: types.CallbackQuery, session: AsyncSes
     poem_text = None
     for art in order.artifacts:
         if art.type == ArtifactType.TEXT:
-            poem_text = art.storage_key
+            poem_text = await ArtifactRepo(session).get_text(art)
             break
 
     if not poem_text:
@@ -1,56 +1,63 @@
 import logging
+from typing import Optional
 from uuid import UUID
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
-from app.domain.enums import OrderStageStatus
+from app.domain.enums import OrderStageStatus, StageType
 from app.bot.fsm.states import PoemFlow
 from app.bot.texts.ru import (
     POEM_OCCASION_TEXT, POEM_RECIPIENT_TEXT, POEM_DETAILS_TEXT,
     CONFIRM_ORDER_TEXT, AWAIT_PAYMENT_TEXT, CANCELLED_TEXT,
-    AWAIT_GENERATION_TEXT, GEN_SUCCESS_TEXT, UPSELL_VOICE_TEXT
+    AWAIT_GENERATION_TEXT
 )
 from app.bot.keyboards.common import get_cancel_keyboard, get_confirm_keyboard, get_main_menu_keyboard
 from app.bot.keyboards.payments import get_payment_keyboard
 from app.application.use_cases.create_order import CreateOrderUseCase
 from app.application.use_cases.start_payment import StartPaymentUseCase
+from app.infra.db.repositories.artifact_repo import ArtifactRepo
 from app.infra.db.repositories.order_repo import OrderRepo
 from app.infra.db.repositories.stage_repo import StageRepo
 from app.infra.db.repositories.config_repo import ConfigRepo
 from app.infra.db.repositories.payment_repo import PaymentRepo
 from app.infra.db.repositories.user_repo import UserRepo
 from app.infra.payments.yookassa import YooKassaClient
-from app.infra.db.session import async_session_factory
-from app.infra.db.models import Artifact
+from app.infra.db.repositories.outbox_repo import OutboxRepo
+from app.infra.queue.scheduler import SchedulingLane
+from app.infra.events.stage_events import StageCompletionEvent, StageEventType
+from app.bot.services.stage_events import deliver_stage_completion, run_stage_events_listener
 import asyncio
-from aiogram import Bot
+from aiogram import Bot, Dispatcher
 
 router = Router()
 logger = logging.getLogger(__name__)
 
-async def poll_for_generation_result(bot: Bot, user_id: int, stage_id: UUID, session_pool, state: FSMContext):
-    logger.info(f"Starting background polling for stage {stage_id}")
-    for _ in range(15):
-        await asyncio.sleep(2)
-        async with session_pool() as session:
-            result = await session.execute(
-                select(Artifact).where(Artifact.stage_id == stage_id)
-            )
-            artifact = result.scalars().first()
-            
-            if artifact:
-                logger.info(f"Artifact found for stage {stage_id} in background polling")
-                await state.set_state(PoemFlow.upsell_offer)
-                await bot.send_message(
-                    chat_id=user_id,
-                    text=GEN_SUCCESS_TEXT.format(poem_text=artifact.storage_key),
-                    reply_markup=get_main_menu_keyboard()
-                )
-                await bot.send_message(chat_id=user_id, text=UPSELL_VOICE_TEXT)
-                return
-    logger.info(f"Background polling finished for stage {stage_id} without result")
+# Ссылка держит задачу от сборщика мусора и нужна, чтобы остановить её при выключении
+_stage_events_task: Optional[asyncio.Task] = None
+
+
+@router.startup()
+async def start_stage_events_listener(bot: Bot, dispatcher: Dispatcher):
+    # Один подписчик на процесс бота: черновики и готовые стихи приходят
+    # событиями от воркера и сразу раздаются по чатам
+    global _stage_events_task
+    _stage_events_task = asyncio.create_task(run_stage_events_listener(bot, dispatcher))
+
+
+@router.shutdown()
+async def stop_stage_events_listener():
+    global _stage_events_task
+    if _stage_events_task is None:
+        return
+    _stage_events_task.cancel()
+    try:
+        await _stage_events_task
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        logger.warning(f"Stage events listener stopped with error: {e}")
+    _stage_events_task = None
 
 @router.message(F.text == "📝 Заказать стих")
 async def start_poem_flow(message: types.Message, state: FSMContext):
@@ -114,21 +121,13 @@ async def confirm_order(callback: types.CallbackQuery, state: FSMContext, sessio
         # ТЕСТОВЫЙ ЗАПУСК: Пропускаем оплату и сразу запускаем генерацию
         logger.info(f"TEST MODE: Skipping payment for stage {stage.id} and starting generation...")
         
-        # Обновляем статус этапа на PAID (имитация оплаты)
+        # Обновляем статус этапа на PAID (имитация оплаты). Постановка генерации
+        # пишется в outbox в той же транзакции, в планировщик её передаёт релей.
         stage.status = OrderStageStatus.PAID
+        await OutboxRepo(session).add_stage_enqueue(StageType.POEM, stage.id, user.telegram_id, SchedulingLane.PAID)
         await session.commit()
         logger.info(f"Order created and paid: {stage.order_id}, stage: {stage.id}")
         
-        # Запускаем задачу генерации с защитой от зависания, если Redis недоступен
-        try:
-            from app.infra.queue.tasks import generate_poem_task
-            generate_poem_task.apply_async(args=[str(stage.id)], connect_timeout=2)
-            logger.info(f"Task sent to queue for stage {stage.id}")
-        except Exception as e:
-            logger.error(f"Failed to send task to Celery: {e}. Is Redis running?")
-            # Мы не прерываем процесс, так как заказ уже создан и помечен как оплаченный.
-            # В реальном приложении здесь можно было бы уведомить админа.
-        
         await state.update_data(order_id=str(stage.order_id), stage_id=str(stage.id))
         await state.set_state(PoemFlow.await_generation)
         
@@ -148,17 +147,6 @@ async def confirm_order(callback: types.CallbackQuery, state: FSMContext, sessio
             ])
         )
         logger.info(f"Bot is now waiting for generation results for stage {stage.id}.")
-        
-        # Start background polling
-        asyncio.create_task(
-            poll_for_generation_result(
-                bot=callback.bot,
-                user_id=callback.from_user.id,
-                stage_id=stage.id,
-                session_pool=async_session_factory,
-                state=state
-            )
-        )
             
         await callback.answer()
     except Exception as e:
@@ -193,45 +181,40 @@ async def check_payment_callback(callback: types.CallbackQuery, state: FSMContex
                 [types.InlineKeyboardButton(text="🔄 Проверить готовность", callback_data="check_gen")]
             ])
         )
-        
-        # Start background polling
-        asyncio.create_task(
-            poll_for_generation_result(
-                bot=callback.bot,
-                user_id=callback.from_user.id,
-                stage_id=stage_id,
-                session_pool=async_session_factory,
-                state=state
-            )
-        )
     else:
         await callback.answer("Оплата еще не подтверждена. Попробуйте через минуту.", show_alert=True)
 
-async def check_generation_status(message: types.Message, state: FSMContext, session: AsyncSession):
+async def check_generation_status(
+    message: types.Message, state: FSMContext, session: AsyncSession, bot: Bot, dispatcher: Dispatcher
+):
     logger.info("check_generation_status called")
+    # Обычно готовый стих приходит событием от воркера (run_stage_events_listener) и переводит
+    # состояние в upsell_offer. Публикация события может не дойти — тогда стих уже лежит
+    # в базе, и кнопка доставляет его сама
     data = await state.get_data()
-    stage_id = UUID(data['stage_id'])
-    
-    result = await session.execute(
-        select(Artifact).where(Artifact.stage_id == stage_id)
-    )
-    artifact = result.scalars().first()
-    
-    if artifact:
-        await state.set_state(PoemFlow.upsell_offer)
-        await message.answer(
-            GEN_SUCCESS_TEXT.format(poem_text=artifact.storage_key), # storage_key stores text for POEM artifact type in Итерация 3
-            reply_markup=get_main_menu_keyboard()
-        )
-        await message.answer(UPSELL_VOICE_TEXT)
-    else:
-        # Повторим проверку через 10 секунд (в aiogram это обычно делается через scheduler, но тут для простоты)
-        await message.answer("Стихотворение еще генерируется... Нажмите 'Проверить готовность'",
-                           reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[
-                               [types.InlineKeyboardButton(text="🔄 Проверить готовность", callback_data="check_gen")]
-                           ]))
+    if data.get("stage_id"):
+        artifact_repo = ArtifactRepo(session)
+        artifact = await artifact_repo.get_stage_text_artifact(UUID(data["stage_id"]))
+        text = await artifact_repo.get_text(artifact) if artifact else None
+        if text:
+            await deliver_stage_completion(bot, dispatcher, StageCompletionEvent(
+                event=StageEventType.COMPLETED,
+                stage_id=data["stage_id"],
+                order_id=str(artifact.order_id),
+                stage_type=StageType.POEM,
+                telegram_id=message.chat.id,
+                text=text,
+            ))
+            return
+
+    await message.answer("Стихотворение еще генерируется... Пришлю его сюда, как только будет готово",
+                       reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[
+                           [types.InlineKeyboardButton(text="🔄 Проверить готовность", callback_data="check_gen")]
+                       ]))
 
 @router.callback_query(F.data == "check_gen", PoemFlow.await_generation)
-async def check_gen_callback(callback: types.CallbackQuery, state: FSMContext, session: AsyncSession):
-    await check_generation_status(callback.message, state, session)
+async def check_gen_callback(
+    callback: types.CallbackQuery, state: FSMContext, session: AsyncSession, bot: Bot, dispatcher: Dispatcher
+):
+    await check_generation_status(callback.message, state, session, bot, dispatcher)
     await callback.answer()
\ No newline at end of file
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+from app.bot.texts.ru import GEN_STREAMING_TEXT
+from app.infra.config.settings import settings
+from app.infra.events.stage_events import StagePartialEvent
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Сколько помнить завершённые стадии: черновики, опоздавшие после итогового текста,
+# отбрасываются. Запоздание pub/sub — секунды, запас с лихвой
+FINISHED_TTL = 600.0
+FINISHED_MAX = 10000
+
+
+def _fit(text: str) -> str:
+    if len(text) <= TELEGRAM_MESSAGE_LIMIT:
+        return text
+    return text[: TELEGRAM_MESSAGE_LIMIT - 1] + "…"
+
+
+@dataclass
+class _LiveMessage:
+    chat_id: int
+    message_id: Optional[int] = None
+    shown_text: str = ""
+    pending_text: str = ""
+    last_edit: float = 0.0
+    flush_task: Optional[asyncio.Task] = None
+    closed: bool = False
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class LivePoemMessages:
+    """
+    Черновики стихов в чатах: на каждую стадию одно сообщение, которое бот
+    редактирует по мере поступления текста от воркера.
+
+    Правки одного сообщения идут не чаще edit_interval, промежуточные обновления
+    схлопываются в последнее. Итоговый текст показывается через finish() по событию
+    завершения стадии, которое воркер отправляет после проверки контент-политикой.
+    """
+
+    def __init__(self, edit_interval: float):
+        self.edit_interval = edit_interval
+        self._messages: Dict[str, _LiveMessage] = {}
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+
+    def handle(self, bot: Bot, event: StagePartialEvent) -> None:
+        if self._is_finished(event.stage_id):
+            return
+        msg = self._messages.get(event.stage_id)
+        if msg is None:
+            msg = self._messages[event.stage_id] = _LiveMessage(chat_id=event.telegram_id)
+
+        msg.pending_text = event.text
+        if msg.flush_task is None or msg.flush_task.done():
+            msg.flush_task = asyncio.create_task(self._flush_later(bot, msg))
+
+    async def finish(self, bot: Bot, stage_id: str, chat_id: int, text: str) -> None:
+        """
+        Показывает итоговый текст стадии: правит черновик, если он был,
+        иначе отправляет новое сообщение.
+        """
+        self._mark_finished(stage_id)
+        msg = self._messages.pop(stage_id, None)
+        if msg is None:
+            msg = _LiveMessage(chat_id=chat_id)
+        # Отложенная правка черновика не должна перезаписать итоговый текст
+        msg.closed = True
+        await self._render(bot, msg, text)
+
+    def _mark_finished(self, stage_id: str) -> None:
+        now = time.monotonic()
+        self._finished[stage_id] = now
+        self._finished.move_to_end(stage_id)
+        while self._finished:
+            oldest_id, finished_at = next(iter(self._finished.items()))
+            if len(self._finished) <= FINISHED_MAX and now - finished_at < FINISHED_TTL:
+                break
+            del self._finished[oldest_id]
+
+    def _is_finished(self, stage_id: str) -> bool:
+        finished_at = self._finished.get(stage_id)
+        return finished_at is not None and time.monotonic() - finished_at < FINISHED_TTL
+
+    async def _flush_later(self, bot: Bot, msg: _LiveMessage) -> None:
+        delay = msg.last_edit + self.edit_interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if not msg.closed:
+            await self._render(bot, msg, GEN_STREAMING_TEXT.format(poem_text=msg.pending_text))
+
+    async def _render(self, bot: Bot, msg: _LiveMessage, text: str) -> None:
+        text = _fit(text)
+        async with msg.lock:
+            if text == msg.shown_text:
+                return
+            delay = msg.last_edit + self.edit_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            for _ in range(3):
+                try:
+                    if msg.message_id is None:
+                        sent = await bot.send_message(chat_id=msg.chat_id, text=text)
+                        msg.message_id = sent.message_id
+                    else:
+                        await bot.edit_message_text(text=text, chat_id=msg.chat_id, message_id=msg.message_id)
+                    break
+                except TelegramRetryAfter as e:
+                    await asyncio.sleep(e.retry_after)
+                except TelegramBadRequest as e:
+                    if "message is not modified" not in str(e):
+                        logger.warning(f"Failed to update live poem message in chat {msg.chat_id}: {e}")
+                    break
+                except Exception as e:
+                    logger.warning(f"Failed to update live poem message in chat {msg.chat_id}: {e}")
+                    break
+            msg.shown_text = text
+            msg.last_edit = time.monotonic()
+
+
+live_poems = LivePoemMessages(edit_interval=settings.BOT_LIVE_EDIT_INTERVAL)
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+
+from app.bot.fsm.states import PoemFlow
+from app.bot.keyboards.common import get_main_menu_keyboard
+from app.bot.services.live_poem import live_poems
+from app.bot.texts.ru import GEN_FAILED_TEXT, GEN_SUCCESS_TEXT, UPSELL_VOICE_TEXT
+from app.domain.enums import StageType
+from app.infra.cache.redis import get_redis
+from app.infra.events.stage_events import (
+    StageCompletionConsumer,
+    StageCompletionEvent,
+    StageEventType,
+    iter_stage_partials,
+)
+
+logger = logging.getLogger(__name__)
+
+# Отметка о доставке защищает от повторной отправки, если событие
+# перечитано после рестарта бота до XACK
+DELIVERED_KEY = "stage_events:delivered:{stage_id}"
+DELIVERED_TTL = 24 * 60 * 60
+
+
+async def run_stage_events_listener(bot: Bot, dispatcher: Dispatcher) -> None:
+    """
+    Единственный подписчик на события стадий в процессе бота: раздаёт по чатам
+    промежуточный текст и результаты стадий.
+    """
+    await asyncio.gather(_listen_partials(bot), _listen_completions(bot, dispatcher))
+
+
+async def _listen_partials(bot: Bot) -> None:
+    while True:
+        try:
+            async for event in iter_stage_partials():
+                live_poems.handle(bot, event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Stage partials listener error, reconnecting: {e}")
+            await asyncio.sleep(2)
+
+
+async def _listen_completions(bot: Bot, dispatcher: Dispatcher) -> None:
+    consumer = StageCompletionConsumer(group="bot")
+
+    async def _handle(event: StageCompletionEvent) -> None:
+        await deliver_stage_completion(bot, dispatcher, event)
+
+    while True:
+        try:
+            await consumer.run(_handle)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Stage completion listener error, reconnecting: {e}")
+            await asyncio.sleep(2)
+
+
+async def deliver_stage_completion(bot: Bot, dispatcher: Dispatcher, event: StageCompletionEvent) -> None:
+    if event.stage_type != StageType.POEM:
+        logger.info(f"Skipping {event.event} for {event.stage_type} stage {event.stage_id}: no chat delivery")
+        return
+
+    redis = get_redis()
+    delivered_key = DELIVERED_KEY.format(stage_id=event.stage_id)
+    if await redis.exists(delivered_key):
+        return
+
+    if event.event == StageEventType.FAILED:
+        await live_poems.finish(bot, event.stage_id, event.telegram_id, GEN_FAILED_TEXT)
+    else:
+        await live_poems.finish(
+            bot, event.stage_id, event.telegram_id, GEN_SUCCESS_TEXT.format(poem_text=event.text)
+        )
+        await bot.send_message(
+            chat_id=event.telegram_id, text=UPSELL_VOICE_TEXT, reply_markup=get_main_menu_keyboard()
+        )
+
+        # Переводим в upsell только если пользователь всё ещё ждёт этот стих
+        state = FSMContext(
+            storage=dispatcher.storage,
+            key=StorageKey(bot_id=bot.id, chat_id=event.telegram_id, user_id=event.telegram_id),
+        )
+        if await state.get_state() == PoemFlow.await_generation.state:
+            await state.set_state(PoemFlow.upsell_offer)
+
+    await redis.set(delivered_key, 1, ex=DELIVERED_TTL)
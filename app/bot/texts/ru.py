@@ -28,6 +28,10 @@ AWAIT_GENERATION_TEXT = "⏳ Магия началась! Я пишу ваш с
 
 GEN_SUCCESS_TEXT = "✨ Ваш стих готов!\n\n{poem_text}"
 
+GEN_STREAMING_TEXT = "✍️ Пишу ваш стих...\n\n{poem_text}"
+
+GEN_FAILED_TEXT = "😔 Не удалось написать стих. Мы уже разбираемся — попробуйте позже или напишите в поддержку."
+
 UPSELL_VOICE_TEXT = (
     "🎤 Стих — это круто, но как насчет того, чтобы я его озвучил?\n\n"
     "Это добавит эмоций вашему подарку!"
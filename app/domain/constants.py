@@ -0,0 +1,9 @@
+from app.domain.enums import ProviderKind, StageType
+
+# Какие провайдеры допустимы для каждого типа этапа
+ALLOWED_PROVIDERS = {
+    StageType.POEM: [ProviderKind.YANDEX_GPT, ProviderKind.GEMINI, ProviderKind.OPENAI],
+    StageType.VOICE: [ProviderKind.SPEECHKIT],
+    StageType.SONG: [ProviderKind.SUNO],
+    StageType.CLIP: [ProviderKind.PIKA]
+}
@@ -10,6 +10,7 @@ class OrderStatus(StrEnum):
 class OrderStageStatus(StrEnum):
     PENDING = auto()
     PAID = auto()
+    QUEUED = auto()
     PROCESSING = auto()
     COMPLETED = auto()
     FAILED = auto()
@@ -44,4 +45,8 @@ class StageType(StrEnum):
     POEM = auto()
     VOICE = auto()
     SONG = auto()
-    CLIP = auto()
\ No newline at end of file
+    CLIP = auto()
+
+class RoutingMode(StrEnum):
+    MANUAL = auto()  # всегда провайдер из конфигурации, остальные — только для хеджирования
+    ADAPTIVE = auto()  # провайдер выбирается по задержке и доле ошибок
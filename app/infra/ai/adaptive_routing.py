@@ -0,0 +1,252 @@
+import logging
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from app.domain.enums import StageType
+from app.infra.cache.redis import get_redis
+from app.infra.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_FIELDS = ("latency", "errors", "samples", "open_until", "updated")
+
+# Учёт исхода запроса: EWMA задержки (только успешные) и доли ошибок, счётчик ошибок подряд.
+# Автомат размыкается после серии ошибок подряд или при высокой доле ошибок на достаточной
+# выборке и остаётся разомкнутым cooldown мс. Успешный запрос (пробный после паузы) замыкает
+# автомат и сбрасывает долю ошибок: провайдер начинает с чистого листа.
+_RECORD_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'latency', 'errors', 'samples', 'failures', 'open_until')
+local ok = ARGV[1] == '1'
+local alpha = tonumber(ARGV[3])
+local errors = tonumber(state[2]) or 0
+local samples = (tonumber(state[3]) or 0) + 1
+local failures = 0
+local open_until = tonumber(state[5]) or 0
+if ok then
+    local sample = tonumber(ARGV[2])
+    local latency = tonumber(state[1])
+    latency = latency and (latency + alpha * (sample - latency)) or sample
+    if open_until > 0 then
+        errors = 0
+        open_until = 0
+    else
+        errors = errors * (1 - alpha)
+    end
+    redis.call('HSET', KEYS[1], 'latency', tostring(latency))
+else
+    errors = errors + alpha * (1 - errors)
+    failures = (tonumber(state[4]) or 0) + 1
+    if failures >= tonumber(ARGV[4]) or (samples >= tonumber(ARGV[6]) and errors >= tonumber(ARGV[5])) then
+        open_until = now + tonumber(ARGV[7])
+    end
+end
+redis.call('HSET', KEYS[1], 'errors', tostring(errors), 'samples', samples, 'failures', failures,
+    'open_until', open_until, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], ARGV[8])
+redis.call('SADD', KEYS[2], ARGV[9])
+redis.call('PEXPIRE', KEYS[2], ARGV[8])
+return open_until
+"""
+
+
+class BreakerState(StrEnum):
+    CLOSED = "closed"
+    OPEN = "open"  # кандидат не получает этапы до конца паузы
+    HALF_OPEN = "half_open"  # пауза кончилась, ждём пробного запроса
+
+
+@dataclass(frozen=True)
+class RouteStats:
+    route_key: str
+    latency: Optional[float]  # сек, EWMA успешных запросов
+    error_rate: float  # EWMA доли ошибок
+    samples: int
+    state: BreakerState
+    open_until: int  # мс по часам Redis
+    updated: int  # мс по часам Redis, 0 — данных нет
+
+
+class AdaptiveRouter:
+    """
+    Выбор провайдера по живой статистике, общей для всех воркеров (Redis).
+
+    По каждому кандидату (провайдер и модель) копятся EWMA задержки и доли ошибок.
+    Этап получает кандидата с наименьшей стоимостью
+    latency_weight * задержка + error_weight * доля ошибок; при равенстве сохраняется
+    порядок из конфигурации. Серия ошибок размыкает автомат: кандидат уходит в конец
+    списка (его достанет только хеджирование, если остальные не ответят), а по
+    окончании паузы получает один пробный этап. Кандидаты без свежих данных так же
+    раз в probe_interval получают пробный этап — иначе худший по статистике провайдер
+    никогда не смог бы показать, что ему стало лучше.
+    """
+
+    prefix = "route:"
+
+    def __init__(
+        self,
+        alpha: float,
+        latency_weight: float,
+        error_weight: float,
+        default_latency: float,
+        breaker_failures: int,
+        breaker_error_rate: float,
+        breaker_min_samples: int,
+        breaker_cooldown: float,
+        probe_interval: float,
+        stats_ttl: float,
+    ):
+        self.alpha = alpha
+        self.latency_weight = latency_weight
+        self.error_weight = error_weight
+        self.default_latency = default_latency
+        self.breaker_failures = breaker_failures
+        self.breaker_error_rate = breaker_error_rate
+        self.breaker_min_samples = breaker_min_samples
+        self.breaker_cooldown = breaker_cooldown
+        self.probe_interval = probe_interval
+        self.stats_ttl = stats_ttl
+
+    def _stats_key(self, stage_type: StageType, route_key: str) -> str:
+        return f"{self.prefix}{stage_type}:{route_key}"
+
+    def _members_key(self, stage_type: StageType) -> str:
+        return f"{self.prefix}{stage_type}:members"
+
+    async def record(self, stage_type: StageType, route_key: str, ok: bool, latency: float = 0.0) -> None:
+        """
+        Учитывает исход запроса к кандидату. Ошибки Redis не пробрасываются.
+        """
+        try:
+            open_until = await get_redis().eval(
+                _RECORD_SCRIPT,
+                2,
+                self._stats_key(stage_type, route_key),
+                self._members_key(stage_type),
+                1 if ok else 0,
+                latency,
+                self.alpha,
+                self.breaker_failures,
+                self.breaker_error_rate,
+                self.breaker_min_samples,
+                int(self.breaker_cooldown * 1000),
+                int(self.stats_ttl * 1000),
+                route_key,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record routing stats for {route_key}: {e}")
+            return
+        if not ok and int(open_until):
+            logger.warning(f"Circuit breaker for {stage_type} provider {route_key} is open")
+
+    async def _read(self, stage_type: StageType, route_keys: Sequence[str]) -> Tuple[List[RouteStats], int]:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.time()
+        for route_key in route_keys:
+            pipe.hmget(self._stats_key(stage_type, route_key), *_FIELDS)
+        results = await pipe.execute()
+        now_sec, now_usec = results[0]
+        now = now_sec * 1000 + now_usec // 1000
+
+        stats = []
+        for route_key, (latency, errors, samples, open_until, updated) in zip(route_keys, results[1:]):
+            open_until = int(open_until or 0)
+            if open_until > now:
+                state = BreakerState.OPEN
+            elif open_until:
+                state = BreakerState.HALF_OPEN
+            else:
+                state = BreakerState.CLOSED
+            stats.append(
+                RouteStats(
+                    route_key=route_key,
+                    latency=float(latency) if latency is not None else None,
+                    error_rate=float(errors or 0),
+                    samples=int(samples or 0),
+                    state=state,
+                    open_until=open_until,
+                    updated=int(updated or 0),
+                )
+            )
+        return stats, now
+
+    def score(self, stats: RouteStats) -> float:
+        latency = stats.latency if stats.latency is not None else self.default_latency
+        return self.latency_weight * latency + self.error_weight * stats.error_rate
+
+    async def order(self, stage_type: StageType, candidates: Sequence[T], route_key: Callable[[T], str]) -> List[T]:
+        """
+        Возвращает кандидатов в порядке обращения: лучший по стоимости (или пробный) первым,
+        разомкнутые — в конце. Без Redis порядок из конфигурации не меняется.
+        """
+        if len(candidates) < 2:
+            return list(candidates)
+        try:
+            stats, now = await self._read(stage_type, [route_key(c) for c in candidates])
+        except Exception as e:
+            logger.warning(f"Adaptive routing unavailable, keeping configured order: {e}")
+            return list(candidates)
+
+        ranked = sorted(
+            (
+                (self.score(s), index, candidate, s)
+                for index, (candidate, s) in enumerate(zip(candidates, stats))
+                if s.state != BreakerState.OPEN
+            ),
+            key=lambda item: item[:2],
+        )
+        broken = [c for c, s in zip(candidates, stats) if s.state == BreakerState.OPEN]
+        ordered = [candidate for _, _, candidate, _ in ranked]
+
+        for _, _, candidate, s in ranked[1:]:
+            stale = s.updated < now - self.probe_interval * 1000
+            if s.state != BreakerState.HALF_OPEN and not stale:
+                continue
+            # Один пробный этап на кандидата за интервал — на все воркеры
+            interval = self.breaker_cooldown if s.state == BreakerState.HALF_OPEN else self.probe_interval
+            try:
+                acquired = await get_redis().set(
+                    f"{self._stats_key(stage_type, s.route_key)}:probe", 1, nx=True, px=int(interval * 1000)
+                )
+            except Exception:
+                break
+            if acquired:
+                logger.info(f"Probing {stage_type} provider {s.route_key} ({s.state})")
+                ordered.remove(candidate)
+                ordered.insert(0, candidate)
+                break
+
+        if not ordered:
+            # Разомкнуты все — идём в порядке конфигурации, лучше попытка, чем отказ
+            return list(candidates)
+        return ordered + broken
+
+    async def snapshot(self, stage_type: StageType) -> List[RouteStats]:
+        """
+        Статистика всех кандидатов типа этапа — для админки.
+        """
+        try:
+            route_keys = sorted(await get_redis().smembers(self._members_key(stage_type)))
+            stats, _ = await self._read(stage_type, route_keys)
+        except Exception as e:
+            logger.warning(f"Failed to read routing stats: {e}")
+            return []
+        return sorted(stats, key=self.score)
+
+
+adaptive_router = AdaptiveRouter(
+    alpha=settings.ROUTING_EWMA_ALPHA,
+    latency_weight=settings.ROUTING_LATENCY_WEIGHT,
+    error_weight=settings.ROUTING_ERROR_WEIGHT,
+    default_latency=settings.ROUTING_DEFAULT_LATENCY,
+    breaker_failures=settings.ROUTING_BREAKER_FAILURES,
+    breaker_error_rate=settings.ROUTING_BREAKER_ERROR_RATE,
+    breaker_min_samples=settings.ROUTING_BREAKER_MIN_SAMPLES,
+    breaker_cooldown=settings.ROUTING_BREAKER_COOLDOWN,
+    probe_interval=settings.ROUTING_PROBE_INTERVAL,
+    stats_ttl=settings.ROUTING_STATS_TTL,
+)
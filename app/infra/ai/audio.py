@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import re
+from contextlib import nullcontext
+from typing import AsyncContextManager, AsyncIterator, Callable, List, Optional
+
+from app.infra.ai.base import AudioProvider, StreamingAudioProvider
+from app.infra.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+AUDIO_CONTENT_TYPES = {
+    "mp3": "audio/mpeg",
+    "oggopus": "audio/ogg",
+}
+
+AUDIO_EXTENSIONS = {
+    "mp3": "mp3",
+    "oggopus": "ogg",
+}
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…;])\s+|\n+")
+
+# Таблицы заголовка MPEG Layer III: битрейт (кбит/с) по индексу и частота дискретизации
+_MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],  # MPEG-2.5
+}
+
+
+def split_text_for_tts(text: str, max_chars: int) -> List[str]:
+    """
+    Делит текст на куски для синтеза: по строфам (пустая строка), а слишком
+    длинные строфы — по предложениям и строкам, не превышая max_chars.
+    """
+    chunks: List[str] = []
+    for stanza in re.split(r"\n\s*\n", text):
+        stanza = stanza.strip()
+        if not stanza:
+            continue
+        if len(stanza) <= max_chars:
+            chunks.append(stanza)
+            continue
+
+        current = ""
+        for sentence in _SENTENCE_BOUNDARY.split(stanza):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            # Предложение длиннее лимита режем по пробелам
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                if cut <= 0:
+                    cut = max_chars
+                if current:
+                    chunks.append(current)
+                    current = ""
+                chunks.append(sentence[:cut].strip())
+                sentence = sentence[cut:].strip()
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n{sentence}" if current else sentence
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+def _mp3_frame_length(header: bytes) -> Optional[int]:
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    padding = (header[2] >> 1) & 0x01
+    bitrate = _MP3_BITRATES[1 if version == 3 else 2][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][sample_rate_index]
+    return (144 if version == 3 else 72) * bitrate // sample_rate + padding
+
+
+def _mp3_frames(data: bytes) -> bytes:
+    """
+    Оставляет от MP3 только аудиофреймы: снимает ID3v2/ID3v1 теги и
+    служебный фрейм Xing/Info — он описывает длительность одного куска
+    и после склейки сбивал бы плееры.
+    """
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+
+    frame_length = _mp3_frame_length(data[:4])
+    if frame_length:
+        mpeg1 = (data[1] >> 3) & 0x03 == 3
+        mono = (data[3] >> 6) & 0x03 == 3
+        side_info = (17 if mono else 32) if mpeg1 else (9 if mono else 17)
+        offset = 4 + side_info + (0 if data[1] & 0x01 else 2)
+        if data[offset:offset + 4] in (b"Xing", b"Info"):
+            data = data[frame_length:]
+    return data
+
+
+def _stitchable_part(part: bytes, audio_format: str) -> bytes:
+    """
+    Готовит кусок аудио к склейке без перекодирования.
+
+    MP3 — поток независимых фреймов, поэтому достаточно конкатенации фреймов без тегов.
+    Ogg-потоки при конкатенации образуют цепочку (chained Ogg, RFC 3533),
+    которую плееры воспроизводят подряд.
+    """
+    if audio_format == "mp3":
+        return _mp3_frames(part)
+    if audio_format == "oggopus":
+        return part
+    raise ValueError(f"Unsupported audio format for stitching: {audio_format}")
+
+
+async def iter_synthesized_audio(
+    provider: AudioProvider,
+    text: str,
+    params: dict,
+    max_chars: int = settings.TTS_CHUNK_MAX_CHARS,
+    max_concurrency: int = settings.TTS_MAX_CONCURRENCY,
+    slot: Callable[[], AsyncContextManager[None]] = nullcontext,
+) -> AsyncIterator[bytes]:
+    """
+    Синтезирует текст по строфам параллельно (не более max_concurrency запросов)
+    и отдаёт склеенное аудио по порядку: кусок уходит дальше, как только готовы он
+    и все предыдущие. Текст из одного куска у потокового провайдера идёт прямо из ответа.
+
+    slot() оборачивает каждый запрос к провайдеру — через него применяется общий лимит.
+    """
+    chunks = split_text_for_tts(text, max_chars) or [text]
+    if len(chunks) == 1:
+        async with slot():
+            if isinstance(provider, StreamingAudioProvider):
+                async for data in provider.synthesize_stream(chunks[0], params):
+                    yield data
+            else:
+                yield await provider.synthesize(chunks[0], params)
+        return
+
+    audio_format = params.get("format", "mp3")
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _synthesize(chunk: str) -> bytes:
+        async with semaphore, slot():
+            return await provider.synthesize(chunk, params)
+
+    logger.info(f"Synthesizing {len(chunks)} chunks with concurrency {max_concurrency}")
+    tasks = [asyncio.create_task(_synthesize(chunk)) for chunk in chunks]
+    try:
+        for task in tasks:
+            yield _stitchable_part(await task, audio_format)
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -1,4 +1,4 @@
-from typing import Protocol, List
+from typing import AsyncIterator, Protocol, List, runtime_checkable
 
 
 class TextProvider(Protocol):
@@ -17,6 +17,15 @@ class TextProvider(Protocol):
         ...
 
 
+@runtime_checkable
+class StreamingTextProvider(TextProvider, Protocol):
+    def stream_poem(self, prompt: str, params: dict) -> AsyncIterator[str]:
+        """
+        Генерирует стихотворение потоково, отдавая новые фрагменты текста по мере готовности.
+        """
+        ...
+
+
 class AudioProvider(Protocol):
     provider_key: str
 
@@ -30,4 +39,12 @@ class AudioProvider(Protocol):
         """
         Синтезирует речь и возвращает аудио-контент в байтах.
         """
-        ...
\ No newline at end of file
+        ...
+
+@runtime_checkable
+class StreamingAudioProvider(AudioProvider, Protocol):
+    def synthesize_stream(self, text: str, params: dict) -> AsyncIterator[bytes]:
+        """
+        Синтезирует речь, отдавая аудио-контент частями по мере получения.
+        """
+        ...
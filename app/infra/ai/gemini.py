@@ -1,59 +1,153 @@
-import asyncio
-from functools import partial
-import google.generativeai as genai
+import httpx
+import json
 import logging
 import re
-from typing import List
-from app.infra.config.settings import settings
+from typing import AsyncIterator, List, Optional
+from app.infra.ai.http_client import http_clients
+from app.infra.ai.telemetry import report_usage
 
 logger = logging.getLogger(__name__)
 
 class GeminiProvider:
+    """
+    Gemini через REST API (generativelanguage.googleapis.com).
+
+    Ключ передаётся заголовком в каждом запросе, поэтому у каждого экземпляра
+    свои учётные данные и нет глобального состояния SDK (genai.configure).
+    """
     provider_key = "gemini"
+    base_url = "https://generativelanguage.googleapis.com/v1beta"
+    default_model = "gemini-flash-latest"
+
+    def __init__(self, api_key: str, model: Optional[str] = None, http_client: Optional[httpx.AsyncClient] = None):
+        self.api_key = api_key
+        self.model = model or self.default_model
+        self._http_client = http_client
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self._http_client or http_clients.get(self.base_url)
 
-    def __init__(self, api_key: str):
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-flash-latest')
+    @property
+    def headers(self) -> dict:
+        return {"x-goog-api-key": self.api_key}
 
     async def list_models(self) -> List[str]:
         try:
-            loop = asyncio.get_event_loop()
-            # genai.list_models() is a blocking call, run it in executor
-            models_iter = await loop.run_in_executor(None, genai.list_models)
-            
+            response = await self.http.get(
+                f"{self.base_url}/models", params={"pageSize": 1000}, headers=self.headers
+            )
+            response.raise_for_status()
+
             models = []
-            for m in models_iter:
-                if 'generateContent' in m.supported_generation_methods:
-                    models.append(m.name.replace('models/', ''))
+            for m in response.json().get("models", []):
+                if 'generateContent' in m.get("supportedGenerationMethods", []):
+                    models.append(m["name"].replace('models/', ''))
             return sorted(models)
         except Exception as e:
             logger.error(f"Error listing Gemini models: {e}")
             return ["gemini-1.5-flash", "gemini-1.5-pro", "gemini-2.0-flash-exp"]
 
+    def _build_payload(self, prompt: str, params: dict) -> dict:
+        max_tokens = params.get("max_tokens", 2048)
+        logger.info(f"Generating poem with params: {params}, max_output_tokens: {max_tokens}")
+        return {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {
+                "candidateCount": 1,
+                "maxOutputTokens": max_tokens,
+                "temperature": params.get("temperature", 0.7),
+            },
+        }
+
+    @staticmethod
+    def _candidate_text(candidate: dict) -> str:
+        return "".join(part.get("text", "") for part in candidate.get("content", {}).get("parts", []))
+
+    @staticmethod
+    def _report_usage(data: dict, candidate: dict) -> None:
+        usage = data.get("usageMetadata") or {}
+        report_usage(
+            prompt_tokens=usage.get("promptTokenCount"),
+            completion_tokens=usage.get("candidatesTokenCount"),
+            finish_reason=candidate.get("finishReason"),
+            model=data.get("modelVersion"),
+        )
+
+    @staticmethod
+    def _clean(text: str) -> str:
+        # Clean up potential HTML/Markdown artifacts
+        text = re.sub(r'```(?:html|markdown)?', '', text)
+        return re.sub(r'</?blockquote>', '', text, flags=re.IGNORECASE)
+
+    # Длина самой длинной разметки, которую вырезает _clean ("</blockquote>")
+    _MARKUP_MAX_LEN = 13
+
+    @classmethod
+    def _clean_stable(cls, text: str) -> str:
+        """
+        Очищает накопленный текст потока, придерживая хвост, в котором может начинаться
+        ещё не дописанная разметка: её конец придёт в следующем фрагменте. Результат —
+        начало того, что вернёт _clean для полного текста.
+        """
+        cut = len(text)
+        for i in range(max(0, len(text) - cls._MARKUP_MAX_LEN), len(text)):
+            if text[i] in "`<":
+                cut = i
+                break
+        while cut > 0 and text[cut - 1] == "`":
+            cut -= 1
+        return cls._clean(text[:cut])
+
     async def generate_poem(self, prompt: str, params: dict) -> str:
         try:
-            max_tokens = params.get("max_tokens", 2048)
-            logger.info(f"Generating poem with params: {params}, max_output_tokens: {max_tokens}")
-            
-            generation_config = genai.types.GenerationConfig(
-                candidate_count=1,
-                max_output_tokens=max_tokens,
-                temperature=params.get("temperature", 0.7),
+            payload = self._build_payload(prompt, params)
+
+            response = await self.http.post(
+                f"{self.base_url}/models/{self.model}:generateContent", json=payload, headers=self.headers
             )
-            
-            response = await self.model.generate_content_async(prompt, generation_config=generation_config)
-            
-            logger.info(f"Gemini response finish reason: {response.candidates[0].finish_reason}")
-            
-            if response.text:
-                text = response.text
-                # Clean up potential HTML/Markdown artifacts
-                text = re.sub(r'```(?:html|markdown)?', '', text)
-                text = re.sub(r'</?blockquote>', '', text, flags=re.IGNORECASE)
-                text = re.sub(r'</?blockquote>', '', text, flags=re.IGNORECASE)
-                return text.strip()
+            response.raise_for_status()
+            data = response.json()
+            candidate = data["candidates"][0]
+
+            logger.info(f"Gemini response finish reason: {candidate.get('finishReason')}")
+            self._report_usage(data, candidate)
+
+            text = self._candidate_text(candidate)
+            if text:
+                return self._clean(text).strip()
             return ""
-            
+
         except Exception as e:
             logger.error(f"Error generating content with Gemini: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    async def stream_poem(self, prompt: str, params: dict) -> AsyncIterator[str]:
+        payload = self._build_payload(prompt, params)
+        url = f"{self.base_url}/models/{self.model}:streamGenerateContent"
+
+        # Разметка может прийти разрезанной между фрагментами, поэтому очищается накопленный
+        # текст, а наружу отдаётся только прирост очищенного
+        raw, sent = "", ""
+        async with self.http.stream("POST", url, params={"alt": "sse"}, json=payload, headers=self.headers) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = json.loads(line[len("data:"):])
+                candidates = data.get("candidates") or []
+                if not candidates:
+                    continue
+                # usageMetadata в каждом фрагменте накопительная, итог — в последнем
+                self._report_usage(data, candidates[0])
+                if candidates[0].get("finishReason"):
+                    logger.info(f"Gemini response finish reason: {candidates[0]['finishReason']}")
+                raw += self._candidate_text(candidates[0])
+                text = self._clean_stable(raw)
+                if len(text) > len(sent):
+                    yield text[len(sent):]
+                    sent = text
+        # Поток закончился: придержанный хвост уже не дополнится
+        text = self._clean(raw)
+        if len(text) > len(sent):
+            yield text[len(sent):]
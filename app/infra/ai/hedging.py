@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Попытка получает commit(): вызов делает её победителем и отменяет остальные.
+# Возвращает False, если победитель уже выбран, — тогда попытка должна прекратиться.
+Commit = Callable[[], bool]
+AttemptFactory = Callable[[Commit], Awaitable[T]]
+
+
+class LatencyTracker:
+    """
+    Скользящее окно последних задержек по каждому провайдеру в памяти процесса.
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, key: str, seconds: float) -> None:
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key: str, q: float, min_samples: int = 1) -> Optional[float]:
+        samples = self._samples.get(key)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+latency_tracker = LatencyTracker()
+
+
+class HedgeAttempt(Generic[T]):
+    def __init__(self, label: str, factory: AttemptFactory[T], latency_key: Optional[str] = None):
+        self.label = label
+        self.factory = factory
+        self.latency_key = latency_key or label
+
+
+async def run_hedged(
+    attempts: Sequence[HedgeAttempt[T]],
+    hedge_delay: float,
+    tracker: Optional["LatencyTracker"] = None,
+) -> Tuple[str, T]:
+    """
+    Запускает первую попытку; если за hedge_delay победитель не выбран — следующую,
+    и так далее. Побеждает попытка, первой вызвавшая commit() (или завершившаяся успешно),
+    остальные отменяются. Упавшая попытка сразу уступает место следующей.
+
+    Возвращает (label победителя, результат). Если упали все попытки — пробрасывает последнюю ошибку.
+    """
+    pending: List[HedgeAttempt[T]] = list(attempts)
+    running: Dict[asyncio.Task, Tuple[HedgeAttempt[T], float]] = {}
+    errors: List[BaseException] = []
+    winner: Optional[asyncio.Task] = None
+
+    def _cancel_others(keep: asyncio.Task) -> None:
+        for task in running:
+            if task is not keep:
+                task.cancel()
+
+    def _start_next() -> None:
+        attempt = pending.pop(0)
+        task: Optional[asyncio.Task] = None
+
+        def commit() -> bool:
+            nonlocal winner
+            if winner is None:
+                winner = task
+                if tracker is not None:
+                    tracker.record(attempt.latency_key, time.monotonic() - running[task][1])
+                _cancel_others(task)
+            return winner is task
+
+        task = asyncio.create_task(attempt.factory(commit))
+        running[task] = (attempt, time.monotonic())
+        if len(running) > 1:
+            logger.info(f"Hedging: starting {attempt.label} after {hedge_delay:.1f}s")
+
+    _start_next()
+    try:
+        while running:
+            timeout = hedge_delay if pending and winner is None else None
+            done, _ = await asyncio.wait(list(running), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                _start_next()
+                continue
+
+            for task in done:
+                attempt, started = running.pop(task)
+                if task.cancelled():
+                    continue
+                error = task.exception()
+                if error is None:
+                    if winner is None:
+                        # Попытка не вызывала commit сама — успех и есть ответ
+                        winner = task
+                        if tracker is not None:
+                            tracker.record(attempt.latency_key, time.monotonic() - started)
+                    if winner is task:
+                        return attempt.label, task.result()
+                    continue
+
+                logger.warning(f"Hedged attempt {attempt.label} failed: {error}")
+                errors.append(error)
+                if winner is task:
+                    raise error
+
+            if not running and pending:
+                _start_next()
+    finally:
+        for task in running:
+            task.cancel()
+
+    raise errors[-1]
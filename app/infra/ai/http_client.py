@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import weakref
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.infra.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:  # pragma: no cover - зависит от окружения
+    HTTP2_AVAILABLE = False
+
+
+@dataclass(frozen=True)
+class HostProfile:
+    read_timeout: float
+    max_connections: int
+    http2: bool = True
+
+
+# Профили известных хостов. Таймаут чтения соответствует тому, что раньше
+# передавалось в каждый запрос провайдера.
+HOST_PROFILES: Dict[str, HostProfile] = {
+    "api.openai.com": HostProfile(read_timeout=60.0, max_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST),
+    "generativelanguage.googleapis.com": HostProfile(
+        read_timeout=60.0, max_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST
+    ),
+    "llm.api.cloud.yandex.net": HostProfile(read_timeout=30.0, max_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST),
+    "tts.api.cloud.yandex.net": HostProfile(read_timeout=30.0, max_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST),
+}
+
+DEFAULT_PROFILE = HostProfile(read_timeout=settings.HTTP_READ_TIMEOUT, max_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST)
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class HttpClientRegistry:
+    """
+    Реестр долгоживущих httpx-клиентов: один клиент с keep-alive пулом на хост.
+
+    Клиент привязан к event loop'у, в котором открыты его соединения, поэтому
+    реестр хранит клиентов отдельно для каждого loop'а (в воркере он один на процесс).
+    """
+
+    def __init__(self) -> None:
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def get(self, url: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        origin = _origin(url)
+        clients = self._clients.setdefault(loop, {})
+        client = clients.get(origin)
+        if client is None or client.is_closed:
+            client = self._create_client(origin)
+            clients[origin] = client
+        return client
+
+    def _create_client(self, origin: str) -> httpx.AsyncClient:
+        profile = HOST_PROFILES.get(urlsplit(origin).hostname or "", DEFAULT_PROFILE)
+        return httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE and profile.http2,
+            limits=httpx.Limits(
+                max_connections=profile.max_connections,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.HTTP_CONNECT_TIMEOUT,
+                read=profile.read_timeout,
+                write=profile.read_timeout,
+                pool=settings.HTTP_CONNECT_TIMEOUT,
+            ),
+        )
+
+    async def warm_up(self, hosts: Optional[Iterable[str]] = None) -> None:
+        """
+        Заранее устанавливает TCP+TLS соединения с хостами провайдеров,
+        чтобы первый заказ после старта воркера не платил за handshake.
+        """
+        hosts = list(hosts or HOST_PROFILES)
+
+        async def _touch(host: str) -> None:
+            try:
+                await self.get(f"https://{host}").head("/")
+            except httpx.HTTPError as e:
+                logger.warning(f"HTTP warm-up for {host} failed: {e}")
+
+        await asyncio.gather(*(_touch(host) for host in hosts))
+        logger.info(f"HTTP clients warmed up: {', '.join(hosts)}")
+
+    async def aclose(self) -> None:
+        clients = self._clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.aclose()
+
+
+http_clients = HttpClientRegistry()
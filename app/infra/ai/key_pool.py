@@ -0,0 +1,109 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional, Sequence, Set, TypeVar
+
+import httpx
+
+from app.infra.ai.registry import key_fingerprint
+from app.infra.cache.config_snapshot import ProviderKeySnapshot
+from app.infra.cache.redis import get_redis
+from app.infra.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class KeyPool:
+    """
+    Распределение запросов по нескольким ключам API одного провайдера.
+
+    Ключи выбираются по кругу (общий счётчик в Redis для всех воркеров). Ключ,
+    получивший 429, уходит на паузу: отметка в Redis с TTL убирает его из выдачи
+    и сама исчезает по истечении паузы, а в api_keys пишется limit_exceeded и
+    cooldown_until — для админки.
+    """
+
+    cooldown_key = "keypool:cooldown:{fingerprint}"
+    cursor_key = "keypool:cursor:{pool_id}"
+
+    def __init__(self, cooldown: float):
+        self.cooldown = cooldown
+
+    async def pick(
+        self, pool_id: str, keys: Sequence[ProviderKeySnapshot], exclude: Set[str] = frozenset()
+    ) -> ProviderKeySnapshot:
+        candidates = [key for key in keys if key.value not in exclude] or list(keys)
+        if len(candidates) == 1:
+            return candidates[0]
+
+        try:
+            redis = get_redis()
+            cooldowns = await redis.mget(
+                [self.cooldown_key.format(fingerprint=key_fingerprint(key.value)) for key in candidates]
+            )
+            available = [key for key, cooling in zip(candidates, cooldowns) if not cooling]
+            cursor = await redis.incr(self.cursor_key.format(pool_id=pool_id))
+        except Exception as e:
+            logger.warning(f"Key pool unavailable, using first key: {e}")
+            return candidates[0]
+
+        # Если на паузе все ключи — берём любой: лимитер и повтор всё равно лучше, чем отказ
+        pool = available or candidates
+        return pool[cursor % len(pool)]
+
+    async def put_on_cooldown(self, key: ProviderKeySnapshot, seconds: Optional[float] = None) -> None:
+        seconds = seconds or self.cooldown
+        try:
+            await get_redis().set(
+                self.cooldown_key.format(fingerprint=key_fingerprint(key.value)), 1, ex=max(1, int(seconds))
+            )
+        except Exception as e:
+            logger.warning(f"Failed to put API key on cooldown: {e}")
+
+        if key.id is None:
+            return
+        from app.infra.db.repositories.config_repo import ConfigRepo
+        from app.infra.db.session import async_session_factory
+
+        try:
+            async with async_session_factory() as session:
+                until = datetime.now(timezone.utc) + timedelta(seconds=seconds)
+                await ConfigRepo(session).mark_api_key_limited(key.id, until)
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"Failed to mark API key {key.id} as limit_exceeded: {e}")
+
+    async def call(
+        self,
+        pool_id: str,
+        keys: Sequence[ProviderKeySnapshot],
+        fn: Callable[[ProviderKeySnapshot], Awaitable[T]],
+    ) -> T:
+        """
+        Выполняет fn с ключом из пула. При 429 ключ уходит на паузу, а вызов
+        повторяется со следующим ключом, пока не будут перепробованы все.
+        """
+        tried: Set[str] = set()
+        while True:
+            key = await self.pick(pool_id, keys, exclude=tried)
+            try:
+                return await fn(key)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 429:
+                    raise
+                await self.put_on_cooldown(key, _retry_after(e.response))
+                tried.add(key.value)
+                if len(tried) >= len(keys):
+                    raise
+                logger.warning(f"API key of {pool_id} hit rate limit, switching to another key")
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+key_pool = KeyPool(cooldown=settings.PROVIDER_KEY_COOLDOWN)
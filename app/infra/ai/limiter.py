@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from app.infra.ai.registry import key_fingerprint
+from app.infra.cache.redis import get_redis
+from app.infra.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Token bucket: пополняется со скоростью rate токенов в мс до burst.
+# Возвращает 0, если токен получен, иначе — сколько мс ждать до следующего.
+# Время берётся из Redis, чтобы у всех воркеров были одни часы.
+_TOKEN_BUCKET_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate) + 1000)
+return wait
+"""
+
+# Семафор на sorted set: участник — держатель слота, score — срок аренды.
+# Слоты упавших процессов освобождаются сами по истечении аренды.
+_SEMAPHORE_ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local lease = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[1]) then
+    redis.call('ZADD', KEYS[1], now + lease, ARGV[2])
+    redis.call('PEXPIRE', KEYS[1], lease)
+    return 1
+end
+return 0
+"""
+
+# Те же проверки без захвата: сколько мс ждать токена и сколько слотов занято
+_TOKEN_BUCKET_PEEK_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+if tokens >= 1 then
+    return 0
+end
+return math.ceil((1 - tokens) / rate)
+"""
+
+_SEMAPHORE_PEEK_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+return redis.call('ZCOUNT', KEYS[1], '(' .. now, '+inf')
+"""
+
+
+class ProviderBusyError(Exception):
+    """
+    Провайдер не освободился за PROVIDER_LIMIT_MAX_WAIT.
+    """
+
+
+@dataclass(frozen=True)
+class ProviderLimits:
+    rpm: Optional[int] = None  # запросов в минуту
+    burst: Optional[int] = None  # сколько запросов можно сделать разом после простоя
+    max_concurrency: Optional[int] = None  # одновременных запросов
+
+    @property
+    def is_unlimited(self) -> bool:
+        return not self.rpm and not self.max_concurrency
+
+
+UNLIMITED = ProviderLimits()
+
+
+class ProviderLimiter:
+    """
+    Общий для всех процессов лимит обращений к провайдеру: token bucket по частоте
+    и семафор по числу одновременных запросов. Считается отдельно для каждой пары
+    (провайдер, ключ API), лимиты задаются в ProviderConfig.
+
+    Вызов ждёт освобождения квоты, а не падает с 429. Если Redis недоступен,
+    лимит не применяется — генерация важнее точного соблюдения квоты.
+    """
+
+    def __init__(self, max_wait: float, slot_lease: float, busy_delay: float):
+        self.max_wait = max_wait
+        self.slot_lease = slot_lease
+        self.busy_delay = busy_delay
+
+    @asynccontextmanager
+    async def slot(self, kind: str, api_key: Optional[str], limits: ProviderLimits) -> AsyncIterator[None]:
+        if limits.is_unlimited:
+            yield
+            return
+
+        prefix = f"ratelimit:{kind}:{key_fingerprint(api_key)}"
+        deadline = time.monotonic() + self.max_wait
+        holder: Optional[str] = None
+        try:
+            if limits.max_concurrency:
+                holder = await self._acquire_slot(f"{prefix}:slots", limits.max_concurrency, deadline)
+            if limits.rpm:
+                await self._acquire_token(f"{prefix}:tokens", limits, deadline)
+            yield
+        finally:
+            if holder is not None:
+                try:
+                    await get_redis().zrem(f"{prefix}:slots", holder)
+                except Exception as e:
+                    logger.warning(f"Failed to release {kind} slot: {e}")
+
+    async def wait_time(self, kind: str, api_key: Optional[str], limits: ProviderLimits) -> float:
+        """
+        Оценка без захвата квоты: через сколько секунд у ключа будут свободный слот
+        и токен; 0 — квота есть сейчас. Занятые слоты освобождаются в непредсказуемый
+        момент, для них возвращается busy_delay. Если Redis недоступен — 0, как и в slot().
+        """
+        if limits.is_unlimited:
+            return 0.0
+        prefix = f"ratelimit:{kind}:{key_fingerprint(api_key)}"
+        try:
+            if limits.max_concurrency:
+                busy = int(await get_redis().eval(_SEMAPHORE_PEEK_SCRIPT, 1, f"{prefix}:slots"))
+                if busy >= limits.max_concurrency:
+                    return self.busy_delay
+            if limits.rpm:
+                burst = limits.burst or max(1, limits.rpm // 60)
+                wait_ms = int(
+                    await get_redis().eval(_TOKEN_BUCKET_PEEK_SCRIPT, 1, f"{prefix}:tokens", limits.rpm / 60000, burst)
+                )
+                return wait_ms / 1000
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, skipping capacity check: {e}")
+        return 0.0
+
+    async def _acquire_token(self, key: str, limits: ProviderLimits, deadline: float) -> None:
+        rate = limits.rpm / 60000  # токенов в мс
+        burst = limits.burst or max(1, limits.rpm // 60)
+        while True:
+            try:
+                wait_ms = int(await get_redis().eval(_TOKEN_BUCKET_SCRIPT, 1, key, rate, burst))
+            except Exception as e:
+                logger.warning(f"Rate limiter unavailable, proceeding without limit: {e}")
+                return
+            if wait_ms <= 0:
+                return
+            await self._sleep(wait_ms / 1000, deadline, key)
+
+    async def _acquire_slot(self, key: str, limit: int, deadline: float) -> Optional[str]:
+        holder = uuid.uuid4().hex
+        lease_ms = int(self.slot_lease * 1000)
+        while True:
+            try:
+                if await get_redis().eval(_SEMAPHORE_ACQUIRE_SCRIPT, 1, key, limit, holder, lease_ms):
+                    return holder
+            except Exception as e:
+                logger.warning(f"Concurrency limiter unavailable, proceeding without limit: {e}")
+                return None
+            await self._sleep(0.2, deadline, key)
+
+    @staticmethod
+    async def _sleep(seconds: float, deadline: float, key: str) -> None:
+        # Джиттер, чтобы ожидающие воркеры не приходили за квотой одновременно
+        seconds = seconds * random.uniform(1.0, 1.2)
+        if time.monotonic() + seconds > deadline:
+            raise ProviderBusyError(f"No capacity for {key} within limit wait time")
+        await asyncio.sleep(seconds)
+
+
+provider_limiter = ProviderLimiter(
+    max_wait=settings.PROVIDER_LIMIT_MAX_WAIT,
+    slot_lease=settings.PROVIDER_SLOT_LEASE,
+    busy_delay=settings.PROVIDER_BUSY_DELAY,
+)
@@ -1,31 +1,38 @@
 import httpx
+import json
 import logging
-from typing import List
+from typing import AsyncIterator, List, Optional
 from app.infra.ai.base import TextProvider
+from app.infra.ai.http_client import http_clients
+from app.infra.ai.telemetry import report_usage
 
 logger = logging.getLogger(__name__)
 
 class OpenAIProvider(TextProvider):
     provider_key = "openai"
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, http_client: Optional[httpx.AsyncClient] = None):
         self.api_key = api_key
         self.base_url = "https://api.openai.com/v1"
+        self._http_client = http_client
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self._http_client or http_clients.get(self.base_url)
 
     async def list_models(self) -> List[str]:
         try:
             headers = {"Authorization": f"Bearer {self.api_key}"}
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/models", headers=headers)
-                response.raise_for_status()
-                data = response.json()
-                models = [m["id"] for m in data["data"] if "gpt" in m["id"]]
-                return sorted(models)
+            response = await self.http.get(f"{self.base_url}/models", headers=headers)
+            response.raise_for_status()
+            data = response.json()
+            models = [m["id"] for m in data["data"] if "gpt" in m["id"]]
+            return sorted(models)
         except Exception as e:
             logger.error(f"Error listing OpenAI models: {e}")
             return ["gpt-4o", "gpt-4o-mini", "gpt-4-turbo"]
 
-    async def generate_poem(self, prompt: str, params: dict) -> str:
+    def _build_request(self, prompt: str, params: dict, stream: bool = False) -> tuple[str, dict, dict]:
         url = f"{self.base_url}/chat/completions"
         headers = {
             "Content-Type": "application/json",
@@ -38,11 +45,48 @@ class OpenAIProvider(TextProvider):
                 {"role": "user", "content": prompt}
             ],
             "temperature": params.get("temperature", 0.7),
-            "max_tokens": params.get("max_tokens", 1000)
+            "max_tokens": params.get("max_tokens", 1000),
+            "stream": stream
         }
+        if stream:
+            # Последним фрагментом потока придёт расход токенов (с пустым choices)
+            payload["stream_options"] = {"include_usage": True}
+        return url, payload, headers
+
+    @staticmethod
+    def _report_usage(data: dict) -> None:
+        usage = data.get("usage") or {}
+        choices = data.get("choices") or [{}]
+        report_usage(
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+            finish_reason=choices[0].get("finish_reason"),
+            model=data.get("model"),
+        )
+
+    async def generate_poem(self, prompt: str, params: dict) -> str:
+        url, payload, headers = self._build_request(prompt, params)
+
+        response = await self.http.post(url, json=payload, headers=headers)
+        response.raise_for_status()
+        result = response.json()
+        self._report_usage(result)
+        return result["choices"][0]["message"]["content"]
+
+    async def stream_poem(self, prompt: str, params: dict) -> AsyncIterator[str]:
+        url, payload, headers = self._build_request(prompt, params, stream=True)
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload, headers=headers, timeout=60.0)
+        # Server-Sent Events: строки вида "data: {...}", поток завершается "data: [DONE]"
+        async with self.http.stream("POST", url, json=payload, headers=headers) as response:
             response.raise_for_status()
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
\ No newline at end of file
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                self._report_usage(chunk)
+                choices = chunk.get("choices") or []
+                if choices and choices[0].get("delta", {}).get("content"):
+                    yield choices[0]["delta"]["content"]
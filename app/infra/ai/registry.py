@@ -0,0 +1,74 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from app.domain.enums import ProviderKind
+from app.infra.ai.base import AudioProvider, TextProvider
+from app.infra.ai.gemini import GeminiProvider
+from app.infra.ai.openai import OpenAIProvider
+from app.infra.ai.speechkit import SpeechKitProvider
+from app.infra.ai.test_provider import DummyTextProvider
+from app.infra.ai.yandex_gpt import YandexGPTProvider
+
+Provider = Union[TextProvider, AudioProvider]
+
+# Единая таблица диспетчеризации: ProviderKind -> фабрика (api_key, model)
+PROVIDER_FACTORIES: Dict[ProviderKind, Callable[[Optional[str], Optional[str]], Provider]] = {
+    ProviderKind.YANDEX_GPT: lambda api_key, model: YandexGPTProvider(api_key=api_key),
+    ProviderKind.GEMINI: lambda api_key, model: GeminiProvider(api_key=api_key, model=model),
+    ProviderKind.OPENAI: lambda api_key, model: OpenAIProvider(api_key=api_key),
+    ProviderKind.SPEECHKIT: lambda api_key, model: SpeechKitProvider(api_key=api_key),
+}
+
+
+def key_fingerprint(api_key: Optional[str]) -> str:
+    """
+    Короткий отпечаток ключа: позволяет различать ключи, не храня их в ключах кэша и логах.
+    """
+    if not api_key:
+        return "-"
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+class ProviderRegistry:
+    """
+    Кэш экземпляров провайдеров по (ProviderKind, отпечаток ключа, модель).
+
+    Экземпляры не хранят глобального состояния и разделяют HTTP-пулы,
+    поэтому одновременные генерации с разными ключами безопасны.
+    """
+
+    def __init__(self, max_size: int = 64):
+        self.max_size = max_size
+        self._instances: "OrderedDict[Tuple[ProviderKind, str, Optional[str]], Provider]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, kind: ProviderKind, api_key: Optional[str] = None, model: Optional[str] = None) -> Provider:
+        factory = PROVIDER_FACTORIES.get(kind)
+        if factory is None:
+            return DummyTextProvider()
+
+        cache_key = (kind, key_fingerprint(api_key), model)
+        with self._lock:
+            instance = self._instances.get(cache_key)
+            if instance is not None:
+                self._instances.move_to_end(cache_key)
+                return instance
+
+            instance = factory(api_key, model)
+            self._instances[cache_key] = instance
+            if len(self._instances) > self.max_size:
+                self._instances.popitem(last=False)
+            return instance
+
+    def clear(self) -> None:
+        with self._lock:
+            self._instances.clear()
+
+
+provider_registry = ProviderRegistry()
+
+
+def get_provider(kind: ProviderKind, api_key: Optional[str] = None, model: Optional[str] = None) -> Provider:
+    return provider_registry.get(kind, api_key=api_key, model=model)
@@ -1,15 +1,22 @@
 import httpx
-from typing import List
+from typing import AsyncIterator, List, Optional
 from app.infra.ai.base import AudioProvider
+from app.infra.ai.http_client import http_clients
+from app.infra.ai.telemetry import report_usage
 from app.infra.config.settings import settings
 
 class SpeechKitProvider(AudioProvider):
     provider_key: str = "speechkit"
 
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, http_client: Optional[httpx.AsyncClient] = None):
         self.api_key = api_key or (settings.SPEECHKIT_API_KEY.get_secret_value() if settings.SPEECHKIT_API_KEY else None)
         self.folder_id = settings.YANDEX_CATALOG_ID
         self.url = "https://tts.api.cloud.yandex.net/speech/v1/tts:synthesize"
+        self._http_client = http_client
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self._http_client or http_clients.get(self.url)
 
     async def list_models(self) -> List[str]:
         """
@@ -21,7 +28,7 @@ class SpeechKitProvider(AudioProvider):
             "jane", "oksana", "aleksandr", "kirill", "anton", "marina"
         ]
 
-    async def synthesize(self, text: str, params: dict) -> bytes:
+    def _build_request(self, text: str, params: dict) -> tuple[dict, dict]:
         if not self.api_key:
             raise ValueError("SpeechKit API key is not configured")
 
@@ -31,20 +38,42 @@ class SpeechKitProvider(AudioProvider):
             "lang": params.get("lang", "ru-RU"),
             "voice": params.get("model", "filipp"), # В нашей системе 'model' в конфиге это голос
             "folderId": self.folder_id,
-            "format": "mp3"
+            "format": params.get("format", "mp3")
         }
 
         headers = {
             "Authorization": f"Api-Key {self.api_key}"
         }
+        return data, headers
+
+    async def synthesize(self, text: str, params: dict) -> bytes:
+        data, headers = self._build_request(text, params)
+
+        response = await self.http.post(self.url, data=data, headers=headers)
+        if response.status_code != 200:
+            error_detail = response.text
+            raise httpx.HTTPStatusError(
+                f"SpeechKit error {response.status_code}: {error_detail}",
+                request=response.request,
+                response=response
+            )
+        report_usage(response_bytes=len(response.content))
+        return response.content
+
+    async def synthesize_stream(self, text: str, params: dict) -> AsyncIterator[bytes]:
+        """
+        Отдаёт аудио по мере получения ответа, не собирая его целиком в памяти.
+        """
+        data, headers = self._build_request(text, params)
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(self.url, data=data, headers=headers, timeout=30.0)
+        async with self.http.stream("POST", self.url, data=data, headers=headers) as response:
             if response.status_code != 200:
-                error_detail = response.text
+                error_detail = (await response.aread()).decode(errors="replace")
                 raise httpx.HTTPStatusError(
                     f"SpeechKit error {response.status_code}: {error_detail}",
                     request=response.request,
                     response=response
                 )
-            return response.content
\ No newline at end of file
+            async for chunk in response.aiter_bytes():
+                report_usage(response_bytes=len(chunk))
+                yield chunk
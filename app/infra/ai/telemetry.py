@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterator, List, Optional, Union
+from uuid import UUID
+
+import httpx
+
+from app.domain.enums import ProviderKind, StageType
+from app.infra.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProviderCallStats:
+    """
+    Запись о запросе к провайдеру; поля ответа заполняет сам провайдер через report_usage().
+    """
+
+    provider_kind: str
+    model: Optional[str]
+    operation: str
+    key_fingerprint: Optional[str] = None
+    stage_id: Optional[UUID] = None
+    stage_type: Optional[str] = None
+    status: str = "ok"
+    http_status: Optional[int] = None
+    latency_ms: int = 0
+    first_chunk_ms: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    response_bytes: Optional[int] = None
+    finish_reason: Optional[str] = None
+    error: Optional[str] = None
+    started: float = field(default_factory=time.monotonic, repr=False)
+
+
+# Запрос, выполняемый в текущей задаче asyncio. Провайдеры не знают о телеметрии
+# и только сообщают, что узнали из ответа, — вне track() это ничего не делает.
+_current_call: ContextVar[Optional[ProviderCallStats]] = ContextVar("provider_call", default=None)
+
+
+def report_usage(
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+    finish_reason: Optional[str] = None,
+    model: Optional[str] = None,
+    response_bytes: Optional[int] = None,
+) -> None:
+    """
+    Дополняет запись текущего запроса. Потоковые ответы сообщают накопленные значения
+    несколько раз — сохраняется последнее; response_bytes суммируется.
+    """
+    stats = _current_call.get()
+    if stats is None:
+        return
+    if prompt_tokens is not None:
+        stats.prompt_tokens = int(prompt_tokens)
+    if completion_tokens is not None:
+        stats.completion_tokens = int(completion_tokens)
+    if finish_reason:
+        stats.finish_reason = str(finish_reason)
+    if model:
+        stats.model = model
+    if response_bytes is not None:
+        stats.response_bytes = (stats.response_bytes or 0) + response_bytes
+
+
+def report_first_chunk() -> None:
+    """
+    Отмечает первый фрагмент потокового ответа: для потоков важна задержка до него.
+    """
+    stats = _current_call.get()
+    if stats is not None and stats.first_chunk_ms is None:
+        stats.first_chunk_ms = int((time.monotonic() - stats.started) * 1000)
+
+
+class ProviderCallRecorder:
+    """
+    Телеметрия запросов к AI провайдерам: задержка, исход, токены, объём ответа.
+
+    Записи копятся в памяти процесса и вставляются в provider_calls одной пачкой —
+    по заполнении batch_size или раз в flush_interval. Запросы к провайдерам не ждут БД,
+    а при её недоступности буфер ограничен max_buffer: старые записи отбрасываются.
+    """
+
+    def __init__(self, enabled: bool, batch_size: int, flush_interval: float, max_buffer: int):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: List[dict] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @asynccontextmanager
+    async def track(
+        self,
+        kind: ProviderKind,
+        model: Optional[str],
+        operation: str,
+        api_key: Optional[str] = None,
+        stage_id: Union[UUID, str, None] = None,
+        stage_type: Optional[StageType] = None,
+    ) -> AsyncIterator[ProviderCallStats]:
+        """
+        Замеряет запрос к провайдеру внутри блока. Ошибка записывается и пробрасывается дальше,
+        отмена (проигравшая попытка хеджирования) записывается как cancelled.
+        """
+        # registry импортирует провайдеры, а они — этот модуль
+        from app.infra.ai.registry import key_fingerprint
+
+        stats = ProviderCallStats(
+            provider_kind=str(kind),
+            model=model,
+            operation=operation,
+            key_fingerprint=key_fingerprint(api_key) if api_key else None,
+            stage_id=UUID(str(stage_id)) if stage_id else None,
+            stage_type=str(stage_type) if stage_type else None,
+        )
+        # Не reset(token): блок может закрываться в другом контексте (aclose генератора)
+        previous = _current_call.get()
+        _current_call.set(stats)
+        try:
+            yield stats
+        except asyncio.CancelledError:
+            stats.status = "cancelled"
+            raise
+        except Exception as e:
+            stats.status = "error"
+            if isinstance(e, httpx.HTTPStatusError):
+                stats.http_status = e.response.status_code
+            stats.error = f"{type(e).__name__}: {e}"[:500]
+            raise
+        finally:
+            _current_call.set(previous)
+            stats.latency_ms = int((time.monotonic() - stats.started) * 1000)
+            self.record(stats)
+
+    def record(self, stats: ProviderCallStats) -> None:
+        if not self.enabled:
+            return
+        if len(self._buffer) >= self.max_buffer:
+            del self._buffer[: len(self._buffer) - self.max_buffer + 1]
+        row = asdict(stats)
+        del row["started"]
+        self._buffer.append(row)
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._flusher is None or self._flusher.done() or self._flusher.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._flusher = loop.create_task(self._run())
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Вставляет накопленные записи. Возвращает число записанных.
+        """
+        if not self._buffer:
+            return 0
+        batch, self._buffer = self._buffer, []
+
+        from app.infra.db.models import ProviderCall
+        from app.infra.db.session import async_session_factory
+        from sqlalchemy import insert
+
+        try:
+            async with async_session_factory() as session:
+                await session.execute(insert(ProviderCall), batch)
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"Failed to write {len(batch)} provider call records: {e}")
+            # Вернём пачку в буфер: запишется со следующей, если БД поднимется
+            self._buffer = (batch + self._buffer)[-self.max_buffer:]
+            return 0
+        return len(batch)
+
+    async def aclose(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+
+provider_calls = ProviderCallRecorder(
+    enabled=settings.PROVIDER_TELEMETRY_ENABLED,
+    batch_size=settings.PROVIDER_TELEMETRY_BATCH_SIZE,
+    flush_interval=settings.PROVIDER_TELEMETRY_FLUSH_INTERVAL,
+    max_buffer=settings.PROVIDER_TELEMETRY_MAX_BUFFER,
+)
@@ -1,23 +1,31 @@
 import httpx
-from typing import List
+import json
+from typing import AsyncIterator, List, Optional
 from app.infra.ai.base import TextProvider
+from app.infra.ai.http_client import http_clients
+from app.infra.ai.telemetry import report_usage
 from app.infra.config.settings import settings
 
 
 class YandexGPTProvider(TextProvider):
     provider_key: str = "yandex_gpt"
 
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, http_client: Optional[httpx.AsyncClient] = None):
         self.api_key = api_key or (settings.YANDEX_GPT_API_KEY.get_secret_value() if settings.YANDEX_GPT_API_KEY else None)
         self.folder_id = settings.YANDEX_CATALOG_ID
         self.url = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+        self._http_client = http_client
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self._http_client or http_clients.get(self.url)
 
     async def list_models(self) -> List[str]:
         # YandexGPT doesn't have a simple public models list API like OpenAI yet,
         # or it's folder-dependent. Returning a static list of known models for now.
         return ["yandexgpt/latest", "yandexgpt-lite/latest", "yandexgpt/rc"]
 
-    async def generate_poem(self, prompt: str, params: dict) -> str:
+    def _build_request(self, prompt: str, params: dict, stream: bool = False) -> tuple[dict, dict]:
         if not self.api_key or not self.folder_id:
             raise ValueError("YandexGPT credentials are not configured")
 
@@ -26,7 +34,7 @@ class YandexGPTProvider(TextProvider):
         payload = {
             "modelUri": model_uri,
             "completionOptions": {
-                "stream": False,
+                "stream": stream,
                 "temperature": params.get("temperature", 0.6),
                 "maxTokens": params.get("max_tokens", 1000)
             },
@@ -47,10 +55,43 @@ class YandexGPTProvider(TextProvider):
             "Authorization": f"Api-Key {self.api_key}",
             "x-folder-id": self.folder_id
         }
+        return payload, headers
+
+    @staticmethod
+    def _report_usage(result: dict) -> None:
+        # Числа в usage приходят строками; в потоке — накопленные к текущему фрагменту
+        usage = result.get("usage") or {}
+        report_usage(
+            prompt_tokens=usage.get("inputTextTokens"),
+            completion_tokens=usage.get("completionTokens"),
+            finish_reason=result["alternatives"][0].get("status"),
+            model=result.get("modelVersion"),
+        )
+
+    async def generate_poem(self, prompt: str, params: dict) -> str:
+        payload, headers = self._build_request(prompt, params)
+
+        response = await self.http.post(self.url, json=payload, headers=headers)
+        response.raise_for_status()
+        result = response.json()
+        self._report_usage(result["result"])
+
+        return result["result"]["alternatives"][0]["message"]["text"]
+
+    async def stream_poem(self, prompt: str, params: dict) -> AsyncIterator[str]:
+        payload, headers = self._build_request(prompt, params, stream=True)
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(self.url, json=payload, headers=headers, timeout=30.0)
+        # В потоковом режиме API отдаёт JSON-объекты построчно, каждый содержит
+        # весь накопленный текст альтернативы — наружу отдаём только прирост.
+        sent = ""
+        async with self.http.stream("POST", self.url, json=payload, headers=headers) as response:
             response.raise_for_status()
-            result = response.json()
-            
-            return result["result"]["alternatives"][0]["message"]["text"]
\ No newline at end of file
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                result = json.loads(line)["result"]
+                self._report_usage(result)
+                text = result["alternatives"][0]["message"]["text"]
+                if len(text) > len(sent):
+                    yield text[len(sent):]
+                    sent = text
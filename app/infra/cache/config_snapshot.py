@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from app.domain.enums import ProviderKind, RoutingMode, StageType
+from app.infra.ai.limiter import UNLIMITED, ProviderLimits
+from app.infra.cache.redis import get_redis
+from app.infra.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+CONFIG_VERSION_KEY = "config:version"
+CONFIG_INVALIDATE_CHANNEL = "config:invalidate"
+
+
+@dataclass(frozen=True)
+class ProviderKeySnapshot:
+    id: Optional[UUID]  # None — ключ не из истории api_keys (из окружения или только в ProviderConfig)
+    value: str
+
+
+@dataclass(frozen=True)
+class ProviderSnapshot:
+    id: int
+    stage_type: StageType
+    provider_kind: ProviderKind
+    api_key: Optional[str]  # уже расшифрованный
+    model: Optional[str]
+    models_cache: List[str]
+    status: Optional[str]
+    limits: ProviderLimits = UNLIMITED
+    api_keys: Tuple[ProviderKeySnapshot, ...] = ()  # пул ключей для распределения запросов
+    routing_mode: RoutingMode = RoutingMode.MANUAL
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    Неизменяемый снимок всех конфигурационных таблиц на момент загрузки.
+    """
+
+    version: int
+    loaded_at: float
+    providers: Dict[str, ProviderSnapshot] = field(default_factory=dict)
+    products: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    policies: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def provider(self, stage_type: StageType) -> Optional[ProviderSnapshot]:
+        return self.providers.get(stage_type)
+
+    def product(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.products.get(key)
+
+    def policy(self, policy_type: str) -> Optional[Dict[str, Any]]:
+        return self.policies.get(policy_type)
+
+    def stop_words(self, policy_type: str) -> List[str]:
+        policy = self.policy(policy_type)
+        return policy.get("stop_words", []) if policy else []
+
+
+class ConfigSnapshotCache:
+    """
+    Кэш конфигурации провайдеров, продуктов и контент-политик в памяти процесса.
+
+    Снимок перечитывается целиком, когда админка публикует новую версию в Redis
+    (pub/sub), либо по истечении TTL, если сообщение об инвалидации потерялось.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._loaded_monotonic = 0.0
+        self._stale = True
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._snapshot is not None
+            and not self._stale
+            and time.monotonic() - self._loaded_monotonic < self.ttl
+        )
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def get(self) -> ConfigSnapshot:
+        self._ensure_listener()
+        if self._is_fresh():
+            return self._snapshot
+
+        async with self._get_lock():
+            if not self._is_fresh():
+                self._stale = False
+                self._snapshot = await self._load()
+                self._loaded_monotonic = time.monotonic()
+                logger.info(f"Config snapshot v{self._snapshot.version} loaded")
+        return self._snapshot
+
+    async def _load(self) -> ConfigSnapshot:
+        from app.infra.db.repositories.config_repo import ConfigRepo
+        from app.infra.db.session import async_session_factory
+
+        version = await self._read_version()
+        async with async_session_factory() as session:
+            config_repo = ConfigRepo(session)
+            provider_rows = await config_repo.get_all_provider_configs()
+            product_rows = await config_repo.get_all_product_configs()
+            policy_rows = await config_repo.get_all_content_policies()
+            key_rows = await config_repo.get_usable_api_keys()
+
+            providers = {}
+            for cfg in provider_rows:
+                # Как и get_provider_config, берём первую запись для типа этапа
+                if cfg.stage_type in providers:
+                    continue
+                api_key = config_repo.decrypt_api_key(cfg.api_key_encrypted)
+                pool = [ProviderKeySnapshot(id=k.id, value=k.key_value) for k in key_rows if k.provider_id == cfg.id]
+                if api_key and all(k.value != api_key for k in pool):
+                    pool.insert(0, ProviderKeySnapshot(id=None, value=api_key))
+                providers[cfg.stage_type] = ProviderSnapshot(
+                    id=cfg.id,
+                    stage_type=StageType(cfg.stage_type),
+                    provider_kind=ProviderKind(cfg.provider_kind),
+                    api_key=api_key,
+                    model=cfg.model,
+                    models_cache=list(cfg.models_cache or []),
+                    status=cfg.status,
+                    limits=ProviderLimits(
+                        rpm=cfg.rate_limit_rpm,
+                        burst=cfg.rate_limit_burst,
+                        max_concurrency=cfg.max_concurrency,
+                    ),
+                    api_keys=tuple(pool),
+                    routing_mode=RoutingMode(cfg.routing_mode or RoutingMode.MANUAL),
+                )
+
+        return ConfigSnapshot(
+            version=version,
+            loaded_at=time.time(),
+            providers=providers,
+            products={p.key: dict(p.value_json or {}) for p in product_rows},
+            policies={p.policy_type: dict(p.rules_json or {}) for p in policy_rows},
+        )
+
+    async def _read_version(self) -> int:
+        try:
+            return int(await get_redis().get(CONFIG_VERSION_KEY) or 0)
+        except Exception as e:
+            logger.warning(f"Could not read config version from Redis: {e}")
+            return self._snapshot.version if self._snapshot else 0
+
+    def _ensure_listener(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._listener is not None and not self._listener.done() and self._listener.get_loop() is loop:
+            return
+        self._listener = loop.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        reconnect = False
+        while True:
+            try:
+                pubsub = get_redis().pubsub()
+                await pubsub.subscribe(CONFIG_INVALIDATE_CHANNEL)
+                if reconnect:
+                    # Пока подписки не было, могли пропустить публикацию
+                    self.invalidate()
+                reconnect = True
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    version = int(message["data"])
+                    if self._snapshot is None or version > self._snapshot.version:
+                        self.invalidate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Config invalidation listener error, falling back to TTL: {e}")
+                reconnect = True
+                await asyncio.sleep(5)
+
+
+config_snapshot_cache = ConfigSnapshotCache(ttl=settings.CONFIG_CACHE_TTL)
+
+
+async def publish_config_invalidation() -> None:
+    """
+    Вызывается после коммита изменений конфигурации: поднимает версию
+    и оповещает все процессы (бот, веб, воркеры) о необходимости перечитать снимок.
+    """
+    config_snapshot_cache.invalidate()
+    try:
+        redis = get_redis()
+        version = await redis.incr(CONFIG_VERSION_KEY)
+        await redis.publish(CONFIG_INVALIDATE_CHANNEL, version)
+    except Exception as e:
+        logger.error(f"Failed to publish config invalidation, other processes will refresh by TTL: {e}")
@@ -0,0 +1,27 @@
+import asyncio
+import weakref
+
+from redis.asyncio import Redis
+
+from app.infra.config.settings import settings
+
+# Пул соединений redis.asyncio привязан к event loop'у, поэтому клиент один на loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Redis]" = weakref.WeakKeyDictionary()
+
+
+def get_redis() -> Redis:
+    """
+    Возвращает общий async-клиент Redis для текущего event loop'а.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        _clients[loop] = client
+    return client
+
+
+async def close_redis() -> None:
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
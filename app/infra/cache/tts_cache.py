@@ -0,0 +1,71 @@
+import hashlib
+import logging
+import re
+import unicodedata
+from typing import Optional
+
+from app.infra import metrics
+from app.infra.cache.redis import get_redis
+from app.infra.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "tts_cache"
+
+
+def normalize_tts_text(text: str) -> str:
+    """
+    Приводит текст к виду, от которого зависит звучание: NFC, без лишних
+    пробелов и пустых строк по краям. Регистр и пунктуация сохраняются — они влияют на интонацию.
+    """
+    text = unicodedata.normalize("NFC", text)
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in text.strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+
+def tts_cache_key(text: str, voice: str, lang: str, audio_format: str) -> str:
+    payload = "\x00".join([normalize_tts_text(text), voice, lang, audio_format])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class TtsAudioCache:
+    """
+    Контентно-адресуемый кэш синтезированного аудио.
+
+    Сам файл лежит в S3 под ключом tts/<hash>, в Redis хранится только индекс
+    hash -> ключ S3 со скользящим TTL: каждое попадание продлевает запись,
+    давно не используемые записи вытесняются. Объекты в S3 при вытеснении
+    не удаляются — на них ссылаются артефакты уже выполненных заказов.
+    """
+
+    index_key = "tts_cache:{key}"
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    @staticmethod
+    def storage_key(key: str, extension: str) -> str:
+        return f"tts/{key}.{extension}"
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            redis = get_redis()
+            index_key = self.index_key.format(key=key)
+            storage_key = await redis.get(index_key)
+            if storage_key:
+                await redis.expire(index_key, self.ttl)
+        except Exception as e:
+            logger.warning(f"TTS cache lookup failed: {e}")
+            storage_key = None
+
+        await metrics.incr(f"{METRIC_PREFIX}.{'hit' if storage_key else 'miss'}")
+        return storage_key
+
+    async def put(self, key: str, storage_key: str) -> None:
+        try:
+            await get_redis().set(self.index_key.format(key=key), storage_key, ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"TTS cache store failed: {e}")
+
+
+tts_audio_cache = TtsAudioCache(ttl=settings.TTS_CACHE_TTL)
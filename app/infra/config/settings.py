@@ -29,6 +29,113 @@ class Settings(BaseSettings):
     def REDIS_URL(self) -> str:
         return f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}/{self.REDIS_DB}"
 
+    # Пулы соединений с БД по ролям процессов (app/infra/db/engine.py)
+    DB_ROLE: str = "script"  # роль процесса, если точка входа не задала её сама
+    DB_APPLICATION_NAME: str = "poetry-bot"  # префикс application_name, к нему добавляется роль
+    DB_PGBOUNCER: bool = False  # подключение через pgbouncer в режиме transaction pooling
+    DB_POOL_TIMEOUT: float = 30.0  # сек ожидания свободного соединения
+    DB_POOL_RECYCLE: float = 1800.0  # сек, после которых соединение открывается заново
+    DB_POOL_SLOW_ACQUIRE: float = 0.1  # сек; получение соединения дольше считается медленным
+    DB_POOL_METRICS_INTERVAL: float = 10.0  # сек между записями счётчиков пула в Redis
+    DB_STATEMENT_TIMEOUT: float = 30.0  # сек, для бота, воркеров и релея; 0 — без ограничения
+    WEB_DB_STATEMENT_TIMEOUT: float = 60.0
+    BOT_DB_POOL_SIZE: int = 10
+    BOT_DB_MAX_OVERFLOW: int = 5
+    WEB_DB_POOL_SIZE: int = 5
+    WEB_DB_MAX_OVERFLOW: int = 5
+    OUTBOX_DB_POOL_SIZE: int = 2
+    OUTBOX_DB_MAX_OVERFLOW: int = 0
+
+    # Worker
+    WORKER_MAX_IN_FLIGHT: int = 200  # максимум одновременно выполняемых стадий в одном процессе
+    WORKER_DB_POOL_SIZE: int = 20
+    WORKER_DB_MAX_OVERFLOW: int = 10
+    WORKER_HTTP_WARM_UP: bool = True
+    WORKER_VISIBILITY_TIMEOUT: int = 900  # сек до повторной выдачи неподтверждённой задачи
+
+    # Справедливый планировщик этапов
+    SCHED_MAX_IN_FLIGHT: int = 400  # этапов в Celery и в работе одновременно, на все воркеры
+    SCHED_USER_MAX_IN_FLIGHT: int = 2  # из них у одного пользователя
+    SCHED_BULK_MAX_IN_FLIGHT: int = 100  # из них перезапусков и бэкфиллов
+    SCHED_BULK_RATE_PER_MINUTE: int = 60  # темп выдачи перезапусков и бэкфиллов, 0 — без ограничения
+    SCHED_INFLIGHT_LEASE: int = 600  # сек, после которых слот незавершённого этапа освобождается
+    SCHED_JOB_TTL: int = 86400  # сек защиты от повторной постановки этапа
+
+    # Аренда и повторы этапов. Аренда должна быть длиннее task_time_limit (300 сек):
+    # пока воркер жив, этап не отдадут другому
+    STAGE_LEASE_SECONDS: int = 360
+    STAGE_MAX_ATTEMPTS: int = 4
+    STAGE_RETRY_BASE_DELAY: float = 10.0  # сек, удваивается с каждой попыткой
+    STAGE_RETRY_MAX_DELAY: float = 120.0
+    STAGE_QUEUE_DEADLINE: int = 1800  # сек ожидания оплаченного этапа, после которых постановка повторяется
+
+    # Outbox: постановка этапов в одной транзакции со сменой статуса
+    OUTBOX_BATCH_SIZE: int = 200
+    OUTBOX_POLL_INTERVAL: float = 0.5  # сек между опросами пустого outbox
+    OUTBOX_MAX_ATTEMPTS: int = 10  # после стольких ошибок сообщение остаётся в таблице для разбора
+    OUTBOX_RETENTION_DAYS: int = 7
+
+    # HTTP-клиенты AI провайдеров
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_READ_TIMEOUT: float = 60.0
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0
+
+    # Лимиты обращений к AI провайдерам (сами лимиты задаются в ProviderConfig)
+    PROVIDER_LIMIT_MAX_WAIT: float = 240.0  # сколько стадия ждёт квоту, прежде чем упасть, сек
+    PROVIDER_SLOT_LEASE: float = 300.0  # аренда слота конкурентности на случай падения воркера, сек
+    PROVIDER_BUSY_DELAY: float = 5.0  # через сколько вернуть этап в работу, если квоты провайдера нет, сек
+    PROVIDER_KEY_COOLDOWN: float = 60.0  # пауза ключа после 429, если провайдер не прислал Retry-After, сек
+
+    # Телеметрия запросов к AI провайдерам (таблица provider_calls)
+    PROVIDER_TELEMETRY_ENABLED: bool = True
+    PROVIDER_TELEMETRY_BATCH_SIZE: int = 200  # записей в одной вставке
+    PROVIDER_TELEMETRY_FLUSH_INTERVAL: float = 5.0  # сек, не дольше стольких записи ждут в памяти
+    PROVIDER_TELEMETRY_MAX_BUFFER: int = 10000  # при недоступной БД старые записи сверх этого отбрасываются
+    PROVIDER_TELEMETRY_RETENTION_DAYS: int = 90
+
+    # Сводка для дашборда (таблица daily_metrics)
+    METRICS_ROLLUP_INTERVAL: float = 300.0  # как часто пересчитываются последние дни, сек
+    METRICS_ROLLUP_LOOKBACK_DAYS: int = 2  # сколько прошлых дней пересчитывается заново; не меньше срока подтверждения платежа
+    METRICS_ROLLUP_CHUNK_DAYS: int = 31  # дней в одной транзакции при первом заполнении
+
+    # Кэш конфигурации (провайдеры, продукты, контент-политики)
+    CONFIG_CACHE_TTL: float = 60.0  # страховка на случай потери сообщения об инвалидации
+
+    # Потоковая генерация стихов
+    POEM_STREAMING_ENABLED: bool = True
+    STREAM_PUBLISH_INTERVAL: float = 0.3  # как часто воркер публикует накопленный текст, сек
+    BOT_LIVE_EDIT_INTERVAL: float = 1.5  # минимальный интервал между editMessageText для одного сообщения, сек
+
+    # Хеджирование запросов POEM: запасной провайдер из матрицы допустимых,
+    # если основной не ответил за перцентиль своей задержки
+    POEM_HEDGE_ENABLED: bool = True
+    POEM_HEDGE_PERCENTILE: float = 0.9
+    POEM_HEDGE_MIN_SAMPLES: int = 20  # до набора статистики используется POEM_HEDGE_DEFAULT_DELAY
+    POEM_HEDGE_DEFAULT_DELAY: float = 8.0  # сек
+    POEM_HEDGE_MIN_DELAY: float = 2.0  # сек
+    POEM_HEDGE_MAX_DELAY: float = 30.0  # сек
+
+    # Адаптивный выбор провайдера (режим adaptive в конфигурации этапа)
+    ROUTING_EWMA_ALPHA: float = 0.2  # вес нового замера в скользящих средних
+    ROUTING_LATENCY_WEIGHT: float = 1.0  # стоимость секунды средней задержки
+    ROUTING_ERROR_WEIGHT: float = 30.0  # стоимость 100% ошибок, в тех же «секундах»
+    ROUTING_DEFAULT_LATENCY: float = 8.0  # сек, оценка задержки кандидата без данных
+    ROUTING_BREAKER_FAILURES: int = 5  # ошибок подряд, после которых кандидат отключается
+    ROUTING_BREAKER_ERROR_RATE: float = 0.5  # или такая доля ошибок ...
+    ROUTING_BREAKER_MIN_SAMPLES: int = 10  # ... при стольких замерах
+    ROUTING_BREAKER_COOLDOWN: float = 60.0  # сек до пробного запроса к отключённому кандидату
+    ROUTING_PROBE_INTERVAL: float = 300.0  # сек; кандидат без свежих данных получает пробный этап
+    ROUTING_STATS_TTL: int = 7 * 24 * 60 * 60  # сек хранения статистики неиспользуемого кандидата
+
+    # Синтез речи
+    TTS_AUDIO_FORMAT: str = "mp3"  # mp3 или oggopus
+    TTS_CHUNK_MAX_CHARS: int = 1000  # куски длиннее делятся по предложениям (лимит SpeechKit — 5000)
+    TTS_MAX_CONCURRENCY: int = 4  # одновременных запросов синтеза на одну стадию
+    TTS_CACHE_ENABLED: bool = True
+    TTS_CACHE_TTL: int = 30 * 24 * 60 * 60  # запись индекса живёт столько с последнего попадания, сек
+
     # Bot
     BOT_TOKEN: SecretStr
 
@@ -48,12 +155,16 @@ class Settings(BaseSettings):
     SUNO_API_KEY: SecretStr | None = None
     PIKA_API_KEY: SecretStr | None = None
     GEMINI_API_KEY: SecretStr | None = None
+    OPENAI_API_KEY: SecretStr | None = None
 
     # Object Storage
     S3_ACCESS_KEY: SecretStr | None = None
     S3_SECRET_KEY: SecretStr | None = None
     S3_BUCKET_NAME: str | None = None
     S3_ENDPOINT_URL: str = "https://storage.yandexcloud.net"
+    S3_MAX_POOL_CONNECTIONS: int = 50
+    S3_MULTIPART_PART_SIZE: int = 8 * 1024 * 1024  # не меньше 5 МБ, требование S3
+    S3_PRESIGNED_URL_TTL: int = 3600  # сек
 
 
 settings = Settings()
\ No newline at end of file
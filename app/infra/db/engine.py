@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Optional
+from uuid import uuid4
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.infra import metrics
+from app.infra.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Счётчики пула в общем hash метрик: db.pool.<роль>.<счётчик>
+METRIC_PREFIX = "db.pool"
+
+# Предел длины application_name в PostgreSQL (NAMEDATALEN - 1)
+_APPLICATION_NAME_MAX = 63
+
+
+class DbRole(StrEnum):
+    BOT = "bot"
+    WEB = "web"
+    WORKER = "worker"
+    OUTBOX = "outbox"
+    SCRIPT = "script"
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    pool_size: int
+    max_overflow: int
+    statement_timeout: float  # сек, 0 — без ограничения
+    pre_ping: bool = True
+
+
+def pool_config(role: DbRole) -> PoolConfig:
+    """
+    Форма пула для роли процесса. Соединений с базой (или с pgbouncer) не больше
+    (pool_size + max_overflow) × число процессов роли — по этой сумме считается max_connections.
+    """
+    configs = {
+        DbRole.BOT: PoolConfig(settings.BOT_DB_POOL_SIZE, settings.BOT_DB_MAX_OVERFLOW, settings.DB_STATEMENT_TIMEOUT),
+        # Аналитика и дашборд читают большие диапазоны — им нужен запас по времени запроса
+        DbRole.WEB: PoolConfig(settings.WEB_DB_POOL_SIZE, settings.WEB_DB_MAX_OVERFLOW, settings.WEB_DB_STATEMENT_TIMEOUT),
+        DbRole.WORKER: PoolConfig(
+            settings.WORKER_DB_POOL_SIZE, settings.WORKER_DB_MAX_OVERFLOW, settings.DB_STATEMENT_TIMEOUT
+        ),
+        DbRole.OUTBOX: PoolConfig(
+            settings.OUTBOX_DB_POOL_SIZE, settings.OUTBOX_DB_MAX_OVERFLOW, settings.DB_STATEMENT_TIMEOUT
+        ),
+        # Скрипты обслуживания (переносы, проверки) короткоживущие и могут выполнять долгие запросы
+        DbRole.SCRIPT: PoolConfig(2, 0, 0, pre_ping=False),
+    }
+    return configs[role]
+
+
+class PoolStats:
+    """
+    Счётчики получения соединений из пула процесса. Копятся в памяти и раз в
+    DB_POOL_METRICS_INTERVAL секунд добавляются в hash метрик одним запросом к Redis.
+    """
+
+    def __init__(self, role: DbRole):
+        self.role = role
+        self._pending: Counter = Counter()
+        self._last_flush = time.monotonic()
+        self._flushing: Optional[asyncio.Task] = None
+
+    def record_checkout(self, wait: float) -> None:
+        self._add(checkouts=1, wait_ms=round(wait * 1000), slow=int(wait >= settings.DB_POOL_SLOW_ACQUIRE))
+
+    def record_timeout(self) -> None:
+        self._add(timeouts=1)
+
+    def _add(self, **deltas: int) -> None:
+        self._pending.update(deltas)
+        now = time.monotonic()
+        if now - self._last_flush < settings.DB_POOL_METRICS_INTERVAL:
+            return
+        if self._flushing is not None and not self._flushing.done():
+            return
+        try:
+            # Пул вызывается из кода на event loop'е процесса; вне его (sync-скрипты) счётчики просто копятся
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._last_flush = now
+        pending, self._pending = self._pending, Counter()
+        values = {f"{METRIC_PREFIX}.{self.role}.{name}": amount for name, amount in pending.items() if amount}
+        self._flushing = loop.create_task(metrics.incr_many(values))
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул, замеряющий время получения соединения: ожидание свободного соединения
+    и открытие нового, если пул ещё не заполнен.
+    """
+
+    stats: Optional[PoolStats] = None
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.stats is not None:
+                self.stats.record_timeout()
+            raise
+        if self.stats is not None:
+            self.stats.record_checkout(time.monotonic() - started)
+        return connection
+
+    def recreate(self):
+        # dispose() заменяет пул новым экземпляром — счётчики переходят к нему
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def _prepared_statement_name() -> str:
+    return f"__asyncpg_{uuid4()}__"
+
+
+def create_engine(role: DbRole, url: Optional[str] = None, **engine_kwargs) -> AsyncEngine:
+    """
+    Создаёт движок для роли процесса: размер пула, проверка соединений, время жизни,
+    statement_timeout и application_name (виден в pg_stat_activity) берутся из настроек роли.
+    engine_kwargs переопределяют любые параметры create_async_engine.
+    """
+    config = pool_config(role)
+    application_name = f"{settings.DB_APPLICATION_NAME}-{role}"[:_APPLICATION_NAME_MAX]
+    timeout_ms = int(config.statement_timeout * 1000)
+
+    server_settings = {"application_name": application_name}
+    connect_args: dict = {"server_settings": server_settings}
+    if settings.DB_PGBOUNCER:
+        # В режиме transaction pooling каждая транзакция может уйти в другое серверное
+        # соединение: подготовленный запрос из кеша asyncpg там не найдётся, а имя
+        # "__asyncpg_stmt_1__" совпадёт с чужим. Кеши отключаем, имена делаем уникальными.
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=_prepared_statement_name,
+        )
+    elif timeout_ms:
+        server_settings["statement_timeout"] = str(timeout_ms)
+
+    kwargs = dict(
+        echo=False,
+        poolclass=InstrumentedQueuePool,
+        pool_size=config.pool_size,
+        max_overflow=config.max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=config.pre_ping,
+        connect_args=connect_args,
+    )
+    kwargs.update(engine_kwargs)
+    engine = create_async_engine(url or settings.FINAL_DATABASE_URL, **kwargs)
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.stats = PoolStats(role)
+
+    if settings.DB_PGBOUNCER and timeout_ms:
+        # pgbouncer не пропускает statement_timeout в параметрах подключения, а SET на сессию
+        # достался бы следующему клиенту серверного соединения. SET LOCAL действует до конца транзакции.
+        @event.listens_for(engine.sync_engine, "begin")
+        def _set_statement_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+    logger.info(
+        f"Database engine for role {role}: pool_size={kwargs['pool_size']}, "
+        f"max_overflow={kwargs['max_overflow']}, statement_timeout={timeout_ms}ms, "
+        f"pgbouncer={settings.DB_PGBOUNCER}"
+    )
+    return engine
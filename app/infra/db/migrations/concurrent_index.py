@@ -0,0 +1,27 @@
+"""
+Общие помощники миграций, строящих индексы CREATE INDEX CONCURRENTLY.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+def drop_invalid_index(name: str) -> None:
+    """
+    Удаляет индекс name, если он остался в состоянии INVALID.
+
+    Прерванный CREATE INDEX CONCURRENTLY оставляет такой индекс: он замедляет запись,
+    но не используется, а IF NOT EXISTS при повторе миграции его не перестроит.
+    Вызывается внутри autocommit_block перед созданием индекса.
+    """
+    bind = op.get_bind()
+    if op.get_context().as_sql or bind.dialect.name != 'postgresql':
+        return
+    invalid = bind.execute(
+        sa.text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ),
+        {'name': name},
+    ).scalar()
+    if invalid:
+        op.drop_index(name, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,54 @@
+"""add_provider_calls
+
+Revision ID: a1d4e7c2b8f3
+Revises: f5c1d8e3b9a2
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1d4e7c2b8f3'
+down_revision: Union[str, Sequence[str], None] = 'f5c1d8e3b9a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'provider_calls',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+        sa.Column('provider_kind', sa.String(), nullable=False),
+        sa.Column('model', sa.String(), nullable=True),
+        sa.Column('operation', sa.String(), nullable=False),
+        sa.Column('key_fingerprint', sa.String(length=16), nullable=True),
+        sa.Column('stage_id', sa.Uuid(), nullable=True),
+        sa.Column('stage_type', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('http_status', sa.Integer(), nullable=True),
+        sa.Column('latency_ms', sa.Integer(), nullable=False),
+        sa.Column('first_chunk_ms', sa.Integer(), nullable=True),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+        sa.Column('completion_tokens', sa.Integer(), nullable=True),
+        sa.Column('response_bytes', sa.Integer(), nullable=True),
+        sa.Column('finish_reason', sa.String(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_provider_calls_created_at', 'provider_calls', ['created_at'], unique=False)
+    op.create_index(
+        'ix_provider_calls_provider_model', 'provider_calls', ['provider_kind', 'model', 'created_at'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_provider_calls_provider_model', table_name='provider_calls')
+    op.drop_index('ix_provider_calls_created_at', table_name='provider_calls')
+    op.drop_table('provider_calls')
@@ -0,0 +1,30 @@
+"""add_provider_routing_mode
+
+Revision ID: b3e8f1a6c4d2
+Revises: a1d4e7c2b8f3
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e8f1a6c4d2'
+down_revision: Union[str, Sequence[str], None] = 'a1d4e7c2b8f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('provider_configs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('routing_mode', sa.String(), server_default='manual', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('provider_configs', schema=None) as batch_op:
+        batch_op.drop_column('routing_mode')
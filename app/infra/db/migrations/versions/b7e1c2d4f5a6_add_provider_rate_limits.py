@@ -0,0 +1,34 @@
+"""add_provider_rate_limits
+
+Revision ID: b7e1c2d4f5a6
+Revises: 9030d45b63be
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e1c2d4f5a6'
+down_revision: Union[str, Sequence[str], None] = '9030d45b63be'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('provider_configs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rate_limit_rpm', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('rate_limit_burst', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('max_concurrency', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('provider_configs', schema=None) as batch_op:
+        batch_op.drop_column('max_concurrency')
+        batch_op.drop_column('rate_limit_burst')
+        batch_op.drop_column('rate_limit_rpm')
@@ -0,0 +1,30 @@
+"""add_api_key_cooldown
+
+Revision ID: c4f2a8e1d9b3
+Revises: b7e1c2d4f5a6
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4f2a8e1d9b3'
+down_revision: Union[str, Sequence[str], None] = 'b7e1c2d4f5a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('api_keys', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('cooldown_until', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('api_keys', schema=None) as batch_op:
+        batch_op.drop_column('cooldown_until')
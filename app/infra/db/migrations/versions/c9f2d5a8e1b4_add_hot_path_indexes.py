@@ -0,0 +1,52 @@
+"""add_hot_path_indexes
+
+Revision ID: c9f2d5a8e1b4
+Revises: b3e8f1a6c4d2
+Create Date: 2026-10-17 21:00:00.000000
+
+Индексы строятся CREATE INDEX CONCURRENTLY — без блокировки записи в таблицы,
+миграцию можно применять на работающей системе. CONCURRENTLY нельзя выполнять
+в транзакции, поэтому каждый индекс создаётся в autocommit_block.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.infra.db.migrations.concurrent_index import drop_invalid_index
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9f2d5a8e1b4'
+down_revision: Union[str, Sequence[str], None] = 'b3e8f1a6c4d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_STAGES_WHERE = sa.text("status IN ('paid', 'queued', 'processing')")
+
+INDEXES = [
+    ('ix_artifacts_order_id_type_created_at', 'artifacts', ['order_id', 'type', 'created_at'], {}),
+    ('ix_artifacts_stage_id', 'artifacts', ['stage_id'], {}),
+    ('ix_orders_user_id_created_at', 'orders', ['user_id', 'created_at'], {}),
+    ('ix_order_stages_order_id', 'order_stages', ['order_id'], {}),
+    ('ix_order_stages_active', 'order_stages', ['status', 'updated_at'], {'postgresql_where': ACTIVE_STAGES_WHERE}),
+    ('ix_payments_order_id_status', 'payments', ['order_id', 'status'], {}),
+    ('ix_provider_configs_stage_type', 'provider_configs', ['stage_type'], {}),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            drop_invalid_index(name)
+            op.create_index(
+                name, table, columns, unique=False, postgresql_concurrently=True, if_not_exists=True, **kwargs
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
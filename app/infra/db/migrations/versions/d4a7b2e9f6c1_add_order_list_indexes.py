@@ -0,0 +1,42 @@
+"""add_order_list_indexes
+
+Revision ID: d4a7b2e9f6c1
+Revises: c9f2d5a8e1b4
+Create Date: 2026-10-17 23:00:00.000000
+
+Индексы для постраничной навигации по списку заказов в админке. Строятся
+CREATE INDEX CONCURRENTLY, как и в c9f2d5a8e1b4.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.infra.db.migrations.concurrent_index import drop_invalid_index
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7b2e9f6c1'
+down_revision: Union[str, Sequence[str], None] = 'c9f2d5a8e1b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_orders_created_at_id', 'orders', ['created_at', 'id']),
+    ('ix_orders_status_created_at_id', 'orders', ['status', 'created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            drop_invalid_index(name)
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
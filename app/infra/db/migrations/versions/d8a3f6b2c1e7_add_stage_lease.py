@@ -0,0 +1,34 @@
+"""add_stage_lease
+
+Revision ID: d8a3f6b2c1e7
+Revises: c4f2a8e1d9b3
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a3f6b2c1e7'
+down_revision: Union[str, Sequence[str], None] = 'c4f2a8e1d9b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('order_stages', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('lease_owner', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True))
+        batch_op.add_column(sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('order_stages', schema=None) as batch_op:
+        batch_op.drop_column('attempts')
+        batch_op.drop_column('lease_expires_at')
+        batch_op.drop_column('lease_owner')
@@ -0,0 +1,42 @@
+"""add_outbox
+
+Revision ID: e2b7c9d4a6f1
+Revises: d8a3f6b2c1e7
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7c9d4a6f1'
+down_revision: Union[str, Sequence[str], None] = 'd8a3f6b2c1e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'outbox',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('topic', sa.String(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+        sa.Column('dispatched_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        'ix_outbox_pending', 'outbox', ['id'], unique=False, postgresql_where=sa.text('dispatched_at IS NULL')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_outbox_pending', table_name='outbox', postgresql_where=sa.text('dispatched_at IS NULL'))
+    op.drop_table('outbox')
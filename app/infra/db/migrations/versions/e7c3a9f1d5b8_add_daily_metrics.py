@@ -0,0 +1,55 @@
+"""add_daily_metrics
+
+Revision ID: e7c3a9f1d5b8
+Revises: d4a7b2e9f6c1
+Create Date: 2026-10-18 10:00:00.000000
+
+Таблица daily_metrics заполняется задачей rollup_daily_metrics_task: первый запуск
+пересчитывает всю историю, дальше — только последние дни. Индексы по created_at
+для пересчёта строятся CONCURRENTLY, как в c9f2d5a8e1b4.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.infra.db.migrations.concurrent_index import drop_invalid_index
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c3a9f1d5b8'
+down_revision: Union[str, Sequence[str], None] = 'd4a7b2e9f6c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_users_created_at', 'users', ['created_at']),
+    ('ix_payments_created_at', 'payments', ['created_at']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'daily_metrics',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('new_users', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('orders', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('paid_orders', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('payments', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('revenue', sa.BigInteger(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+        sa.PrimaryKeyConstraint('day'),
+    )
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            drop_invalid_index(name)
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    op.drop_table('daily_metrics')
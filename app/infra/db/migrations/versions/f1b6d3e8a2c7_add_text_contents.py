@@ -0,0 +1,77 @@
+"""add_text_contents
+
+Revision ID: f1b6d3e8a2c7
+Revises: e7c3a9f1d5b8
+Create Date: 2026-10-18 12:00:00.000000
+
+Тексты стихов переезжают из artifacts.storage_key в text_contents. Миграция только
+меняет схему и не блокирует artifacts надолго: столбец добавляется без значения
+по умолчанию, внешний ключ — NOT VALID с последующей проверкой, которая не мешает
+записи. Существующие строки переносит scripts/backfill_text_contents.py.
+"""
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b6d3e8a2c7'
+down_revision: Union[str, Sequence[str], None] = 'e7c3a9f1d5b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'text_contents',
+        sa.Column('hash', sa.String(length=64), nullable=False),
+        sa.Column('body', sa.LargeBinary(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+        sa.PrimaryKeyConstraint('hash'),
+    )
+    with op.batch_alter_table('artifacts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('text_hash', sa.String(length=64), nullable=True))
+
+    if op.get_context().dialect.name == 'postgresql':
+        # Каждый шаг — отдельной транзакцией: сильная блокировка нужна только на
+        # мгновенное добавление ограничения, проверка идёт под блокировкой, не мешающей записи
+        with op.get_context().autocommit_block():
+            op.execute(
+                "ALTER TABLE artifacts ADD CONSTRAINT fk_artifacts_text_hash_text_contents "
+                "FOREIGN KEY (text_hash) REFERENCES text_contents (hash) NOT VALID"
+            )
+            op.execute("ALTER TABLE artifacts VALIDATE CONSTRAINT fk_artifacts_text_hash_text_contents")
+    else:
+        with op.batch_alter_table('artifacts', schema=None) as batch_op:
+            batch_op.create_foreign_key(
+                'fk_artifacts_text_hash_text_contents', 'text_contents', ['text_hash'], ['hash']
+            )
+
+
+def _restore_texts() -> None:
+    # Тексты сжаты zlib, SQL их не распакует — возвращаем в storage_key из Python
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.text(
+            "SELECT a.id, t.body FROM artifacts a JOIN text_contents t ON t.hash = a.text_hash"
+        )
+    ).all()
+    if rows:
+        bind.execute(
+            sa.text("UPDATE artifacts SET storage_key = :text, text_hash = NULL WHERE id = :id"),
+            [{'id': artifact_id, 'text': zlib.decompress(body).decode('utf-8')} for artifact_id, body in rows],
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not op.get_context().as_sql:
+        _restore_texts()
+    with op.batch_alter_table('artifacts', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_artifacts_text_hash_text_contents', type_='foreignkey')
+        batch_op.drop_column('text_hash')
+    op.drop_table('text_contents')
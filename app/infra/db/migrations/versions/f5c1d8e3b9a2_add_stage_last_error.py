@@ -0,0 +1,30 @@
+"""add_stage_last_error
+
+Revision ID: f5c1d8e3b9a2
+Revises: e2b7c9d4a6f1
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5c1d8e3b9a2'
+down_revision: Union[str, Sequence[str], None] = 'e2b7c9d4a6f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('order_stages', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_error', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('order_stages', schema=None) as batch_op:
+        batch_op.drop_column('last_error')
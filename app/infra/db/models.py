@@ -1,8 +1,8 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, List
 from uuid import UUID, uuid4
 
-from sqlalchemy import BigInteger, Integer, String, ForeignKey, DateTime, Boolean, func, JSON
+from sqlalchemy import BigInteger, Integer, LargeBinary, String, ForeignKey, Date, DateTime, Boolean, Index, func, JSON, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.infra.db.base import Base
@@ -12,12 +12,17 @@ from app.domain.enums import (
     PaymentStatus,
     ProviderKind,
     ArtifactType,
+    RoutingMode,
     StageType,
 )
 
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Пересчёт daily_metrics читает пользователей за последние дни
+        Index("ix_users_created_at", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     telegram_id: Mapped[int] = mapped_column(BigInteger, unique=True, index=True, nullable=False)
@@ -29,6 +34,13 @@ class User(Base):
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        # «Мои заказы»: заказы пользователя от новых к старым
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+        # Список заказов в админке: постраничная навигация по ключу (created_at, id)
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_status_created_at_id", "status", "created_at", "id"),
+    )
 
     id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -45,6 +57,16 @@ class Order(Base):
 
 class OrderStage(Base):
     __tablename__ = "order_stages"
+    __table_args__ = (
+        Index("ix_order_stages_order_id", "order_id"),
+        # Разборщик зависших и поиск ждущих этапов смотрят только незавершённые этапы
+        Index(
+            "ix_order_stages_active",
+            "status",
+            "updated_at",
+            postgresql_where=text("status IN ('paid', 'queued', 'processing')"),
+        ),
+    )
 
     id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
     order_id: Mapped[UUID] = mapped_column(ForeignKey("orders.id"), nullable=False)
@@ -52,6 +74,11 @@ class OrderStage(Base):
     status: Mapped[OrderStageStatus] = mapped_column(String, default=OrderStageStatus.PENDING)
     price: Mapped[int] = mapped_column(BigInteger, default=0)
     input_json: Mapped[dict] = mapped_column(JSON, default=dict)
+    # Аренда этапа воркером: кто выполняет и до какого момента (см. StageRepo.claim)
+    lease_owner: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    last_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
 
@@ -62,6 +89,10 @@ class OrderStage(Base):
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        Index("ix_payments_order_id_status", "order_id", "status"),
+        Index("ix_payments_created_at", "created_at"),
+    )
 
     id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
     order_id: Mapped[UUID] = mapped_column(ForeignKey("orders.id"), nullable=False)
@@ -78,20 +109,47 @@ class Payment(Base):
 
 class Artifact(Base):
     __tablename__ = "artifacts"
+    __table_args__ = (
+        # Последний артефакт заказа нужного типа (ArtifactRepo.get_latest_text_artifact)
+        Index("ix_artifacts_order_id_type_created_at", "order_id", "type", "created_at"),
+        Index("ix_artifacts_stage_id", "stage_id"),
+    )
 
     id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
     order_id: Mapped[UUID] = mapped_column(ForeignKey("orders.id"), nullable=False)
     stage_id: Mapped[UUID] = mapped_column(ForeignKey("order_stages.id"), nullable=True)
     type: Mapped[ArtifactType] = mapped_column(String, nullable=False)
+    # Ключ файла в S3; у текстовых артефактов — ссылка text:<hash> на text_contents
     storage_key: Mapped[str] = mapped_column(String, nullable=False)
+    # Текст стиха (см. ArtifactRepo.get_text); у старых строк до переноса — NULL, текст в storage_key
+    text_hash: Mapped[Optional[str]] = mapped_column(
+        String(64), ForeignKey("text_contents.hash", name="fk_artifacts_text_hash_text_contents"), nullable=True
+    )
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     order: Mapped["Order"] = relationship(back_populates="artifacts")
     stage: Mapped["OrderStage"] = relationship(back_populates="artifacts")
 
 
+class TextContent(Base):
+    """
+    Текст, адресуемый по содержимому: одинаковые тексты хранятся один раз.
+    Списки заказов читают только ссылку из artifacts, сам текст — при выдаче.
+    """
+
+    __tablename__ = "text_contents"
+
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)  # sha256 текста в UTF-8
+    body: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)  # UTF-8, сжатый zlib
+    size: Mapped[int] = mapped_column(Integer, nullable=False)  # длина текста в байтах до сжатия
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
 class ProviderConfig(Base):
     __tablename__ = "provider_configs"
+    __table_args__ = (
+        Index("ix_provider_configs_stage_type", "stage_type"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     stage_type: Mapped[StageType] = mapped_column(String, nullable=False)
@@ -101,6 +159,13 @@ class ProviderConfig(Base):
     models_cache: Mapped[Optional[dict]] = mapped_column(JSON, default=list)
     models_cache_updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
     status: Mapped[Optional[str]] = mapped_column(String, default="active")  # active, invalid, error
+    # Квота провайдера на один ключ API, общая для всех воркеров (None — без ограничения)
+    rate_limit_rpm: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    rate_limit_burst: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    max_concurrency: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    routing_mode: Mapped[RoutingMode] = mapped_column(
+        String, default=RoutingMode.MANUAL, server_default=RoutingMode.MANUAL.value
+    )
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
     
     # Старые поля для совместимости на время миграции (опционально, но лучше обновить сразу)
@@ -118,6 +183,8 @@ class APIKey(Base):
     key_value: Mapped[str] = mapped_column(String, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=False)
     status: Mapped[str] = mapped_column(String, default="active")  # active, invalid, limit_exceeded
+    # До какого момента ключ отдыхает после 429; по истечении снова используется
+    cooldown_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     provider: Mapped["ProviderConfig"] = relationship(back_populates="api_keys")
@@ -136,4 +203,75 @@ class ContentPolicy(Base):
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     policy_type: Mapped[str] = mapped_column(String, unique=True, nullable=False)
-    rules_json: Mapped[dict] = mapped_column(JSON, default=dict)
\ No newline at end of file
+    rules_json: Mapped[dict] = mapped_column(JSON, default=dict)
+
+
+class OutboxMessage(Base):
+    """
+    Исходящее сообщение, записанное в одной транзакции с изменением статуса.
+    Релей (app.infra.queue.outbox) отправляет его дальше и проставляет dispatched_at.
+    """
+
+    __tablename__ = "outbox"
+    __table_args__ = (
+        Index("ix_outbox_pending", "id", postgresql_where=text("dispatched_at IS NULL")),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    topic: Mapped[str] = mapped_column(String, nullable=False)
+    payload: Mapped[dict] = mapped_column(JSON, default=dict)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    last_error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    dispatched_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class ProviderCall(Base):
+    """
+    Один запрос к AI провайдеру: задержка, исход, токены и объём ответа.
+    Пишется пачками (app.infra.ai.telemetry), читается аналитикой админки.
+    """
+
+    __tablename__ = "provider_calls"
+    __table_args__ = (
+        Index("ix_provider_calls_created_at", "created_at"),
+        Index("ix_provider_calls_provider_model", "provider_kind", "model", "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    provider_kind: Mapped[ProviderKind] = mapped_column(String, nullable=False)
+    model: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    operation: Mapped[str] = mapped_column(String, nullable=False)  # generate, stream, synthesize
+    key_fingerprint: Mapped[Optional[str]] = mapped_column(String(16), nullable=True)
+    # Без внешнего ключа: телеметрия не мешает удалять этапы и пишется без лишних проверок
+    stage_id: Mapped[Optional[UUID]] = mapped_column(nullable=True)
+    stage_type: Mapped[Optional[StageType]] = mapped_column(String, nullable=True)
+    status: Mapped[str] = mapped_column(String, nullable=False)  # ok, error, cancelled
+    http_status: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    latency_ms: Mapped[int] = mapped_column(Integer, nullable=False)
+    first_chunk_ms: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    prompt_tokens: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    completion_tokens: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    response_bytes: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    finish_reason: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+
+
+class DailyMetric(Base):
+    """
+    Сводка за день (UTC) для дашборда. Пересчитывается периодической задачей
+    (DailyMetricsRepo.rollup) за последние дни; дашборд читает только эту таблицу.
+    """
+
+    __tablename__ = "daily_metrics"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    new_users: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    orders: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    # Заказы, впервые оплаченные в этот день (по дню первого успешного платежа)
+    paid_orders: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    # Успешные платежи в RUB, созданные в этот день, и их сумма в копейках
+    payments: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    revenue: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -1,10 +1,12 @@
-from typing import Optional
+from typing import Optional, Tuple
 from uuid import UUID
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.domain.enums import ArtifactType
 from app.infra.db.models import Artifact
 from app.infra.db.repositories.base import BaseRepo
+from app.infra.db.repositories.text_content_repo import TextContentRepo, content_hash, text_storage_key
 
 
 class ArtifactRepo(BaseRepo[Artifact]):
@@ -15,7 +17,6 @@ class ArtifactRepo(BaseRepo[Artifact]):
         """
         Возвращает последний текстовый артефакт (стих) для заказа.
         """
-        from app.domain.enums import ArtifactType
         stmt = (
             select(Artifact)
             .where(Artifact.order_id == order_id, Artifact.type == ArtifactType.TEXT)
@@ -23,4 +24,72 @@ class ArtifactRepo(BaseRepo[Artifact]):
             .limit(1)
         )
         result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
\ No newline at end of file
+        return result.scalar_one_or_none()
+
+    async def add_text(self, order_id: UUID, stage_id: UUID, text: str) -> Artifact:
+        """
+        Текстовый артефакт: текст — в text_contents, в артефакте — только ссылка. Без коммита.
+        """
+        text_hash = await TextContentRepo(self.session).put(text)
+        artifact = Artifact(
+            order_id=order_id,
+            stage_id=stage_id,
+            type=ArtifactType.TEXT,
+            storage_key=text_storage_key(text_hash),
+            text_hash=text_hash,
+        )
+        self.session.add(artifact)
+        return artifact
+
+    async def get_stage_text_artifact(self, stage_id: UUID) -> Optional[Artifact]:
+        """
+        Текстовый артефакт стадии, если стадия уже сохранила результат.
+        """
+        stmt = (
+            select(Artifact)
+            .where(Artifact.stage_id == stage_id, Artifact.type == ArtifactType.TEXT)
+            .order_by(Artifact.created_at.desc())
+            .limit(1)
+        )
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def get_text(self, artifact: Artifact) -> Optional[str]:
+        """
+        Текст текстового артефакта. Строки, ещё не перенесённые в text_contents,
+        хранят текст прямо в storage_key.
+        """
+        if artifact.text_hash is None:
+            return artifact.storage_key
+        return await TextContentRepo(self.session).get(artifact.text_hash)
+
+    async def backfill_text_batch(self, after: Optional[UUID], limit: int) -> Tuple[Optional[UUID], int]:
+        """
+        Переносит в text_contents тексты следующих limit текстовых артефактов после after
+        (по id). Блокируются только строки пачки, занятые другими транзакциями пропускаются.
+        Возвращает id последнего просмотренного артефакта (None — дошли до конца)
+        и число перенесённых. Без коммита.
+        """
+        stmt = (
+            select(Artifact.id, Artifact.storage_key)
+            .where(Artifact.type == ArtifactType.TEXT, Artifact.text_hash.is_(None))
+            .order_by(Artifact.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        if after is not None:
+            stmt = stmt.where(Artifact.id > after)
+        rows = (await self.session.execute(stmt)).all()
+        if not rows:
+            return None, 0
+
+        hashes = {artifact_id: content_hash(text) for artifact_id, text in rows}
+        await TextContentRepo(self.session).put_many({hashes[artifact_id]: text for artifact_id, text in rows})
+        await self.session.execute(
+            update(Artifact),
+            [
+                {"id": artifact_id, "text_hash": text_hash, "storage_key": text_storage_key(text_hash)}
+                for artifact_id, text_hash in hashes.items()
+            ],
+        )
+        return rows[-1].id, len(rows)
@@ -1,12 +1,17 @@
-from typing import Optional, List
+from datetime import datetime
+from typing import Optional, List, TYPE_CHECKING
+from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.infra.db.models import ProviderConfig, ProductConfig, ContentPolicy
+from app.infra.db.models import APIKey, ProviderConfig, ProductConfig, ContentPolicy
 from app.domain.enums import ProviderKind, StageType
 from app.infra.utils.crypto import encryption_service
 
+if TYPE_CHECKING:
+    from app.infra.cache.config_snapshot import ConfigSnapshot
+
 
 class ConfigRepo:
     def __init__(self, session: AsyncSession):
@@ -20,6 +25,25 @@ class ConfigRepo:
         result = await self.session.execute(select(ProviderConfig))
         return list(result.scalars().all())
 
+    async def get_usable_api_keys(self) -> List[APIKey]:
+        """
+        Ключи, которые можно раздавать воркерам: включённые и не признанные недействительными.
+        Ключи на паузе после 429 тоже возвращаются — пауза учитывается при выборе ключа.
+        """
+        result = await self.session.execute(
+            select(APIKey)
+            .where(APIKey.is_active.is_(True), APIKey.status != "invalid")
+            .order_by(APIKey.created_at)
+        )
+        return list(result.scalars().all())
+
+    async def mark_api_key_limited(self, key_id: UUID, cooldown_until: datetime) -> None:
+        await self.session.execute(
+            update(APIKey)
+            .where(APIKey.id == key_id)
+            .values(status="limit_exceeded", cooldown_until=cooldown_until)
+        )
+
     def decrypt_api_key(self, encrypted_key: Optional[str]) -> Optional[str]:
         if not encrypted_key:
             return None
@@ -29,6 +53,21 @@ class ConfigRepo:
         result = await self.session.execute(select(ProductConfig).where(ProductConfig.key == key))
         return result.scalars().first()
 
+    async def get_all_product_configs(self) -> List[ProductConfig]:
+        result = await self.session.execute(select(ProductConfig))
+        return list(result.scalars().all())
+
     async def get_content_policy(self, policy_type: str) -> Optional[ContentPolicy]:
         result = await self.session.execute(select(ContentPolicy).where(ContentPolicy.policy_type == policy_type))
-        return result.scalars().first()
\ No newline at end of file
+        return result.scalars().first()
+
+    async def get_all_content_policies(self) -> List[ContentPolicy]:
+        result = await self.session.execute(select(ContentPolicy))
+        return list(result.scalars().all())
+
+    async def get_snapshot(self) -> "ConfigSnapshot":
+        """
+        Возвращает закэшированный снимок всей конфигурации (без запросов к БД, пока он актуален).
+        """
+        from app.infra.cache.config_snapshot import config_snapshot_cache
+        return await config_snapshot_cache.get()
\ No newline at end of file
@@ -0,0 +1,151 @@
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import Date, cast, exists, func, select
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.domain.enums import PaymentStatus
+from app.infra.db.models import DailyMetric, Order, Payment, User
+
+_COUNTERS = ("new_users", "orders", "paid_orders", "payments", "revenue")
+
+
+def _utc_day(column):
+    return cast(func.timezone("UTC", column), Date)
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+@dataclass
+class MetricsTotals:
+    users: int
+    orders: int
+    paid_orders: int
+    payments: int
+    revenue: int  # копейки
+    updated_at: Optional[datetime]
+
+
+class DailyMetricsRepo:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def watermark(self) -> Optional[date]:
+        """
+        Последний пересчитанный день; None — таблица ещё не заполнялась.
+        """
+        return await self.session.scalar(select(func.max(DailyMetric.day)))
+
+    async def first_day(self) -> Optional[date]:
+        """
+        День первой записи в истории — с него начинается первый пересчёт.
+        """
+        first = [
+            await self.session.scalar(select(func.min(User.created_at))),
+            await self.session.scalar(select(func.min(Order.created_at))),
+        ]
+        first = [value for value in first if value is not None]
+        return min(first).astimezone(timezone.utc).date() if first else None
+
+    async def rollup(self, start: date, end: date) -> int:
+        """
+        Пересчитывает дни с start по end включительно и записывает их поверх прежних
+        значений. Читаются только строки этих дней (индексы по created_at). Без коммита.
+        """
+        since, until = _day_start(start), _day_start(end + timedelta(days=1))
+        days = {
+            start + timedelta(days=offset): dict.fromkeys(_COUNTERS, 0)
+            for offset in range((end - start).days + 1)
+        }
+
+        day = _utc_day(User.created_at)
+        users = await self.session.execute(
+            select(day, func.count())
+            .where(User.created_at >= since, User.created_at < until)
+            .group_by(day)
+        )
+        for row_day, count in users.all():
+            days[row_day]["new_users"] = count
+
+        day = _utc_day(Order.created_at)
+        orders = await self.session.execute(
+            select(day, func.count())
+            .where(Order.created_at >= since, Order.created_at < until)
+            .group_by(day)
+        )
+        for row_day, count in orders.all():
+            days[row_day]["orders"] = count
+
+        # Оплаченный заказ относится к дню первого успешного платежа по нему, а не к дню
+        # создания заказа: оплата, пришедшая позже, попадает в пересчитываемые последние дни
+        day = _utc_day(Payment.created_at)
+        earlier = aliased(Payment)
+        paid_orders = await self.session.execute(
+            select(day, func.count(func.distinct(Payment.order_id)))
+            .where(
+                Payment.created_at >= since,
+                Payment.created_at < until,
+                Payment.status == PaymentStatus.SUCCEEDED,
+                ~exists().where(
+                    earlier.order_id == Payment.order_id,
+                    earlier.status == PaymentStatus.SUCCEEDED,
+                    earlier.created_at < Payment.created_at,
+                ),
+            )
+            .group_by(day)
+        )
+        for row_day, count in paid_orders.all():
+            days[row_day]["paid_orders"] = count
+
+        # Выручка — успешные платежи в RUB по дню платежа
+        payments = await self.session.execute(
+            select(day, func.count(), func.coalesce(func.sum(Payment.amount), 0))
+            .where(
+                Payment.created_at >= since,
+                Payment.created_at < until,
+                Payment.status == PaymentStatus.SUCCEEDED,
+                Payment.currency == "RUB",
+            )
+            .group_by(day)
+        )
+        for row_day, count, amount in payments.all():
+            days[row_day]["payments"] = count
+            days[row_day]["revenue"] = int(amount)
+
+        stmt = insert(DailyMetric).values([{"day": d, **counters} for d, counters in days.items()])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DailyMetric.day],
+            set_={**{name: stmt.excluded[name] for name in _COUNTERS}, "updated_at": func.now()},
+        )
+        await self.session.execute(stmt)
+        return len(days)
+
+    async def totals(self) -> MetricsTotals:
+        row = (
+            await self.session.execute(
+                select(
+                    *(func.coalesce(func.sum(getattr(DailyMetric, name)), 0) for name in _COUNTERS),
+                    func.max(DailyMetric.updated_at),
+                )
+            )
+        ).one()
+        users, orders, paid_orders, payments, revenue, updated_at = row
+        return MetricsTotals(
+            users=int(users),
+            orders=int(orders),
+            paid_orders=int(paid_orders),
+            payments=int(payments),
+            revenue=int(revenue),
+            updated_at=updated_at,
+        )
+
+    async def series(self, since: date) -> List[DailyMetric]:
+        result = await self.session.execute(
+            select(DailyMetric).where(DailyMetric.day >= since).order_by(DailyMetric.day)
+        )
+        return list(result.scalars().all())
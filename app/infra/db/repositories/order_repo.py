@@ -1,14 +1,77 @@
-from typing import Optional
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.infra.db.models import Order
+from app.domain.enums import OrderStatus, StageType
+from app.infra.db.models import Order, OrderStage, User
 from app.infra.db.repositories.base import BaseRepo
 
 
-from sqlalchemy import select
+from sqlalchemy import exists, or_, select, text, tuple_
 from sqlalchemy.orm import selectinload
 
+
+@dataclass
+class OrderFilter:
+    status: Optional[OrderStatus] = None
+    # Заказы, в которых есть этап этого типа
+    stage_type: Optional[StageType] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    # Внутренний ID пользователя или его Telegram ID
+    user: Optional[int] = None
+
+    def conditions(self) -> list:
+        conditions = []
+        if self.status:
+            conditions.append(Order.status == self.status)
+        if self.stage_type:
+            conditions.append(
+                exists().where(OrderStage.order_id == Order.id, OrderStage.stage_type == self.stage_type)
+            )
+        if self.created_from:
+            conditions.append(Order.created_at >= self.created_from)
+        if self.created_to:
+            conditions.append(Order.created_at < self.created_to)
+        if self.user is not None:
+            conditions.append(
+                Order.user_id.in_(select(User.id).where(or_(User.id == self.user, User.telegram_id == self.user)))
+            )
+        return conditions
+
+
+@dataclass(frozen=True)
+class OrderCursor:
+    """
+    Позиция в списке заказов: (created_at, id) последнего показанного заказа.
+    id различает заказы, созданные в одну и ту же микросекунду.
+    """
+
+    created_at: datetime
+    id: UUID
+
+    @classmethod
+    def of(cls, order: Order) -> "OrderCursor":
+        return cls(order.created_at, order.id)
+
+    def encode(self) -> str:
+        return f"{self.created_at.isoformat()}_{self.id}"
+
+    @classmethod
+    def decode(cls, value: str) -> "OrderCursor":
+        created_at, _, order_id = value.rpartition("_")
+        return cls(datetime.fromisoformat(created_at), UUID(order_id))
+
+
+@dataclass
+class OrderPage:
+    orders: List[Order]
+    newer: Optional[OrderCursor] = None  # курсор предыдущей страницы (более новые заказы)
+    older: Optional[OrderCursor] = None  # курсор следующей страницы (более старые заказы)
+
 class OrderRepo(BaseRepo[Order]):
     def __init__(self, session: AsyncSession):
         super().__init__(session, Order)
@@ -37,4 +100,63 @@ class OrderRepo(BaseRepo[Order]):
             )
         )
         result = await self.session.execute(stmt)
-        return result.scalars().first()
\ No newline at end of file
+        return result.scalars().first()
+
+    async def page(
+        self,
+        order_filter: OrderFilter,
+        after: Optional[OrderCursor] = None,
+        before: Optional[OrderCursor] = None,
+        limit: int = 50,
+    ) -> OrderPage:
+        """
+        Страница заказов от новых к старым, постраничная навигация по ключу (created_at, id):
+        after — заказы старше курсора, before — новее. В отличие от OFFSET, страница
+        читается по индексу одинаково быстро на любой глубине списка.
+        """
+        key = tuple_(Order.created_at, Order.id)
+        stmt = select(Order).where(*order_filter.conditions()).limit(limit + 1)
+        if before is not None:
+            # Страница «назад» читается в обратном порядке и разворачивается
+            stmt = stmt.where(key > tuple_(before.created_at, before.id)).order_by(Order.created_at, Order.id)
+        else:
+            if after is not None:
+                stmt = stmt.where(key < tuple_(after.created_at, after.id))
+            stmt = stmt.order_by(Order.created_at.desc(), Order.id.desc())
+
+        orders = list((await self.session.execute(stmt)).scalars().all())
+        has_more = len(orders) > limit
+        orders = orders[:limit]
+        if before is not None:
+            orders.reverse()
+            has_newer, has_older = has_more, bool(orders)
+        else:
+            has_newer, has_older = after is not None and bool(orders), has_more
+
+        return OrderPage(
+            orders=orders,
+            newer=OrderCursor.of(orders[0]) if has_newer else None,
+            older=OrderCursor.of(orders[-1]) if has_older else None,
+        )
+
+    async def estimate_count(self, order_filter: OrderFilter) -> Optional[int]:
+        """
+        Примерное число заказов под фильтром без COUNT(*): без фильтра — из статистики
+        таблицы, с фильтром — оценка строк из плана запроса. None, если статистики ещё нет.
+        """
+        conditions = order_filter.conditions()
+        if not conditions:
+            reltuples = await self.session.scalar(
+                text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:table)"),
+                {"table": Order.__tablename__},
+            )
+            return int(reltuples) if reltuples is not None and reltuples >= 0 else None
+
+        conn = await self.session.connection()
+        query = select(Order.id).where(*conditions).compile(
+            dialect=conn.dialect, compile_kwargs={"literal_binds": True}
+        )
+        plan = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {query}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
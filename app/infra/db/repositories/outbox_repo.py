@@ -0,0 +1,84 @@
+from datetime import datetime
+from typing import List, Sequence
+from uuid import UUID
+
+from sqlalchemy import String, cast, delete, func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.domain.enums import StageType
+from app.infra.db.models import Order, OrderStage, OutboxMessage, User
+
+# Поставить этап в планировщик генерации
+STAGE_ENQUEUE_TOPIC = "stage.enqueue"
+
+
+class OutboxRepo:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def add(self, topic: str, payload: dict) -> None:
+        """
+        Добавляет сообщение в текущую транзакцию. Коммит — на вызывающем,
+        вместе с изменением, о котором сообщение.
+        """
+        self.session.add(OutboxMessage(topic=topic, payload=payload))
+
+    async def add_stage_enqueue(self, stage_type: StageType, stage_id: UUID, telegram_id: int, lane: str) -> None:
+        await self.add(
+            STAGE_ENQUEUE_TOPIC,
+            {"stage_type": str(stage_type), "stage_id": str(stage_id), "telegram_id": telegram_id, "lane": lane},
+        )
+
+    async def add_stage_enqueue_bulk(self, stage_ids: Sequence[UUID], lane: str) -> int:
+        """
+        Постановка многих этапов одним INSERT ... SELECT, без загрузки строк в Python.
+        """
+        if not stage_ids:
+            return 0
+        payload = func.json_build_object(
+            "stage_type", OrderStage.stage_type,
+            "stage_id", cast(OrderStage.id, String),
+            "telegram_id", User.telegram_id,
+            "lane", lane,
+        )
+        result = await self.session.execute(
+            insert(OutboxMessage).from_select(
+                ["topic", "payload"],
+                select(literal(STAGE_ENQUEUE_TOPIC), payload)
+                .join(Order, Order.id == OrderStage.order_id)
+                .join(User, User.id == Order.user_id)
+                .where(OrderStage.id.in_(stage_ids))
+                .order_by(OrderStage.created_at),
+            )
+        )
+        return result.rowcount
+
+    async def claim_batch(self, limit: int, max_attempts: int) -> List[OutboxMessage]:
+        """
+        Неотправленные сообщения по порядку. Строки блокируются до конца транзакции,
+        SKIP LOCKED позволяет нескольким релеям разбирать outbox параллельно.
+        """
+        result = await self.session.execute(
+            select(OutboxMessage)
+            .where(OutboxMessage.dispatched_at.is_(None), OutboxMessage.attempts < max_attempts)
+            .order_by(OutboxMessage.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return list(result.scalars().all())
+
+    async def mark_dispatched(self, ids: Sequence[int]) -> None:
+        if not ids:
+            return
+        await self.session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(ids))
+            .values(dispatched_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
+    async def delete_dispatched_before(self, cutoff: datetime) -> int:
+        result = await self.session.execute(
+            delete(OutboxMessage).where(OutboxMessage.dispatched_at < cutoff)
+        )
+        return result.rowcount
@@ -0,0 +1,69 @@
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import Row, case, delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.domain.enums import StageType
+from app.infra.db.models import ProviderCall
+
+
+def _latency_percentile(q: float):
+    # Перцентили задержки — только по успешным запросам: ошибки и отмены искажают картину
+    return (
+        func.percentile_cont(q)
+        .within_group(ProviderCall.latency_ms)
+        .filter(ProviderCall.status == "ok")
+    )
+
+
+class ProviderCallRepo:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def daily_stats(self, since: datetime, stage_type: Optional[StageType] = None) -> List[Row]:
+        """
+        Сводка по провайдеру, модели и дню (UTC): число запросов, ошибки, отмены,
+        p50/p95/p99 задержки, задержка до первого фрагмента и расход токенов.
+        """
+        day = func.date_trunc("day", func.timezone("UTC", ProviderCall.created_at)).label("day")
+        errors = func.count().filter(ProviderCall.status == "error")
+        completed = func.count().filter(ProviderCall.status != "cancelled")
+        query = (
+            select(
+                day,
+                ProviderCall.provider_kind,
+                ProviderCall.model,
+                func.count().label("calls"),
+                errors.label("errors"),
+                func.count().filter(ProviderCall.status == "cancelled").label("cancelled"),
+                # Отменённые попытки хеджирования — не ошибки провайдера
+                case((completed > 0, errors * 1.0 / completed), else_=None).label("error_rate"),
+                _latency_percentile(0.5).label("p50_ms"),
+                _latency_percentile(0.95).label("p95_ms"),
+                _latency_percentile(0.99).label("p99_ms"),
+                func.percentile_cont(0.5).within_group(ProviderCall.first_chunk_ms).label("first_chunk_p50_ms"),
+                func.sum(ProviderCall.prompt_tokens).label("prompt_tokens"),
+                func.sum(ProviderCall.completion_tokens).label("completion_tokens"),
+                func.sum(ProviderCall.response_bytes).label("response_bytes"),
+            )
+            .where(ProviderCall.created_at >= since)
+            .group_by(day, ProviderCall.provider_kind, ProviderCall.model)
+            .order_by(day.desc(), ProviderCall.provider_kind, ProviderCall.model)
+        )
+        if stage_type is not None:
+            query = query.where(ProviderCall.stage_type == stage_type)
+        return list((await self.session.execute(query)).all())
+
+    async def recent_errors(self, since: datetime, limit: int = 20) -> List[ProviderCall]:
+        result = await self.session.execute(
+            select(ProviderCall)
+            .where(ProviderCall.created_at >= since, ProviderCall.status == "error")
+            .order_by(ProviderCall.created_at.desc())
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def delete_before(self, cutoff: datetime) -> int:
+        result = await self.session.execute(delete(ProviderCall).where(ProviderCall.created_at < cutoff))
+        return result.rowcount
@@ -1,9 +1,229 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import Row, exists, func, or_, and_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.infra.db.models import OrderStage
+from app.domain.enums import OrderStageStatus, PaymentStatus, ProviderKind, StageType
+from app.infra.db.models import Order, OrderStage, Payment, ProviderConfig, User
 from app.infra.db.repositories.base import BaseRepo
 
+# Статусы, из которых этап можно взять в работу
+CLAIMABLE_STATUSES = (OrderStageStatus.PAID, OrderStageStatus.QUEUED)
+
+# Перезапуск не трогает неоплаченные, выполняемые и готовые этапы. Отменённый
+# этап перезапускается, только если он оплачен (см. StageRepo._requeueable):
+# отменить можно и неоплаченный этап
+REQUEUEABLE_STATUSES = (
+    OrderStageStatus.PAID,
+    OrderStageStatus.QUEUED,
+    OrderStageStatus.FAILED,
+)
+CANCELLABLE_STATUSES = (
+    OrderStageStatus.PENDING,
+    OrderStageStatus.PAID,
+    OrderStageStatus.QUEUED,
+    OrderStageStatus.PROCESSING,
+    OrderStageStatus.FAILED,
+)
+
+
+@dataclass
+class StageFilter:
+    stage_ids: List[UUID] = field(default_factory=list)
+    statuses: List[OrderStageStatus] = field(default_factory=list)
+    stage_types: List[StageType] = field(default_factory=list)
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    # Этапы тех типов, которые сейчас обслуживает этот провайдер
+    provider_kind: Optional[ProviderKind] = None
+
+    def conditions(self) -> list:
+        conditions = []
+        if self.stage_ids:
+            conditions.append(OrderStage.id.in_(self.stage_ids))
+        if self.statuses:
+            conditions.append(OrderStage.status.in_(self.statuses))
+        if self.stage_types:
+            conditions.append(OrderStage.stage_type.in_(self.stage_types))
+        if self.created_from:
+            conditions.append(OrderStage.created_at >= self.created_from)
+        if self.created_to:
+            conditions.append(OrderStage.created_at < self.created_to)
+        if self.provider_kind:
+            conditions.append(
+                OrderStage.stage_type.in_(
+                    select(ProviderConfig.stage_type).where(ProviderConfig.provider_kind == self.provider_kind)
+                )
+            )
+        return conditions
+
 
 class StageRepo(BaseRepo[OrderStage]):
     def __init__(self, session: AsyncSession):
-        super().__init__(session, OrderStage)
\ No newline at end of file
+        super().__init__(session, OrderStage)
+
+    async def claim(self, stage_id: UUID, owner: str, lease_seconds: float) -> Optional[OrderStage]:
+        """
+        Атомарно берёт этап в работу: одним UPDATE ... RETURNING переводит его в PROCESSING
+        и записывает владельца и срок аренды. Этап с истёкшей арендой (воркер упал)
+        можно взять заново. Возвращает None, если этап уже выполняет кто-то другой
+        или он в неподходящем статусе — так повторная доставка задачи не вызовет
+        провайдера второй раз.
+        """
+        stmt = (
+            update(OrderStage)
+            .where(
+                OrderStage.id == stage_id,
+                or_(
+                    OrderStage.status.in_(CLAIMABLE_STATUSES),
+                    and_(
+                        OrderStage.status == OrderStageStatus.PROCESSING,
+                        OrderStage.lease_expires_at < func.now(),
+                    ),
+                ),
+            )
+            .values(
+                status=OrderStageStatus.PROCESSING,
+                lease_owner=owner,
+                lease_expires_at=func.now() + timedelta(seconds=lease_seconds),
+                attempts=OrderStage.attempts + 1,
+            )
+            .returning(OrderStage)
+            .execution_options(populate_existing=True, synchronize_session=False)
+        )
+        stage = (await self.session.scalars(stmt)).first()
+        await self.session.commit()
+        return stage
+
+    async def release_claim(
+        self, stage_id: UUID, owner: str, status: OrderStageStatus, error: Optional[str] = None
+    ) -> bool:
+        """
+        Снимает аренду и ставит итоговый статус, если этап всё ещё принадлежит owner
+        и не был отменён. Возвращает False, если аренду перехватили, — тогда результат
+        этого воркера записывать нельзя. Коммит — на вызывающем, вместе с артефактом.
+        """
+        result = await self.session.execute(
+            update(OrderStage)
+            .where(
+                OrderStage.id == stage_id,
+                OrderStage.lease_owner == owner,
+                OrderStage.status == OrderStageStatus.PROCESSING,
+            )
+            .values(status=status, lease_owner=None, lease_expires_at=None, last_error=error)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    def _stuck_processing(legacy_deadline: timedelta):
+        # Аренда истекла — воркер упал, убит по time limit или при деплое.
+        # Этапы, взятые до появления аренды, — по времени последнего изменения.
+        return and_(
+            OrderStage.status == OrderStageStatus.PROCESSING,
+            or_(
+                OrderStage.lease_expires_at < func.now(),
+                and_(OrderStage.lease_expires_at.is_(None), OrderStage.updated_at < func.now() - legacy_deadline),
+            ),
+        )
+
+    async def fail_stuck(self, max_attempts: int, legacy_deadline: timedelta, reason: str) -> List[Row]:
+        """
+        Переводит в FAILED зависшие этапы, исчерпавшие попытки. Одним UPDATE, без коммита.
+        """
+        result = await self.session.execute(
+            update(OrderStage)
+            .where(self._stuck_processing(legacy_deadline), OrderStage.attempts >= max_attempts)
+            .values(status=OrderStageStatus.FAILED, lease_owner=None, lease_expires_at=None, last_error=reason)
+            .returning(OrderStage.id, OrderStage.order_id, OrderStage.stage_type)
+            .execution_options(synchronize_session=False)
+        )
+        return list(result.all())
+
+    async def requeue_stuck(self, max_attempts: int, legacy_deadline: timedelta, reason: str) -> List[Row]:
+        """
+        Возвращает в QUEUED зависшие этапы, у которых остались попытки. Одним UPDATE, без коммита.
+        """
+        result = await self.session.execute(
+            update(OrderStage)
+            .where(self._stuck_processing(legacy_deadline), OrderStage.attempts < max_attempts)
+            .values(status=OrderStageStatus.QUEUED, lease_owner=None, lease_expires_at=None, last_error=reason)
+            .returning(OrderStage.id, OrderStage.order_id, OrderStage.stage_type)
+            .execution_options(synchronize_session=False)
+        )
+        return list(result.all())
+
+    async def touch_waiting(self, stage_types: Sequence[str], deadline: timedelta) -> List[Row]:
+        """
+        Оплаченные этапы, которые слишком долго ждут воркера (потеряна постановка
+        в планировщик). updated_at сдвигается, чтобы не подбирать их на каждом проходе.
+        """
+        result = await self.session.execute(
+            update(OrderStage)
+            .where(
+                OrderStage.status.in_(CLAIMABLE_STATUSES),
+                OrderStage.stage_type.in_(stage_types),
+                OrderStage.updated_at < func.now() - deadline,
+            )
+            .values(updated_at=func.now())
+            .returning(OrderStage.id, OrderStage.order_id, OrderStage.stage_type)
+            .execution_options(synchronize_session=False)
+        )
+        return list(result.all())
+
+    @staticmethod
+    def _requeueable():
+        # Этап оплачивается отдельным платежом (payments.stage_id), поэтому проверяется
+        # успешный платёж самого этапа, а не статус заказа
+        paid = exists().where(Payment.stage_id == OrderStage.id, Payment.status == PaymentStatus.SUCCEEDED)
+        return or_(
+            OrderStage.status.in_(REQUEUEABLE_STATUSES),
+            and_(OrderStage.status == OrderStageStatus.CANCELLED, paid),
+        )
+
+    async def bulk_requeue(self, stage_filter: StageFilter, stage_types: Sequence[StageType]) -> List[UUID]:
+        """
+        Одним UPDATE возвращает в QUEUED подходящие под фильтр этапы с обнулёнными
+        попытками. stage_types — типы, для которых есть задача генерации. Без коммита.
+        """
+        result = await self.session.execute(
+            update(OrderStage)
+            .where(
+                *stage_filter.conditions(),
+                self._requeueable(),
+                OrderStage.stage_type.in_(stage_types),
+            )
+            .values(
+                status=OrderStageStatus.QUEUED, attempts=0, lease_owner=None, lease_expires_at=None, last_error=None
+            )
+            .returning(OrderStage.id)
+            .execution_options(synchronize_session=False)
+        )
+        return list(result.scalars().all())
+
+    async def bulk_cancel(self, stage_filter: StageFilter) -> int:
+        """
+        Одним UPDATE отменяет подходящие под фильтр незавершённые этапы. Воркер, который
+        выполняет такой этап, не сможет записать результат (см. release_claim). Без коммита.
+        """
+        result = await self.session.execute(
+            update(OrderStage)
+            .where(*stage_filter.conditions(), OrderStage.status.in_(CANCELLABLE_STATUSES))
+            .values(status=OrderStageStatus.CANCELLED, lease_owner=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    async def get_telegram_ids(self, stage_ids: Sequence[UUID]) -> dict[UUID, int]:
+        if not stage_ids:
+            return {}
+        result = await self.session.execute(
+            select(OrderStage.id, User.telegram_id)
+            .join(Order, Order.id == OrderStage.order_id)
+            .join(User, User.id == Order.user_id)
+            .where(OrderStage.id.in_(stage_ids))
+        )
+        return {stage_id: telegram_id for stage_id, telegram_id in result.all()}
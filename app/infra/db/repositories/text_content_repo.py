@@ -0,0 +1,57 @@
+import hashlib
+import zlib
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.infra.db.models import TextContent
+
+TEXT_STORAGE_PREFIX = "text:"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def text_storage_key(text_hash: str) -> str:
+    return f"{TEXT_STORAGE_PREFIX}{text_hash}"
+
+
+def pack_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"))
+
+
+def unpack_text(body: bytes) -> str:
+    return zlib.decompress(body).decode("utf-8")
+
+
+class TextContentRepo:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def put(self, text: str) -> str:
+        """
+        Сохраняет текст, если такого ещё нет, и возвращает его хеш. Без коммита.
+        """
+        text_hash = content_hash(text)
+        await self.put_many({text_hash: text})
+        return text_hash
+
+    async def put_many(self, texts: Dict[str, str]) -> None:
+        """
+        texts — {хеш: текст}. Уже сохранённые тексты пропускаются. Без коммита.
+        """
+        if not texts:
+            return
+        rows = []
+        for text_hash, text in texts.items():
+            rows.append({"hash": text_hash, "body": pack_text(text), "size": len(text.encode("utf-8"))})
+        await self.session.execute(
+            insert(TextContent).values(rows).on_conflict_do_nothing(index_elements=[TextContent.hash])
+        )
+
+    async def get(self, text_hash: str) -> Optional[str]:
+        body = await self.session.scalar(select(TextContent.body).where(TextContent.hash == text_hash))
+        return unpack_text(body) if body is not None else None
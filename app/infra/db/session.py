@@ -1,11 +1,28 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
 from app.infra.config.settings import settings
+from app.infra.db.engine import DbRole, create_engine
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-logger.info(f"Using database URL: {settings.FINAL_DATABASE_URL}")
+# Движок по умолчанию — для роли из окружения (DB_ROLE); точки входа процессов
+# пересоздают его под свою роль через init_engine до первого запроса
+engine = create_engine(DbRole(settings.DB_ROLE))
+async_session_factory = async_sessionmaker(engine, expire_on_commit=False)
 
-engine = create_async_engine(settings.FINAL_DATABASE_URL, echo=False)
-async_session_factory = async_sessionmaker(engine, expire_on_commit=False)
\ No newline at end of file
+
+def init_engine(role: DbRole, **engine_kwargs) -> AsyncEngine:
+    """
+    Пересоздаёт engine и пул соединений в текущем процессе под роль role.
+
+    Вызывается точками входа при старте и из хука инициализации воркера после fork:
+    соединения родителя нельзя использовать в дочернем процессе, поэтому старый пул
+    отпускается без закрытия сокетов (close=False), а фабрика сессий перепривязывается
+    к новому engine.
+    """
+    global engine
+    engine.sync_engine.dispose(close=False)
+    engine = create_engine(role, **engine_kwargs)
+    async_session_factory.configure(bind=engine)
+    return engine
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+import socket
+from dataclasses import asdict, dataclass
+from enum import StrEnum
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from redis.exceptions import ResponseError
+
+from app.infra.cache.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Частичный текст идёт через pub/sub: он нужен только тем, кто слушает прямо сейчас
+STAGE_PARTIAL_CHANNEL = "stage_events:partial"
+
+# Завершение стадий идёт через Redis Stream с consumer group: событие не теряется,
+# если бот был недоступен в момент публикации, и будет доставлено после рестарта
+STAGE_COMPLETION_STREAM = "stage_events:completion"
+STAGE_COMPLETION_STREAM_MAXLEN = 100_000
+
+
+class StageEventType(StrEnum):
+    COMPLETED = "stage.completed"
+    FAILED = "stage.failed"
+
+
+@dataclass
+class StagePartialEvent:
+    stage_id: str
+    telegram_id: int
+    text: str  # весь накопленный на данный момент текст
+
+    @classmethod
+    def from_json(cls, data: str) -> "StagePartialEvent":
+        return cls(**json.loads(data))
+
+
+@dataclass
+class StageCompletionEvent:
+    event: StageEventType
+    stage_id: str
+    order_id: str
+    stage_type: str
+    telegram_id: int
+    text: Optional[str] = None  # текст стиха для POEM
+    storage_key: Optional[str] = None  # ключ файла для медиа-стадий
+
+    def to_fields(self) -> Dict[str, str]:
+        return {"data": json.dumps(asdict(self), ensure_ascii=False)}
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, str]) -> "StageCompletionEvent":
+        data = json.loads(fields["data"])
+        data["event"] = StageEventType(data["event"])
+        return cls(**data)
+
+
+async def publish_stage_partial(event: StagePartialEvent) -> None:
+    """
+    Публикует промежуточный текст стадии. Ошибки не пробрасываются:
+    потоковый показ — только улучшение, генерация от него не зависит.
+    """
+    try:
+        await get_redis().publish(STAGE_PARTIAL_CHANNEL, json.dumps(asdict(event), ensure_ascii=False))
+    except Exception as e:
+        logger.warning(f"Failed to publish partial text for stage {event.stage_id}: {e}")
+
+
+async def iter_stage_partials() -> AsyncIterator[StagePartialEvent]:
+    pubsub = get_redis().pubsub()
+    await pubsub.subscribe(STAGE_PARTIAL_CHANNEL)
+    try:
+        async for message in pubsub.listen():
+            if message["type"] == "message":
+                yield StagePartialEvent.from_json(message["data"])
+    finally:
+        await pubsub.aclose()
+
+
+async def publish_stage_completion(event: StageCompletionEvent) -> None:
+    """
+    Публикует завершение или ошибку стадии. Вызывается после commit,
+    чтобы подписчик не увидел событие раньше данных в БД.
+    """
+    try:
+        await get_redis().xadd(
+            STAGE_COMPLETION_STREAM,
+            event.to_fields(),
+            maxlen=STAGE_COMPLETION_STREAM_MAXLEN,
+            approximate=True,
+        )
+    except Exception as e:
+        logger.error(f"Failed to publish {event.event} for stage {event.stage_id}: {e}")
+
+
+class StageCompletionConsumer:
+    """
+    Читатель потока завершений в составе consumer group.
+
+    Сообщение подтверждается (XACK) после успешной обработки; после max_attempts
+    неудач — тоже, чтобы одно «ядовитое» событие не блокировало очередь.
+    Неподтверждённые сообщения упавших читателей забираются через XAUTOCLAIM.
+    """
+
+    def __init__(
+        self,
+        group: str,
+        consumer: Optional[str] = None,
+        block_ms: int = 5000,
+        claim_idle_ms: int = 60000,
+        max_attempts: int = 5,
+    ):
+        self.group = group
+        self.consumer = consumer or socket.gethostname()
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_attempts = max_attempts
+        self._attempts: Dict[str, int] = {}
+
+    async def _ensure_group(self) -> None:
+        try:
+            await get_redis().xgroup_create(STAGE_COMPLETION_STREAM, self.group, id="$", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def run(self, handler: Callable[[StageCompletionEvent], Awaitable[None]]) -> None:
+        await self._ensure_group()
+        redis = get_redis()
+
+        # Сначала дочитываем то, что этот читатель получил, но не подтвердил до рестарта
+        for _, messages in await redis.xreadgroup(self.group, self.consumer, {STAGE_COMPLETION_STREAM: "0"}):
+            await self._process(messages, handler)
+
+        while True:
+            _, claimed, *_ = await redis.xautoclaim(
+                STAGE_COMPLETION_STREAM, self.group, self.consumer, min_idle_time=self.claim_idle_ms, count=100
+            )
+            await self._process(claimed, handler)
+
+            batches = await redis.xreadgroup(
+                self.group, self.consumer, {STAGE_COMPLETION_STREAM: ">"}, count=100, block=self.block_ms
+            )
+            for _, messages in batches or []:
+                await self._process(messages, handler)
+
+    async def _process(self, messages, handler: Callable[[StageCompletionEvent], Awaitable[None]]) -> None:
+        redis = get_redis()
+        for message_id, fields in messages:
+            # Пустые поля — запись уже вытеснена из потока по MAXLEN
+            if fields:
+                try:
+                    await handler(StageCompletionEvent.from_fields(fields))
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    attempts = self._attempts.get(message_id, 0) + 1
+                    self._attempts[message_id] = attempts
+                    logger.exception(f"Failed to handle stage event {message_id} (attempt {attempts}): {e}")
+                    if attempts < self.max_attempts:
+                        continue
+            self._attempts.pop(message_id, None)
+            await redis.xack(STAGE_COMPLETION_STREAM, self.group, message_id)
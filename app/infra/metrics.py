@@ -0,0 +1,49 @@
+import logging
+from typing import Dict
+
+from app.infra.cache.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Все счётчики живут в одном hash: их пишут воркеры и бот, а читает админка
+METRICS_KEY = "metrics:counters"
+
+
+async def incr(name: str, amount: int = 1) -> None:
+    """
+    Увеличивает счётчик. Ошибки Redis не пробрасываются: метрики не должны ломать основной сценарий.
+    """
+    try:
+        await get_redis().hincrby(METRICS_KEY, name, amount)
+    except Exception as e:
+        logger.warning(f"Failed to increment metric {name}: {e}")
+
+
+async def incr_many(values: Dict[str, int]) -> None:
+    """
+    Увеличивает несколько счётчиков за один запрос к Redis.
+    """
+    if not values:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for name, amount in values.items():
+            pipe.hincrby(METRICS_KEY, name, amount)
+        await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to increment metrics {', '.join(values)}: {e}")
+
+
+async def get_counters() -> Dict[str, int]:
+    try:
+        raw = await get_redis().hgetall(METRICS_KEY)
+    except Exception as e:
+        logger.warning(f"Failed to read metrics: {e}")
+        return {}
+    return {name: int(value) for name, value in raw.items()}
+
+
+def hit_rate(counters: Dict[str, int], prefix: str) -> float | None:
+    hits = counters.get(f"{prefix}.hit", 0)
+    total = hits + counters.get(f"{prefix}.miss", 0)
+    return hits / total if total else None
@@ -1,6 +1,11 @@
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
 from app.infra.config.settings import settings
+from app.infra.queue.routing import MAINTENANCE_QUEUE, TASK_QUEUES, TASK_ROUTES
+import logging
+
+logger = logging.getLogger(__name__)
 
 celery_app = Celery(
     "worker",
@@ -13,6 +18,27 @@ celery_app.conf.beat_schedule = {
     "sync-provider-models-every-24h": {
         "task": "sync_provider_models_task",
         "schedule": crontab(hour=3, minute=0),  # Run at 3 AM daily
+        "options": {"queue": MAINTENANCE_QUEUE},
+    },
+    "reap-stuck-stages": {
+        "task": "reap_stuck_stages_task",
+        "schedule": 60.0,
+        "options": {"queue": MAINTENANCE_QUEUE, "expires": 60},
+    },
+    "cleanup-provider-calls": {
+        "task": "cleanup_provider_calls_task",
+        "schedule": crontab(hour=4, minute=0),
+        "options": {"queue": MAINTENANCE_QUEUE},
+    },
+    "rollup-daily-metrics": {
+        "task": "rollup_daily_metrics_task",
+        "schedule": settings.METRICS_ROLLUP_INTERVAL,
+        "options": {"queue": MAINTENANCE_QUEUE, "expires": settings.METRICS_ROLLUP_INTERVAL},
+    },
+    "dispatch-scheduled-stages": {
+        "task": "dispatch_scheduled_stages_task",
+        "schedule": 15.0,
+        "options": {"queue": MAINTENANCE_QUEUE, "expires": 15},
     },
 }
 
@@ -24,4 +50,77 @@ celery_app.conf.update(
     enable_utc=True,
     task_track_started=True,
     task_time_limit=300,  # 5 minutes
-)
\ No newline at end of file
+    # prefetch=1 — воркер не набирает задач сверх свободных слотов пула. Этап без квоты
+    # провайдера не занимает слот ожиданием: задача возвращается в очередь с задержкой
+    # (см. _defer_if_busy в tasks.py). acks_late — задача подтверждается после выполнения.
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    # Каждый тип этапа — в своей очереди (см. routing.py), воркеры подписываются
+    # на нужные очереди и масштабируются независимо.
+    task_queues=TASK_QUEUES,
+    task_routes=TASK_ROUTES,
+    task_default_queue=MAINTENANCE_QUEUE,
+    # Неподтверждённая задача возвращается в очередь через visibility_timeout;
+    # он должен быть больше task_time_limit, иначе долгая стадия выполнится дважды.
+    broker_transport_options={"visibility_timeout": settings.WORKER_VISIBILITY_TIMEOUT},
+)
+
+
+def _init_process_resources() -> None:
+    from app.infra.ai.http_client import http_clients
+    from app.infra.db.engine import DbRole
+    from app.infra.db.session import init_engine
+    from app.infra.queue.runner import runner
+
+    init_engine(DbRole.WORKER)
+    runner.start()
+    if settings.WORKER_HTTP_WARM_UP:
+        try:
+            runner.run(http_clients.warm_up(), timeout=settings.HTTP_CONNECT_TIMEOUT * 2)
+        except Exception as e:
+            logger.warning(f"HTTP warm-up skipped: {e}")
+
+
+def _shutdown_process_resources() -> None:
+    from app.infra.ai.http_client import http_clients
+    from app.infra.ai.telemetry import provider_calls
+    from app.infra.cache.redis import close_redis
+    from app.infra.db import session
+    from app.infra.queue.runner import runner
+    from app.infra.storage.s3 import s3_storage
+
+    if runner.is_running():
+        # Остаток телеметрии пишем, пока пул БД ещё открыт
+        runner.run(provider_calls.aclose(), timeout=10)
+        runner.run(http_clients.aclose(), timeout=10)
+        runner.run(s3_storage.aclose(), timeout=10)
+        runner.run(close_redis(), timeout=10)
+        runner.run(session.engine.dispose(), timeout=10)
+        runner.stop()
+
+
+@worker_init.connect
+def on_worker_init(sender=None, **kwargs):
+    # В prefork loop и пул создаются в дочерних процессах (worker_process_init),
+    # для пулов threads/solo задачи выполняются в главном процессе воркера.
+    pool_cls = getattr(sender, "pool_cls", None)
+    pool_name = pool_cls if isinstance(pool_cls, str) else getattr(pool_cls, "__module__", "")
+    if pool_name.split(".")[-1] in ("prefork", "processes"):
+        return
+    _init_process_resources()
+
+
+@worker_process_init.connect
+def on_worker_process_init(**kwargs):
+    _init_process_resources()
+
+
+@worker_process_shutdown.connect
+def on_worker_process_shutdown(**kwargs):
+    _shutdown_process_resources()
+
+
+@worker_shutdown.connect
+def on_worker_shutdown(**kwargs):
+    _shutdown_process_resources()
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from app.infra.cache.redis import get_redis
+from app.infra.config.settings import settings
+from app.infra.db.repositories.daily_metrics_repo import DailyMetricsRepo
+from app.infra.db.session import async_session_factory
+from app.infra.queue.celery_app import celery_app
+from app.infra.queue.routing import MAINTENANCE_QUEUE
+
+logger = logging.getLogger(__name__)
+
+# Отметка о внеочередном запуске: дашборд, открытый до первой сводки, не ставит задачу повторно
+_REQUESTED_KEY = "metrics:rollup:requested"
+
+
+async def rollup_daily_metrics() -> int:
+    """
+    Пересчитывает сводку daily_metrics: первый запуск — всю историю частями
+    по METRICS_ROLLUP_CHUNK_DAYS дней (прогресс сохраняется после каждой),
+    следующие — последние METRICS_ROLLUP_LOOKBACK_DAYS дней. Возвращает число дней.
+    """
+    today = datetime.now(timezone.utc).date()
+    async with async_session_factory() as session:
+        repo = DailyMetricsRepo(session)
+        watermark = await repo.watermark()
+        if watermark is not None:
+            # Последние дни пересчитываются заново: платёж подтверждается позже, чем создан
+            start = min(watermark, today) - timedelta(days=settings.METRICS_ROLLUP_LOOKBACK_DAYS)
+        else:
+            start = await repo.first_day() or today
+        days = 0
+        while start <= today:
+            end = min(start + timedelta(days=settings.METRICS_ROLLUP_CHUNK_DAYS - 1), today)
+            days += await repo.rollup(start, end)
+            await session.commit()
+            start = end + timedelta(days=1)
+    logger.info(f"Rolled up daily metrics for {days} days")
+    return days
+
+
+async def request_rollup() -> bool:
+    """
+    Ставит rollup_daily_metrics_task в служебную очередь вне расписания beat — не чаще
+    раза в METRICS_ROLLUP_INTERVAL. Ошибки Redis и брокера не пробрасываются: страница,
+    которая просит пересчёт, должна открываться. Возвращает True, если задача поставлена.
+    """
+    ttl = max(int(settings.METRICS_ROLLUP_INTERVAL), 1)
+    try:
+        if not await get_redis().set(_REQUESTED_KEY, "1", nx=True, ex=ttl):
+            return False
+        await asyncio.to_thread(
+            celery_app.send_task, "rollup_daily_metrics_task", queue=MAINTENANCE_QUEUE, expires=ttl
+        )
+    except Exception as e:
+        logger.warning(f"Failed to request daily metrics rollup: {e}")
+        return False
+    logger.info("Daily metrics rollup requested")
+    return True
+
+if __name__ == "__main__":
+    import asyncio
+
+    from app.infra.config.logging import setup_logging
+
+    setup_logging()
+    asyncio.run(rollup_daily_metrics())
@@ -0,0 +1,114 @@
+"""
+Релей outbox: отправляет сообщения, записанные вместе с изменением статуса, в планировщик.
+
+    python -m app.infra.queue.outbox
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.domain.enums import StageType
+from app.infra.config.settings import settings
+from app.infra.db.models import OutboxMessage
+from app.infra.db.repositories.outbox_repo import STAGE_ENQUEUE_TOPIC, OutboxRepo
+from app.infra.db.session import async_session_factory
+from app.infra.queue.scheduler import SchedulingLane, stage_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRelay:
+    """
+    Разбирает outbox пачками: передаёт сообщения в планировщик и в той же транзакции
+    отмечает их отправленными. Если релей упадёт между отправкой и коммитом, сообщение
+    уйдёт повторно — планировщик и claim этапа отбрасывают дубликаты, так что
+    постановка происходит ровно один раз.
+    """
+
+    def __init__(self, batch_size: int, poll_interval: float, max_attempts: int, retention: timedelta):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retention = retention
+
+    async def drain_once(self) -> int:
+        """
+        Отправляет одну пачку. Возвращает число обработанных сообщений.
+        """
+        async with async_session_factory() as session:
+            repo = OutboxRepo(session)
+            messages = await repo.claim_batch(self.batch_size, self.max_attempts)
+            if not messages:
+                return 0
+
+            dispatched = []
+            for message in messages:
+                try:
+                    await self._handle(message)
+                    dispatched.append(message.id)
+                except Exception as e:
+                    logger.error(f"Failed to relay outbox message {message.id} ({message.topic}): {e}")
+                    message.attempts += 1
+                    message.last_error = str(e)[:1000]
+            await repo.mark_dispatched(dispatched)
+            await session.commit()
+
+        return len(messages)
+
+    async def _handle(self, message: OutboxMessage) -> None:
+        if message.topic == STAGE_ENQUEUE_TOPIC:
+            payload = message.payload
+            await stage_scheduler.submit(
+                StageType(payload["stage_type"]),
+                payload["stage_id"],
+                payload["telegram_id"],
+                SchedulingLane(payload.get("lane", SchedulingLane.PAID)),
+                dispatch=False,
+            )
+            return
+        raise ValueError(f"Unknown outbox topic: {message.topic}")
+
+    async def cleanup(self) -> None:
+        cutoff = datetime.now(timezone.utc) - self.retention
+        async with async_session_factory() as session:
+            deleted = await OutboxRepo(session).delete_dispatched_before(cutoff)
+            await session.commit()
+        if deleted:
+            logger.info(f"Deleted {deleted} dispatched outbox messages")
+
+    async def run(self) -> None:
+        logger.info("Outbox relay started")
+        last_cleanup = 0.0
+        while True:
+            try:
+                processed = await self.drain_once()
+                # Частый проход планировщика: по нему капает фоновая полоса
+                await stage_scheduler.dispatch()
+                if time.monotonic() - last_cleanup > 3600:
+                    await self.cleanup()
+                    last_cleanup = time.monotonic()
+            except Exception as e:
+                logger.exception(f"Outbox relay iteration failed: {e}")
+                processed = 0
+            # Полная пачка — в outbox ещё есть сообщения, берём следующую сразу
+            if processed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+
+outbox_relay = OutboxRelay(
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    poll_interval=settings.OUTBOX_POLL_INTERVAL,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    retention=timedelta(days=settings.OUTBOX_RETENTION_DAYS),
+)
+
+
+if __name__ == "__main__":
+    from app.infra.config.logging import setup_logging
+    from app.infra.db.engine import DbRole
+    from app.infra.db.session import init_engine
+
+    setup_logging()
+    init_engine(DbRole.OUTBOX)
+    asyncio.run(outbox_relay.run())
@@ -0,0 +1,85 @@
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+
+from app.domain.enums import StageType
+from app.infra import metrics
+from app.infra.config.settings import settings
+from app.infra.db.repositories.outbox_repo import OutboxRepo
+from app.infra.db.repositories.stage_repo import StageRepo
+from app.infra.db.session import async_session_factory
+from app.infra.events.stage_events import StageCompletionEvent, StageEventType, publish_stage_completion
+from app.infra.queue.routing import STAGE_DEADLINES, STAGE_TASKS
+from app.infra.queue.scheduler import SchedulingLane, stage_scheduler
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "stage_reaper"
+
+STUCK_REASON = "Stage lease expired: worker was lost during processing"
+
+
+@dataclass
+class ReapResult:
+    requeued: int = 0
+    failed: int = 0
+    resubmitted: int = 0
+
+
+async def reap_stuck_stages() -> ReapResult:
+    """
+    Находит этапы, брошенные воркерами, и возвращает их в работу.
+
+    - PROCESSING с истёкшей арендой: снова в очередь, если остались попытки,
+      иначе FAILED с причиной и событие боту;
+    - PAID/QUEUED дольше STAGE_QUEUE_DEADLINE: постановка повторяется (в планировщике
+      она идемпотентна, так что этап, честно ждущий своей очереди, не задвоится).
+
+    Выборка и смена статуса — set-based UPDATE ... RETURNING, постановка — через outbox
+    в той же транзакции.
+    """
+    legacy_deadline = timedelta(seconds=max([settings.STAGE_LEASE_SECONDS, *STAGE_DEADLINES.values()]))
+    result = ReapResult()
+
+    async with async_session_factory() as session:
+        stage_repo = StageRepo(session)
+        failed = await stage_repo.fail_stuck(settings.STAGE_MAX_ATTEMPTS, legacy_deadline, STUCK_REASON)
+        requeued = await stage_repo.requeue_stuck(settings.STAGE_MAX_ATTEMPTS, legacy_deadline, STUCK_REASON)
+        waiting = await stage_repo.touch_waiting(
+            list(set(STAGE_TASKS.values())), timedelta(seconds=settings.STAGE_QUEUE_DEADLINE)
+        )
+
+        telegram_ids = await stage_repo.get_telegram_ids([row.id for row in [*failed, *requeued, *waiting]])
+        outbox = OutboxRepo(session)
+        for row in [*requeued, *waiting]:
+            await outbox.add_stage_enqueue(
+                StageType(row.stage_type), row.id, telegram_ids[row.id], SchedulingLane.PAID
+            )
+
+        # Слот упавшей задачи в планировщике освобождается до коммита: иначе релей
+        # получит новую постановку раньше и отбросит её как дубликат
+        for row in [*failed, *requeued]:
+            await stage_scheduler.release(row.id, dispatch=False)
+        await session.commit()
+
+    for row in failed:
+        await publish_stage_completion(
+            StageCompletionEvent(
+                event=StageEventType.FAILED,
+                stage_id=str(row.id),
+                order_id=str(row.order_id),
+                stage_type=str(row.stage_type),
+                telegram_id=telegram_ids[row.id],
+            )
+        )
+
+    result.requeued, result.failed, result.resubmitted = len(requeued), len(failed), len(waiting)
+    if result.requeued or result.failed or result.resubmitted:
+        logger.warning(
+            f"Reaped stuck stages: requeued={result.requeued}, failed={result.failed}, "
+            f"resubmitted={result.resubmitted}"
+        )
+        await metrics.incr(f"{METRIC_PREFIX}.requeued", result.requeued)
+        await metrics.incr(f"{METRIC_PREFIX}.failed", result.failed)
+        await metrics.incr(f"{METRIC_PREFIX}.resubmitted", result.resubmitted)
+    return result
@@ -0,0 +1,61 @@
+import asyncio
+import random
+from typing import Optional
+
+import httpx
+
+from app.infra.ai.limiter import ProviderBusyError
+
+# Ответы провайдера, после которых повтор через паузу обычно проходит
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class StageRetry(Exception):
+    """
+    Этап возвращён в очередь после временной ошибки и будет повторён через countdown секунд.
+    """
+
+    def __init__(self, countdown: float, cause: BaseException):
+        super().__init__(f"Retry in {countdown:.0f}s: {cause}")
+        self.countdown = countdown
+        self.cause = cause
+
+
+class StageDeferred(StageRetry):
+    """
+    У провайдера этапа нет квоты: этап не брали в работу, задача вернётся в очередь
+    через countdown секунд. Попытка этапа не расходуется.
+    """
+
+    def __init__(self, countdown: float, reason: str):
+        super().__init__(countdown, ProviderBusyError(reason))
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Временные ошибки — сеть, таймауты, перегрузка и лимиты провайдера. Остальные
+    (неверный ключ, нарушение политики контента, нет текста) повтором не исправить.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in TRANSIENT_STATUS_CODES
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError, ProviderBusyError))
+
+
+def retry_countdown(attempt: int, error: BaseException, base: float, max_delay: float) -> float:
+    """
+    Экспоненциальная пауза перед попыткой attempt + 1 с джиттером, не меньше Retry-After провайдера.
+    """
+    delay = min(max_delay, base * 2 ** max(0, attempt - 1)) * random.uniform(0.5, 1.0)
+    retry_after = _retry_after(error)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, max_delay))
+    return delay
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    if not isinstance(error, httpx.HTTPStatusError):
+        return None
+    try:
+        return float(error.response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
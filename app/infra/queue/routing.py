@@ -0,0 +1,64 @@
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from kombu import Exchange, Queue
+
+from app.domain.enums import StageType
+from app.infra.config.settings import settings
+
+# Очередь на каждый тип этапа: всплеск озвучек не задерживает стихи
+STAGE_QUEUES: Dict[StageType, str] = {
+    StageType.POEM: "poem",
+    StageType.VOICE: "voice",
+    StageType.SONG: "media",
+    StageType.CLIP: "media",
+}
+
+# Задача этапа -> тип этапа; по нему определяется очередь
+STAGE_TASKS: Dict[str, StageType] = {
+    "generate_poem_task": StageType.POEM,
+    "generate_voice_task": StageType.VOICE,
+}
+
+# Срок аренды этапа воркером, сек: дольше этап считается зависшим и его подбирает
+# reap_stuck_stages_task. Должен быть больше time limit задачи этапа.
+STAGE_DEADLINES: Dict[StageType, int] = {
+    StageType.SONG: 1800,
+    StageType.CLIP: 1800,
+}
+
+
+def stage_deadline(stage_type: StageType) -> int:
+    return STAGE_DEADLINES.get(stage_type, settings.STAGE_LEASE_SECONDS)
+
+
+# Служебные и периодические задачи
+MAINTENANCE_QUEUE = "maintenance"
+
+ALL_QUEUES: Tuple[str, ...] = tuple(dict.fromkeys([*STAGE_QUEUES.values(), MAINTENANCE_QUEUE]))
+
+TASK_QUEUES = [Queue(name, Exchange(name), routing_key=name) for name in ALL_QUEUES]
+
+TASK_ROUTES: Dict[str, Dict[str, str]] = {
+    task_name: {"queue": STAGE_QUEUES[stage_type]} for task_name, stage_type in STAGE_TASKS.items()
+}
+
+
+@dataclass(frozen=True)
+class WorkerProfile:
+    queues: List[str]
+    concurrency: int
+    prefetch_multiplier: int = 1
+    pool: str = "threads"
+
+
+# Профили воркеров: какие очереди слушать и сколько задач держать одновременно.
+# Стадии ждут сеть (LLM, TTS, S3), поэтому пул потоков и высокая конкурентность;
+# prefetch=1 — воркер не забирает задачи сверх свободных слотов.
+WORKER_PROFILES: Dict[str, WorkerProfile] = {
+    "poem": WorkerProfile(queues=[STAGE_QUEUES[StageType.POEM]], concurrency=200),
+    "voice": WorkerProfile(queues=[STAGE_QUEUES[StageType.VOICE]], concurrency=50),
+    "media": WorkerProfile(queues=[STAGE_QUEUES[StageType.SONG]], concurrency=20),
+    "maintenance": WorkerProfile(queues=[MAINTENANCE_QUEUE], concurrency=4),
+    "all": WorkerProfile(queues=list(ALL_QUEUES), concurrency=200),
+}
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+from app.infra.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRunner:
+    """
+    Долгоживущий event loop процесса воркера.
+
+    Loop крутится в отдельном потоке, а Celery-задачи (пул threads/solo/prefork)
+    только отправляют в него корутины и ждут результат. Так все стадии процесса
+    делят один loop, пул соединений БД и HTTP-клиенты, а число одновременно
+    выполняемых корутин ограничено семафором.
+    """
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        self.start()
+        return self._loop
+
+    def is_running(self) -> bool:
+        # Поток loop'а не переживает fork: в дочернем процессе его нужно поднять заново
+        return (
+            self._loop is not None
+            and self._pid == os.getpid()
+            and self._thread is not None
+            and self._thread.is_alive()
+        )
+
+    def start(self) -> None:
+        with self._lock:
+            if self.is_running():
+                return
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run() -> None:
+                asyncio.set_event_loop(loop)
+                self._semaphore = asyncio.Semaphore(self.max_in_flight)
+                ready.set()
+                loop.run_forever()
+
+            thread = threading.Thread(target=_run, name="async-runner", daemon=True)
+            thread.start()
+            ready.wait()
+
+            self._loop = loop
+            self._thread = thread
+            self._pid = os.getpid()
+            logger.info(f"Async runner started in pid {self._pid} (max in-flight: {self.max_in_flight})")
+
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """
+        Выполняет корутину в loop'е процесса и блокирует вызывающий поток до результата.
+        """
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self._guarded(coro), self._loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    async def _guarded(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        async with self._semaphore:
+            return await coro
+
+    def stop(self) -> None:
+        with self._lock:
+            if not self.is_running():
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+            logger.info(f"Async runner stopped in pid {os.getpid()}")
+
+
+runner = AsyncRunner(max_in_flight=settings.WORKER_MAX_IN_FLIGHT)
+
+
+def run_async(coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+    return runner.run(coro, timeout=timeout)
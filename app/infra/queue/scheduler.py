@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+from enum import StrEnum
+from typing import Optional, Union
+from uuid import UUID
+
+from app.domain.enums import StageType
+from app.infra.cache.redis import get_redis
+from app.infra.config.settings import settings
+from app.infra.queue.routing import STAGE_TASKS
+
+logger = logging.getLogger(__name__)
+
+# Тип этапа -> имя Celery-задачи
+STAGE_TASK_NAMES = {stage_type: task_name for task_name, stage_type in STAGE_TASKS.items()}
+
+
+class SchedulingLane(StrEnum):
+    """
+    Полосы в порядке приоритета: оплаченные этапы всегда выдаются раньше
+    перезапусков из админки и бэкфиллов, которым достаётся ограниченная доля ёмкости.
+    """
+
+    PAID = "paid"
+    BULK = "bulk"
+
+
+# Постановка этапа: отметка sched:job:{stage_id} (значение — пользователь) защищает
+# от повторной постановки того же этапа. Пользователь попадает в кольцо полосы,
+# когда его очередь становится непустой.
+_SUBMIT_SCRIPT = """
+if not redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[3]) then
+    return 0
+end
+if redis.call('RPUSH', KEYS[2], ARGV[2]) == 1 then
+    redis.call('RPUSH', KEYS[3], ARGV[1])
+end
+return 1
+"""
+
+# Выдача одной задачи: полосы по приоритету, внутри полосы — пользователи по кругу.
+# Пользователь, у которого в работе уже user_cap этапов, пропускается и уходит в конец
+# кольца. У полосы может быть свой потолок одновременных этапов и темп выдачи в минуту
+# (token bucket; 0 — без ограничения). In-flight — sorted set с арендой: этапы упавших
+# воркеров освобождаются сами.
+_DISPATCH_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local global_cap = tonumber(ARGV[1])
+local user_cap = tonumber(ARGV[2])
+local lease = tonumber(ARGV[3])
+local prefix = ARGV[4]
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= global_cap then
+    return false
+end
+for i = 5, #ARGV, 3 do
+    local ring = prefix .. 'lane:' .. ARGV[i] .. ':ring'
+    local lane_inflight = prefix .. 'inflight:lane:' .. ARGV[i]
+    local lane_cap = tonumber(ARGV[i + 1])
+    local rate = tonumber(ARGV[i + 2]) / 60000
+    local bucket = prefix .. 'lane:' .. ARGV[i] .. ':bucket'
+    local tokens = 0
+    redis.call('ZREMRANGEBYSCORE', lane_inflight, '-inf', now)
+    local lane_full = lane_cap > 0 and redis.call('ZCARD', lane_inflight) >= lane_cap
+    if rate > 0 and not lane_full then
+        local state = redis.call('HMGET', bucket, 'tokens', 'ts')
+        local burst = math.max(1, math.floor(rate * 1000))
+        tokens = math.min(burst, (tonumber(state[1]) or burst) + math.max(0, now - (tonumber(state[2]) or now)) * rate)
+        lane_full = tokens < 1
+    end
+    for _ = 1, (lane_full and 0 or redis.call('LLEN', ring)) do
+        local user = redis.call('LPOP', ring)
+        local queue = prefix .. 'lane:' .. ARGV[i] .. ':user:' .. user
+        local inflight = prefix .. 'inflight:user:' .. user
+        redis.call('ZREMRANGEBYSCORE', inflight, '-inf', now)
+        if redis.call('ZCARD', inflight) < user_cap then
+            local job = redis.call('LPOP', queue)
+            if redis.call('LLEN', queue) > 0 then
+                redis.call('RPUSH', ring, user)
+            end
+            if job then
+                local stage_id = cjson.decode(job)['stage_id']
+                redis.call('ZADD', KEYS[1], now + lease, stage_id)
+                redis.call('ZADD', inflight, now + lease, stage_id)
+                redis.call('PEXPIRE', inflight, lease)
+                redis.call('ZADD', lane_inflight, now + lease, stage_id)
+                if rate > 0 then
+                    redis.call('HSET', bucket, 'tokens', tostring(tokens - 1), 'ts', now)
+                    redis.call('PEXPIRE', bucket, 600000)
+                end
+                return job
+            end
+        elseif redis.call('LLEN', queue) > 0 then
+            redis.call('RPUSH', ring, user)
+        end
+    end
+end
+return false
+"""
+
+_RELEASE_SCRIPT = """
+local user = redis.call('GET', KEYS[1])
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+if user then
+    redis.call('ZREM', ARGV[2] .. 'inflight:user:' .. user, ARGV[1])
+end
+for i = 3, #ARGV do
+    redis.call('ZREM', ARGV[2] .. 'inflight:lane:' .. ARGV[i], ARGV[1])
+end
+return 1
+"""
+
+
+class StageScheduler:
+    """
+    Справедливая выдача этапов генерации в Celery.
+
+    Этапы не отправляются в очередь Celery сразу, а ждут в Redis в очереди своего
+    пользователя. Пользователи обслуживаются по кругу, у каждого в работе не больше
+    user_max_in_flight этапов, а всего — не больше max_in_flight. Так двадцать заказов
+    одного пользователя или массовый перезапуск не отодвигают остальных: очередь Celery
+    остаётся короткой, а ожидание обычного пользователя не зависит от чужих объёмов.
+
+    Слоты освобождаются по завершении задачи (release) и по истечении аренды;
+    периодическая задача dispatch_scheduled_stages_task добирает освободившуюся ёмкость.
+    Если Redis недоступен, этап отправляется в Celery напрямую.
+    """
+
+    prefix = "sched:"
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        user_max_in_flight: int,
+        bulk_max_in_flight: int,
+        bulk_rate_per_minute: int,
+        lease: float,
+        job_ttl: float,
+    ):
+        self.max_in_flight = max_in_flight
+        self.user_max_in_flight = user_max_in_flight
+        # Фоновая полоса не занимает всю ёмкость: оплаченным этапам всегда остаются слоты.
+        # Её этапы выдаются по капле, чтобы массовый перезапуск после сбоя провайдера
+        # не перегрузил его снова.
+        self.bulk_max_in_flight = bulk_max_in_flight
+        self.bulk_rate_per_minute = bulk_rate_per_minute
+        self.lease = lease
+        self.job_ttl = job_ttl
+
+    def _job_key(self, stage_id: str) -> str:
+        return f"{self.prefix}job:{stage_id}"
+
+    @property
+    def _inflight_key(self) -> str:
+        return f"{self.prefix}inflight"
+
+    async def submit(
+        self,
+        stage_type: StageType,
+        stage_id: Union[UUID, str],
+        telegram_id: int,
+        lane: SchedulingLane = SchedulingLane.PAID,
+        dispatch: bool = True,
+    ) -> bool:
+        """
+        Ставит этап в очередь пользователя. Возвращает False, если этап уже ждёт
+        или выполняется (повторное нажатие «Подтвердить»). dispatch=False — не выдавать
+        сразу: при постановке пачкой dispatch вызывается один раз в конце.
+        """
+        task_name = STAGE_TASK_NAMES.get(stage_type)
+        if task_name is None:
+            raise ValueError(f"No generation task for stage type {stage_type}")
+
+        stage_id = str(stage_id)
+        job = json.dumps({"task": task_name, "stage_id": stage_id})
+        try:
+            accepted = await get_redis().eval(
+                _SUBMIT_SCRIPT,
+                3,
+                self._job_key(stage_id),
+                f"{self.prefix}lane:{lane}:user:{telegram_id}",
+                f"{self.prefix}lane:{lane}:ring",
+                telegram_id,
+                job,
+                int(self.job_ttl * 1000),
+            )
+        except Exception as e:
+            logger.warning(f"Scheduler unavailable, sending stage {stage_id} to Celery directly: {e}")
+            await self._send(task_name, stage_id)
+            return True
+
+        if not accepted:
+            logger.info(f"Stage {stage_id} is already scheduled")
+            return False
+
+        logger.info(f"Stage {stage_id} scheduled for user {telegram_id} in lane {lane}")
+        if dispatch:
+            await self.dispatch()
+        return True
+
+    async def dispatch(self, limit: Optional[int] = None) -> int:
+        """
+        Отправляет в Celery этапы, пока есть свободная ёмкость. Возвращает число отправленных.
+        """
+        sent = 0
+        while limit is None or sent < limit:
+            try:
+                raw = await get_redis().eval(
+                    _DISPATCH_SCRIPT,
+                    1,
+                    self._inflight_key,
+                    self.max_in_flight,
+                    self.user_max_in_flight,
+                    int(self.lease * 1000),
+                    self.prefix,
+                    SchedulingLane.PAID,
+                    0,
+                    0,
+                    SchedulingLane.BULK,
+                    self.bulk_max_in_flight,
+                    self.bulk_rate_per_minute,
+                )
+            except Exception as e:
+                logger.warning(f"Scheduler dispatch failed: {e}")
+                break
+            if not raw:
+                break
+
+            job = json.loads(raw)
+            try:
+                await self._send(job["task"], job["stage_id"])
+            except Exception as e:
+                # Слот освободится по аренде, а этап подберёт разборщик зависших
+                logger.error(f"Failed to send stage {job['stage_id']} to Celery: {e}")
+                break
+            sent += 1
+        return sent
+
+    async def release(self, stage_id: Union[UUID, str], dispatch: bool = True) -> None:
+        """
+        Освобождает слот этапа после завершения задачи и выдаёт следующие этапы.
+        """
+        stage_id = str(stage_id)
+        try:
+            await get_redis().eval(
+                _RELEASE_SCRIPT, 2, self._job_key(stage_id), self._inflight_key, stage_id, self.prefix, *SchedulingLane
+            )
+        except Exception as e:
+            logger.warning(f"Failed to release scheduler slot of stage {stage_id}: {e}")
+            return
+        if dispatch:
+            await self.dispatch()
+
+    @staticmethod
+    async def _send(task_name: str, stage_id: str) -> None:
+        from app.infra.queue.celery_app import celery_app
+
+        # Публикация в брокер синхронная — выносим из event loop
+        await asyncio.to_thread(celery_app.send_task, task_name, args=[stage_id])
+
+
+stage_scheduler = StageScheduler(
+    max_in_flight=settings.SCHED_MAX_IN_FLIGHT,
+    user_max_in_flight=settings.SCHED_USER_MAX_IN_FLIGHT,
+    bulk_max_in_flight=settings.SCHED_BULK_MAX_IN_FLIGHT,
+    bulk_rate_per_minute=settings.SCHED_BULK_RATE_PER_MINUTE,
+    lease=settings.SCHED_INFLIGHT_LEASE,
+    job_ttl=settings.SCHED_JOB_TTL,
+)
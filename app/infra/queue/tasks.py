@@ -1,76 +1,183 @@
 import asyncio
-from typing import List
-from uuid import UUID
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Callable, List, Optional, Sequence, Tuple
+from uuid import UUID, uuid4
+import httpx
 from celery import shared_task
 from app.infra.queue.celery_app import celery_app
+from app.infra.queue.runner import run_async
+from app.infra.queue.metrics_rollup import rollup_daily_metrics
+from app.infra.queue.reaper import reap_stuck_stages
+from app.infra.queue.retry import StageDeferred, StageRetry, is_transient_error, retry_countdown
+from app.infra.queue.routing import stage_deadline
+from app.infra.queue.scheduler import stage_scheduler
 from app.infra.db.session import async_session_factory
 from app.infra.db.repositories.order_repo import OrderRepo
 from app.infra.db.repositories.stage_repo import StageRepo
 from app.infra.db.repositories.artifact_repo import ArtifactRepo
 from app.infra.db.repositories.config_repo import ConfigRepo
-from app.infra.ai.yandex_gpt import YandexGPTProvider
-from app.infra.ai.test_provider import DummyTextProvider
-from app.infra.ai.gemini import GeminiProvider
-from app.infra.ai.openai import OpenAIProvider
-from app.infra.ai.speechkit import SpeechKitProvider
-from app.infra.storage.s3 import S3Storage
+from app.infra.db.repositories.provider_call_repo import ProviderCallRepo
+from app.infra.cache.config_snapshot import ProviderKeySnapshot, ProviderSnapshot, publish_config_invalidation
+from app.infra.cache.tts_cache import TtsAudioCache, tts_audio_cache, tts_cache_key
+from app.infra.ai.adaptive_routing import adaptive_router
+from app.infra.ai.audio import AUDIO_CONTENT_TYPES, AUDIO_EXTENSIONS, iter_synthesized_audio
+from app.infra.ai.base import StreamingTextProvider, TextProvider
+from app.infra.ai.key_pool import key_pool
+from app.infra.ai.limiter import UNLIMITED, ProviderLimits, provider_limiter
+from app.infra.ai.hedging import HedgeAttempt, latency_tracker, run_hedged
+from app.infra.ai.registry import get_provider
+from app.infra.ai.telemetry import provider_calls, report_first_chunk
+from app.infra.db.models import User
+from app.infra.events.stage_events import (
+    StageCompletionEvent,
+    StageEventType,
+    StagePartialEvent,
+    publish_stage_completion,
+    publish_stage_partial,
+)
+from app.infra.storage.s3 import s3_storage
 from app.infra.config.settings import settings
 from app.application.services.prompt_builder import PromptBuilder
 from app.application.services.content_policy import ContentPolicy
-from app.domain.enums import OrderStageStatus, ArtifactType, ProviderKind, StageType
+from app.domain.constants import ALLOWED_PROVIDERS
+from app.domain.enums import OrderStageStatus, ArtifactType, ProviderKind, RoutingMode, StageType
 import logging
 
 logger = logging.getLogger(__name__)
 
-def get_provider(kind: ProviderKind, api_key: str = None):
-    if kind == ProviderKind.YANDEX_GPT:
-        return YandexGPTProvider(api_key=api_key)
-    if kind == ProviderKind.GEMINI:
-        return GeminiProvider(api_key=api_key)
-    if kind == ProviderKind.OPENAI:
-        return OpenAIProvider(api_key=api_key)
-    if kind == ProviderKind.SPEECHKIT:
-        return SpeechKitProvider(api_key=api_key)
-    return DummyTextProvider()
-
-async def _generate_poem_logic(stage_id: str):
+
+def _completion_event(stage, telegram_id: int, event: StageEventType, **payload) -> StageCompletionEvent:
+    return StageCompletionEvent(
+        event=event,
+        stage_id=str(stage.id),
+        order_id=str(stage.order_id),
+        stage_type=str(stage.stage_type),
+        telegram_id=telegram_id,
+        **payload,
+    )
+
+async def _run_scheduled(stage_id: str, logic) -> None:
+    # Слот планировщика освобождается при любом исходе, следующий этап уходит сразу.
+    # Исключение — повтор: этап остаётся за пользователем, аренда слота длиннее паузы.
+    retrying = False
+    try:
+        await logic(stage_id)
+    except StageRetry:
+        retrying = True
+        raise
+    finally:
+        if not retrying:
+            await stage_scheduler.release(stage_id)
+
+def _run_stage_task(task, stage_id: str, logic):
+    # Владелец аренды уникален для каждого запуска: повторная доставка того же
+    # сообщения (с тем же task id) не должна считаться тем же исполнителем
+    owner = f"{task.request.hostname}/{task.request.id}/{uuid4().hex[:8]}"
+    try:
+        return run_async(
+            _run_scheduled(stage_id, partial(logic, owner=owner)), timeout=celery_app.conf.task_time_limit
+        )
+    except StageDeferred as e:
+        # Ожидание квоты — не повтор после ошибки: задача ставится заново, и счётчик
+        # повторов Celery (max_retries) не растёт
+        task.apply_async(args=[stage_id], countdown=e.countdown)
+    except StageRetry as e:
+        raise task.retry(countdown=e.countdown, exc=e.cause)
+
+async def _defer_if_busy(
+    stage_id: str, candidates: Sequence[Tuple[str, Sequence[ProviderKeySnapshot], ProviderLimits]]
+) -> None:
+    """
+    Бросает StageDeferred, если ни у одного ключа кандидатов (провайдер, ключи, лимиты)
+    нет квоты. Вызывается до взятия этапа: иначе задача заняла бы поток воркера
+    на всё ожидание в provider_limiter.slot, а поток мог бы выполнять этапы других провайдеров.
+    """
+    waits = [
+        await provider_limiter.wait_time(kind, key.value, limits)
+        for kind, keys, limits in candidates
+        for key in keys
+    ]
+    wait = min(waits, default=0.0)
+    if wait <= 0:
+        return
+    countdown = min(max(wait, settings.PROVIDER_BUSY_DELAY), settings.STAGE_RETRY_MAX_DELAY)
+    countdown *= random.uniform(1.0, 1.2)
+    logger.info(f"No provider capacity for stage {stage_id}, deferring for {countdown:.1f}s")
+    raise StageDeferred(countdown, f"No provider capacity for stage {stage_id}")
+
+async def _fail_or_retry(session, stage, owner: str, telegram_id: int, error: Exception) -> None:
+    """
+    Временная ошибка возвращает этап в очередь и бросает StageRetry, пока не исчерпаны
+    попытки; иначе этап помечается FAILED и бот получает событие.
+    """
+    failed_event = _completion_event(stage, telegram_id, StageEventType.FAILED)
+    stage_id, attempts = stage.id, stage.attempts
+    await session.rollback()
+    stage_repo = StageRepo(session)
+
+    if is_transient_error(error) and attempts < settings.STAGE_MAX_ATTEMPTS:
+        if await stage_repo.release_claim(stage_id, owner, OrderStageStatus.QUEUED):
+            await session.commit()
+            countdown = retry_countdown(
+                attempts, error, settings.STAGE_RETRY_BASE_DELAY, settings.STAGE_RETRY_MAX_DELAY
+            )
+            logger.warning(f"Transient error on stage {stage_id} (attempt {attempts}), retry in {countdown:.0f}s: {error}")
+            raise StageRetry(countdown, error) from error
+        logger.warning(f"Lease of stage {stage_id} was lost, skipping retry")
+        return
+
+    logger.error(f"Stage {stage_id} failed after {attempts} attempt(s): {error}")
+    if await stage_repo.release_claim(stage_id, owner, OrderStageStatus.FAILED, error=str(error)):
+        await session.commit()
+        await publish_stage_completion(failed_event)
+
+async def _generate_poem_logic(stage_id: str, owner: str):
     async with async_session_factory() as session:
         stage_repo = StageRepo(session)
         order_repo = OrderRepo(session)
         artifact_repo = ArtifactRepo(session)
         config_repo = ConfigRepo(session)
-        
-        stage = await stage_repo.get_by_id(UUID(stage_id))
-        if not stage:
-            logger.error(f"Stage {stage_id} not found")
-            return
 
-        if stage.status != OrderStageStatus.PAID and stage.status != OrderStageStatus.QUEUED:
-            logger.warning(f"Stage {stage_id} has invalid status for generation: {stage.status}")
+        # Конфигурация берётся из снимка в памяти процесса, без запросов к БД.
+        # Квота провайдера проверяется до взятия этапа: без неё этап вернётся в очередь
+        snapshot = await config_repo.get_snapshot()
+        cfg = snapshot.provider(StageType.POEM)
+        stop_words = snapshot.stop_words("poem_rules")
+        if cfg and cfg.api_keys:
+            fallbacks = settings.POEM_HEDGE_ENABLED or cfg.routing_mode == RoutingMode.ADAPTIVE
+            candidates = _poem_candidates(cfg, fallbacks=fallbacks)
+            await _defer_if_busy(stage_id, [(c.kind, c.keys, c.limits) for c in candidates])
+
+        # Берём этап в работу атомарно: вторая доставка той же задачи сюда не пройдёт
+        stage = await stage_repo.claim(UUID(stage_id), owner, stage_deadline(StageType.POEM))
+        if not stage:
+            logger.warning(f"Stage {stage_id} is not available for generation (missing, taken or finished)")
             return
 
+        # Все чтения из БД делаем до вызова провайдера: commit ниже возвращает
+        # соединение в пул, и оно не простаивает всё время генерации.
         order = await order_repo.get_by_id(stage.order_id)
-        
-        # Обновляем статус на PROCESSING
-        stage.status = OrderStageStatus.PROCESSING
+        user = await session.get(User, order.user_id)
+
+        # Чтения закончены — возвращаем соединение в пул на время генерации
         await session.commit()
 
         try:
             logger.info(f"Starting poem generation for stage {stage_id}")
 
-            # Получаем конфиг провайдера для этапа POEM
-            cfg = await config_repo.get_provider_config(StageType.POEM)
-            
-            if not cfg or not cfg.api_key_encrypted:
-                # Fallback to settings if no DB config found
-                if not settings.GEMINI_API_KEY:
-                    raise ValueError("No provider configuration found for POEM and no fallback GEMINI_API_KEY")
-                provider = GeminiProvider(api_key=settings.GEMINI_API_KEY.get_secret_value())
-                provider_params = {"model": "gemini-1.5-flash"}
-            else:
-                api_key = config_repo.decrypt_api_key(cfg.api_key_encrypted)
-                provider = get_provider(cfg.provider_kind, api_key=api_key)
-                provider_params = {"model": cfg.model}
+            # Основной провайдер POEM и запасные для хеджирования
+            adaptive = bool(cfg and cfg.routing_mode == RoutingMode.ADAPTIVE)
+            candidates = _poem_candidates(cfg, fallbacks=settings.POEM_HEDGE_ENABLED or adaptive)
+            if adaptive:
+                # Первым идёт кандидат с лучшими задержкой и долей ошибок по всем воркерам
+                candidates = await adaptive_router.order(StageType.POEM, candidates, lambda c: c.route_key)
+                if not settings.POEM_HEDGE_ENABLED:
+                    candidates = candidates[:1]
             
             # Собираем промпт
             prompt_builder = PromptBuilder()
@@ -78,51 +185,218 @@ async def _generate_poem_logic(stage_id: str):
             
             logger.info(f"Generated prompt: {prompt}")
 
-            # Генерируем
-            poem_text = await provider.generate_poem(prompt, provider_params)
-            
-            logger.info(f"Raw provider response: {poem_text}")
-            
-            # Проверяем контент-политику
-            policy_cfg = await config_repo.get_content_policy("poem_rules")
-            stop_words = policy_cfg.rules_json.get("stop_words", []) if policy_cfg else []
+            # Генерируем: если основной провайдер не ответил за обычное для него время,
+            # параллельно запускается следующий, побеждает первый ответивший
             content_policy = ContentPolicy(stop_words=stop_words)
-            
-            if not content_policy.is_appropriate(poem_text):
-                raise ValueError("Generated content violates content policy")
-
-            # Сохраняем артефакт
-            from app.infra.db.models import Artifact
-            artifact = Artifact(
-                order_id=order.id,
-                stage_id=stage.id,
-                type=ArtifactType.TEXT,
-                storage_key=poem_text # Для текста храним прямо в поле или в storage_key если так решили в Итерации 1
+            attempts = [
+                HedgeAttempt(
+                    label=candidate.kind,
+                    factory=partial(
+                        _generate_with_candidate, candidate, prompt, content_policy, stage_id, user.telegram_id
+                    ),
+                    latency_key=candidate.latency_key,
+                )
+                for candidate in candidates
+            ]
+            winner, poem_text = await run_hedged(
+                attempts, hedge_delay=_hedge_delay(candidates[0]), tracker=latency_tracker
             )
-            # В модели Artifact в Итерации 1 было storage_key. 
-            # Согласно РоудМэп.md в artifacts есть поле text (null) - для стихов.
-            # Но в текущей app/infra/db/models.py поля text нет. 
-            # Буду использовать storage_key как временное хранилище текста или проверю модель еще раз.
-            # Перечитаю models.py... Там только storage_key.
             
-            session.add(artifact)
-            stage.status = OrderStageStatus.COMPLETED
+            logger.info(f"Raw provider response ({winner}): {poem_text}")
+
+            # Сохраняем артефакт: текст — в text_contents, в артефакте только ссылка
+            await artifact_repo.add_text(order.id, stage.id, poem_text)
+            if not await stage_repo.release_claim(stage.id, owner, OrderStageStatus.COMPLETED):
+                await session.rollback()
+                logger.warning(f"Lease of stage {stage_id} was lost or stage cancelled, dropping result")
+                return
             await session.commit()
             logger.info(f"Poem generated successfully for stage {stage_id}")
 
+            # Текст прошёл политику и сохранён — бот получит его сразу, без опроса БД
+            await publish_stage_completion(
+                _completion_event(stage, user.telegram_id, StageEventType.COMPLETED, text=poem_text)
+            )
+
         except Exception as e:
             logger.exception(f"Error generating poem for stage {stage_id}: {e}")
-            stage.status = OrderStageStatus.FAILED
-            await session.commit()
+            await _fail_or_retry(session, stage, owner, user.telegram_id, e)
             raise
 
-@celery_app.task(name="generate_poem_task", bind=True, max_retries=3)
+
+@dataclass(frozen=True)
+class _PoemCandidate:
+    kind: ProviderKind
+    model: Optional[str]
+    params: dict
+    keys: Tuple[ProviderKeySnapshot, ...]
+    pool_id: str
+    limits: ProviderLimits = UNLIMITED
+
+    def provider(self, key: ProviderKeySnapshot) -> TextProvider:
+        return get_provider(self.kind, api_key=key.value, model=self.model)
+
+    @property
+    def streaming(self) -> bool:
+        return settings.POEM_STREAMING_ENABLED and isinstance(self.provider(self.keys[0]), StreamingTextProvider)
+
+    @property
+    def latency_key(self) -> str:
+        # Для потоковой генерации важна задержка до первого фрагмента, для обычной — до ответа
+        return f"{self.route_key}:{'stream' if self.streaming else 'full'}"
+
+    @property
+    def route_key(self) -> str:
+        return f"{self.kind}:{self.params.get('model') or '-'}"
+
+
+def _settings_api_key(kind: ProviderKind) -> Optional[str]:
+    secret = {
+        ProviderKind.GEMINI: settings.GEMINI_API_KEY,
+        ProviderKind.YANDEX_GPT: settings.YANDEX_GPT_API_KEY,
+        ProviderKind.OPENAI: settings.OPENAI_API_KEY,
+        ProviderKind.SPEECHKIT: settings.SPEECHKIT_API_KEY,
+    }.get(kind)
+    return secret.get_secret_value() if secret else None
+
+
+def _poem_candidates(cfg: Optional[ProviderSnapshot], fallbacks: bool = True) -> List[_PoemCandidate]:
+    """
+    Основной провайдер — из конфигурации этапа (или Gemini из окружения),
+    запасные (fallbacks) — остальные допустимые для POEM провайдеры, для которых задан ключ в окружении.
+    """
+    if cfg and cfg.api_keys:
+        candidates = [
+            _PoemCandidate(
+                cfg.provider_kind,
+                cfg.model,
+                {"model": cfg.model},
+                cfg.api_keys,
+                pool_id=f"config:{cfg.id}",
+                limits=cfg.limits,
+            )
+        ]
+    elif settings.GEMINI_API_KEY:
+        # Fallback to settings if no DB config found
+        candidates = [
+            _PoemCandidate(
+                ProviderKind.GEMINI,
+                None,
+                {"model": "gemini-1.5-flash"},
+                (ProviderKeySnapshot(id=None, value=_settings_api_key(ProviderKind.GEMINI)),),
+                pool_id=f"env:{ProviderKind.GEMINI}",
+            )
+        ]
+    else:
+        raise ValueError("No provider configuration found for POEM and no fallback GEMINI_API_KEY")
+
+    if fallbacks:
+        for kind in ALLOWED_PROVIDERS[StageType.POEM]:
+            api_key = _settings_api_key(kind)
+            if api_key and all(candidate.kind != kind for candidate in candidates):
+                candidates.append(
+                    _PoemCandidate(
+                        kind, None, {}, (ProviderKeySnapshot(id=None, value=api_key),), pool_id=f"env:{kind}"
+                    )
+                )
+    return candidates
+
+
+def _hedge_delay(primary: _PoemCandidate) -> float:
+    observed = latency_tracker.percentile(
+        primary.latency_key, settings.POEM_HEDGE_PERCENTILE, min_samples=settings.POEM_HEDGE_MIN_SAMPLES
+    )
+    delay = observed if observed is not None else settings.POEM_HEDGE_DEFAULT_DELAY
+    return min(max(delay, settings.POEM_HEDGE_MIN_DELAY), settings.POEM_HEDGE_MAX_DELAY)
+
+
+async def _generate_with_candidate(
+    candidate: _PoemCandidate,
+    prompt: str,
+    content_policy: ContentPolicy,
+    stage_id: str,
+    telegram_id: int,
+    commit: Callable[[], bool],
+) -> str:
+    async def _generate(key: ProviderKeySnapshot) -> str:
+        # Ждём квоту ключа, а не получаем 429; слот держится до конца потока
+        async with provider_limiter.slot(candidate.kind, key.value, candidate.limits):
+            provider = candidate.provider(key)
+            started = time.monotonic()
+            try:
+                # Замер — без ожидания квоты: в телеметрию попадает только сам запрос
+                async with provider_calls.track(
+                    candidate.kind,
+                    candidate.params.get("model") or candidate.model,
+                    "stream" if candidate.streaming else "generate",
+                    key.value,
+                    stage_id=stage_id,
+                    stage_type=StageType.POEM,
+                ) as call:
+                    if candidate.streaming:
+                        text = await _stream_poem(
+                            provider, prompt, candidate.params, content_policy, stage_id, telegram_id, commit
+                        )
+                    else:
+                        text = await provider.generate_poem(prompt, candidate.params)
+                    call.response_bytes = len(text.encode())
+            except (httpx.HTTPError, asyncio.TimeoutError):
+                # Для выбора провайдера считаются только его сбои, не нарушения контент-политики
+                await adaptive_router.record(StageType.POEM, candidate.route_key, ok=False)
+                raise
+        await adaptive_router.record(StageType.POEM, candidate.route_key, ok=True, latency=time.monotonic() - started)
+        return text
+
+    # Запросы распределяются по ключам пула, ключ с 429 уходит на паузу
+    poem_text = await key_pool.call(candidate.pool_id, candidate.keys, _generate)
+
+    # Проверяем контент-политику: при нарушении ответ не засчитывается и очередь переходит к следующему провайдеру
+    if not content_policy.is_appropriate(poem_text):
+        raise ValueError("Generated content violates content policy")
+    return poem_text
+
+
+async def _stream_poem(
+    provider: StreamingTextProvider,
+    prompt: str,
+    params: dict,
+    content_policy: ContentPolicy,
+    stage_id: str,
+    telegram_id: int,
+    commit: Callable[[], bool],
+) -> str:
+    """
+    Генерирует стих потоково и публикует накопленный текст для бота не чаще
+    STREAM_PUBLISH_INTERVAL. Каждый промежуточный текст проверяется контент-политикой
+    до публикации, при нарушении генерация прерывается.
+
+    Первый фрагмент делает попытку победителем (commit): черновик в чате
+    показывается только от одного провайдера.
+    """
+    text = ""
+    last_published = 0.0
+    async for chunk in provider.stream_poem(prompt, params):
+        report_first_chunk()
+        text += chunk
+        if not content_policy.is_appropriate(text):
+            raise ValueError("Generated content violates content policy")
+        if not commit():
+            return text.strip()
+
+        now = time.monotonic()
+        if now - last_published >= settings.STREAM_PUBLISH_INTERVAL:
+            await publish_stage_partial(StagePartialEvent(stage_id=stage_id, telegram_id=telegram_id, text=text))
+            last_published = now
+    return text.strip()
+
+@celery_app.task(name="generate_poem_task", bind=True, max_retries=settings.STAGE_MAX_ATTEMPTS)
 def generate_poem_task(self, stage_id: str):
-    return asyncio.run(_generate_poem_logic(stage_id))
+    return _run_stage_task(self, stage_id, _generate_poem_logic)
 
-async def _generate_voice_logic(stage_id: str):
+async def _generate_voice_logic(stage_id: str, owner: str):
     async with async_session_factory() as session:
         stage_repo = StageRepo(session)
+        order_repo = OrderRepo(session)
         artifact_repo = ArtifactRepo(session)
         config_repo = ConfigRepo(session)
         
@@ -131,46 +405,46 @@ async def _generate_voice_logic(stage_id: str):
             logger.error(f"Invalid stage for voice generation: {stage_id}")
             return
 
-        if stage.status not in [OrderStageStatus.PAID, OrderStageStatus.QUEUED]:
-            logger.warning(f"Stage {stage_id} has invalid status: {stage.status}")
+        cfg = (await config_repo.get_snapshot()).provider(StageType.VOICE)
+        if cfg and cfg.provider_kind == ProviderKind.SPEECHKIT and cfg.api_keys:
+            await _defer_if_busy(stage_id, [(cfg.provider_kind, cfg.api_keys, cfg.limits)])
+
+        stage = await stage_repo.claim(stage.id, owner, stage_deadline(StageType.VOICE))
+        if not stage:
+            logger.warning(f"Stage {stage_id} is not available for voice generation (taken or finished)")
             return
 
-        stage.status = OrderStageStatus.PROCESSING
+        order = await order_repo.get_by_id(stage.order_id)
+        user = await session.get(User, order.user_id)
+        text_artifact = await artifact_repo.get_latest_text_artifact(stage.order_id)
+        # Текст читается до коммита, чтобы не держать транзакцию открытой на время синтеза
+        poem_text = await artifact_repo.get_text(text_artifact) if text_artifact else None
         await session.commit()
 
         try:
             # 1. Получаем текст стиха
-            text_artifact = await artifact_repo.get_latest_text_artifact(stage.order_id)
-            if not text_artifact:
+            if poem_text is None:
                 raise ValueError(f"No text artifact found for order {stage.order_id}")
-            
-            poem_text = text_artifact.storage_key # Текст хранится в storage_key
 
             # 2. Получаем конфиг SpeechKit
-            cfg = await config_repo.get_provider_config(StageType.VOICE)
-            if not cfg or cfg.provider_kind != ProviderKind.SPEECHKIT:
+            if cfg and cfg.provider_kind == ProviderKind.SPEECHKIT and cfg.api_keys:
+                keys, pool_id, limits = cfg.api_keys, f"config:{cfg.id}", cfg.limits
+                provider_params = {"model": cfg.model}
+            else:
                 # Fallback to settings
-                api_key = settings.SPEECHKIT_API_KEY.get_secret_value() if settings.SPEECHKIT_API_KEY else None
-                provider = SpeechKitProvider(api_key=api_key)
+                api_key = _settings_api_key(ProviderKind.SPEECHKIT)
+                if not api_key:
+                    raise ValueError("SpeechKit API key is not configured")
+                keys = (ProviderKeySnapshot(id=None, value=api_key),)
+                pool_id, limits = f"env:{ProviderKind.SPEECHKIT}", UNLIMITED
                 provider_params = {"model": "filipp"}
-            else:
-                api_key = config_repo.decrypt_api_key(cfg.api_key_encrypted)
-                provider = get_provider(cfg.provider_kind, api_key=api_key)
-                provider_params = {"model": cfg.model}
+            provider_params["format"] = settings.TTS_AUDIO_FORMAT
 
-            # 3. Синтезируем
+            # 3. Ищем готовое аудио в кэше, иначе синтезируем и сохраняем в S3
             logger.info(f"Synthesizing voice for stage {stage_id} with voice {provider_params['model']}")
-            audio_content = await provider.synthesize(poem_text, provider_params)
+            uploaded_key = await _synthesize_voice(poem_text, provider_params, keys, pool_id, limits, stage_id)
 
-            # 4. Сохраняем в S3
-            s3 = S3Storage()
-            s3_key = f"orders/{stage.order_id}/voice_{stage.id}.mp3"
-            uploaded_key = await s3.upload_file(audio_content, s3_key)
-            
-            if not uploaded_key:
-                raise ValueError("Failed to upload audio to S3 (check credentials)")
-
-            # 5. Создаем артефакт
+            # 4. Создаем артефакт
             from app.infra.db.models import Artifact
             artifact = Artifact(
                 order_id=stage.order_id,
@@ -179,48 +453,90 @@ async def _generate_voice_logic(stage_id: str):
                 storage_key=uploaded_key
             )
             session.add(artifact)
-            
-            stage.status = OrderStageStatus.COMPLETED
+            if not await stage_repo.release_claim(stage.id, owner, OrderStageStatus.COMPLETED):
+                await session.rollback()
+                logger.warning(f"Lease of stage {stage_id} was lost or stage cancelled, dropping result")
+                return
             await session.commit()
             logger.info(f"Voice generated successfully for stage {stage_id}")
+            await publish_stage_completion(
+                _completion_event(stage, user.telegram_id, StageEventType.COMPLETED, storage_key=uploaded_key)
+            )
 
         except Exception as e:
             logger.exception(f"Error generating voice for stage {stage_id}: {e}")
-            stage.status = OrderStageStatus.FAILED
-            await session.commit()
+            await _fail_or_retry(session, stage, owner, user.telegram_id, e)
             raise
 
-@celery_app.task(name="generate_voice_task", bind=True, max_retries=3)
+async def _synthesize_voice(
+    poem_text: str,
+    params: dict,
+    keys: Tuple[ProviderKeySnapshot, ...],
+    pool_id: str,
+    limits: ProviderLimits,
+    stage_id: Optional[str] = None,
+) -> str:
+    """
+    Возвращает ключ S3 с озвучкой текста. Одинаковый текст с теми же голосом,
+    языком и форматом синтезируется один раз: повторы и ретраи берут файл из кэша.
+    """
+    audio_format = params["format"]
+    cache_key = tts_cache_key(poem_text, params["model"], params.get("lang", "ru-RU"), audio_format)
+    if settings.TTS_CACHE_ENABLED:
+        cached_key = await tts_audio_cache.get(cache_key)
+        if cached_key:
+            logger.info(f"TTS cache hit: {cached_key}")
+            return cached_key
+
+    s3_key = TtsAudioCache.storage_key(cache_key, AUDIO_EXTENSIONS[audio_format])
+
+    async def _upload(key: ProviderKeySnapshot) -> Optional[str]:
+        # Синтезируем по строфам параллельно и склеенное аудио сразу отправляем в S3
+        provider = get_provider(ProviderKind.SPEECHKIT, api_key=key.value)
+
+        @asynccontextmanager
+        async def slot():
+            # Каждый запрос синтеза — отдельная запись телеметрии
+            tracked = provider_calls.track(
+                ProviderKind.SPEECHKIT, params["model"], "synthesize", key.value,
+                stage_id=stage_id, stage_type=StageType.VOICE,
+            )
+            async with provider_limiter.slot(ProviderKind.SPEECHKIT, key.value, limits), tracked:
+                yield
+
+        return await s3_storage.upload_stream(
+            iter_synthesized_audio(provider, poem_text, params, slot=slot),
+            s3_key,
+            content_type=AUDIO_CONTENT_TYPES[audio_format],
+        )
+
+    # При 429 загрузка прерывается и повторяется с другим ключом из пула
+    uploaded_key = await key_pool.call(pool_id, keys, _upload)
+    if not uploaded_key:
+        raise ValueError("Failed to upload audio to S3 (check credentials)")
+
+    if settings.TTS_CACHE_ENABLED:
+        await tts_audio_cache.put(cache_key, uploaded_key)
+    return uploaded_key
+
+@celery_app.task(name="generate_voice_task", bind=True, max_retries=settings.STAGE_MAX_ATTEMPTS)
 def generate_voice_task(self, stage_id: str):
-    return asyncio.run(_generate_voice_logic(stage_id))
+    return _run_stage_task(self, stage_id, _generate_voice_logic)
 
 async def _sync_provider_models_logic():
     async with async_session_factory() as session:
         config_repo = ConfigRepo(session)
         configs = await config_repo.get_all_provider_configs()
         
-        from app.infra.ai.gemini import GeminiProvider
-        from app.infra.ai.yandex_gpt import YandexGPTProvider
-        from app.infra.ai.openai import OpenAIProvider
-        from app.infra.ai.speechkit import SpeechKitProvider
-        
         for cfg in configs:
             if not cfg.api_key_encrypted:
                 continue
                 
             try:
                 api_key = config_repo.decrypt_api_key(cfg.api_key_encrypted)
-                provider_inst = None
-                if cfg.provider_kind == ProviderKind.GEMINI:
-                    provider_inst = GeminiProvider(api_key=api_key)
-                elif cfg.provider_kind == ProviderKind.YANDEX_GPT:
-                    provider_inst = YandexGPTProvider(api_key=api_key)
-                elif cfg.provider_kind == ProviderKind.OPENAI:
-                    provider_inst = OpenAIProvider(api_key=api_key)
-                elif cfg.provider_kind == ProviderKind.SPEECHKIT:
-                    provider_inst = SpeechKitProvider(api_key=api_key)
+                provider_inst = get_provider(cfg.provider_kind, api_key=api_key)
                 
-                if provider_inst and hasattr(provider_inst, 'list_models'):
+                if hasattr(provider_inst, 'list_models'):
                     models = await provider_inst.list_models()
                     cfg.models_cache = models
                     from sqlalchemy import func
@@ -237,7 +553,35 @@ async def _sync_provider_models_logic():
                 cfg.status = "error"
         
         await session.commit()
+        await publish_config_invalidation()
 
 @celery_app.task(name="sync_provider_models_task")
 def sync_provider_models_task():
-    return asyncio.run(_sync_provider_models_logic())
\ No newline at end of file
+    return run_async(_sync_provider_models_logic(), timeout=celery_app.conf.task_time_limit)
+
+@celery_app.task(name="reap_stuck_stages_task")
+def reap_stuck_stages_task():
+    result = run_async(reap_stuck_stages(), timeout=120)
+    return {"requeued": result.requeued, "failed": result.failed, "resubmitted": result.resubmitted}
+
+@celery_app.task(name="dispatch_scheduled_stages_task")
+def dispatch_scheduled_stages_task():
+    # Добирает ёмкость, освободившуюся по истечении аренды или после потерянного release
+    return run_async(stage_scheduler.dispatch(), timeout=60)
+
+async def _cleanup_provider_calls_logic() -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.PROVIDER_TELEMETRY_RETENTION_DAYS)
+    async with async_session_factory() as session:
+        deleted = await ProviderCallRepo(session).delete_before(cutoff)
+        await session.commit()
+    logger.info(f"Deleted {deleted} provider call records older than {cutoff:%Y-%m-%d}")
+    return deleted
+
+@celery_app.task(name="cleanup_provider_calls_task")
+def cleanup_provider_calls_task():
+    return run_async(_cleanup_provider_calls_logic(), timeout=celery_app.conf.task_time_limit)
+
+
+@celery_app.task(name="rollup_daily_metrics_task")
+def rollup_daily_metrics_task():
+    return run_async(rollup_daily_metrics(), timeout=celery_app.conf.task_time_limit)
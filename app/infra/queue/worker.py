@@ -0,0 +1,52 @@
+"""
+Запуск воркера с профилем очередей:
+
+    python -m app.infra.queue.worker --profile poem
+    python -m app.infra.queue.worker --queues voice,media --concurrency 30
+"""
+import argparse
+from typing import List, Optional
+
+from app.infra.queue.celery_app import celery_app
+from app.infra.queue.routing import ALL_QUEUES, WORKER_PROFILES
+
+
+def build_worker_argv(
+    profile_name: str,
+    queues: Optional[List[str]] = None,
+    concurrency: Optional[int] = None,
+    pool: Optional[str] = None,
+    loglevel: str = "info",
+) -> List[str]:
+    profile = WORKER_PROFILES[profile_name]
+    queues = queues or profile.queues
+    unknown = set(queues) - set(ALL_QUEUES)
+    if unknown:
+        raise ValueError(f"Unknown queues: {', '.join(sorted(unknown))}")
+
+    return [
+        "worker",
+        f"--loglevel={loglevel}",
+        f"--pool={pool or profile.pool}",
+        f"--concurrency={concurrency or profile.concurrency}",
+        f"--prefetch-multiplier={profile.prefetch_multiplier}",
+        f"--queues={','.join(queues)}",
+        f"--hostname={profile_name}@%h",
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Celery worker for a subset of stage queues")
+    parser.add_argument("--profile", choices=sorted(WORKER_PROFILES), default="all")
+    parser.add_argument("--queues", help="comma-separated queues, overrides the profile")
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--pool", help="celery pool, e.g. solo on Windows")
+    parser.add_argument("--loglevel", default="info")
+    args = parser.parse_args()
+
+    queues = [q.strip() for q in args.queues.split(",") if q.strip()] if args.queues else None
+    celery_app.worker_main(build_worker_argv(args.profile, queues, args.concurrency, args.pool, args.loglevel))
+
+
+if __name__ == "__main__":
+    main()
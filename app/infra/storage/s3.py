@@ -1,39 +1,171 @@
+import asyncio
+import logging
+import weakref
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator, Optional, Tuple
+
 import aiobotocore.session
+from aiobotocore.config import AioConfig
+
 from app.infra.config.settings import settings
-from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Минимальный размер части multipart-загрузки по протоколу S3 (кроме последней)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
 
 class S3Storage:
+    """
+    Хранилище в S3 с долгоживущим клиентом.
+
+    Клиент (и его пул TLS-соединений) создаётся один раз на event loop и
+    переиспользуется всеми загрузками процесса; закрывается через aclose().
+    """
+
     def __init__(self):
         self.session = aiobotocore.session.get_session()
         self.endpoint_url = settings.S3_ENDPOINT_URL
         self.bucket_name = settings.S3_BUCKET_NAME
         self.access_key = settings.S3_ACCESS_KEY.get_secret_value() if settings.S3_ACCESS_KEY else None
         self.secret_key = settings.S3_SECRET_KEY.get_secret_value() if settings.S3_SECRET_KEY else None
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[Any, AsyncExitStack]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+    @property
+    def is_configured(self) -> bool:
+        return all([self.access_key, self.secret_key, self.bucket_name])
+
+    async def client(self):
+        loop = asyncio.get_running_loop()
+        entry = self._clients.get(loop)
+        if entry is not None:
+            return entry[0]
+
+        lock = self._locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            entry = self._clients.get(loop)
+            if entry is None:
+                stack = AsyncExitStack()
+                client = await stack.enter_async_context(
+                    self.session.create_client(
+                        's3',
+                        region_name='ru-central1',
+                        endpoint_url=self.endpoint_url,
+                        aws_access_key_id=self.access_key,
+                        aws_secret_access_key=self.secret_key,
+                        config=AioConfig(max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS),
+                    )
+                )
+                entry = self._clients[loop] = (client, stack)
+        return entry[0]
+
+    async def aclose(self) -> None:
+        entry = self._clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[1].aclose()
 
     async def upload_file(self, content: bytes, key: str, content_type: str = "audio/mpeg") -> Optional[str]:
         """
         Загружает файл в S3 и возвращает ключ (путь).
         """
-        if not all([self.access_key, self.secret_key, self.bucket_name]):
+        if not self.is_configured:
+            return None
+
+        client = await self.client()
+        await client.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=content,
+            ContentType=content_type
+        )
+        return key
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        key: str,
+        content_type: str = "audio/mpeg",
+        part_size: int = settings.S3_MULTIPART_PART_SIZE,
+    ) -> Optional[str]:
+        """
+        Загружает поток байтов, держа в памяти не больше одной части.
+
+        Поток короче part_size загружается одним put_object, длиннее — multipart-загрузкой;
+        при ошибке незавершённая multipart-загрузка отменяется.
+        """
+        if not self.is_configured:
             return None
 
-        async with self.session.create_client(
-            's3',
-            region_name='ru-central1',
-            endpoint_url=self.endpoint_url,
-            aws_access_key_id=self.access_key,
-            aws_secret_access_key=self.secret_key
-        ) as client:
-            await client.put_object(
-                Bucket=self.bucket_name,
-                Key=key,
-                Body=content,
-                ContentType=content_type
+        part_size = max(part_size, MIN_PART_SIZE)
+        client = await self.client()
+        buffer = bytearray()
+        upload_id: Optional[str] = None
+        parts = []
+
+        async def _flush(data: bytes) -> None:
+            nonlocal upload_id
+            if upload_id is None:
+                response = await client.create_multipart_upload(
+                    Bucket=self.bucket_name, Key=key, ContentType=content_type
+                )
+                upload_id = response["UploadId"]
+            part_number = len(parts) + 1
+            response = await client.upload_part(
+                Bucket=self.bucket_name, Key=key, UploadId=upload_id, PartNumber=part_number, Body=data
+            )
+            parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+        try:
+            async for chunk in chunks:
+                buffer += chunk
+                while len(buffer) >= part_size:
+                    await _flush(bytes(buffer[:part_size]))
+                    del buffer[:part_size]
+
+            if upload_id is None:
+                return await self.upload_file(bytes(buffer), key, content_type=content_type)
+
+            if buffer:
+                await _flush(bytes(buffer))
+            await client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
             )
             return key
+        except BaseException:
+            if upload_id is not None:
+                try:
+                    await client.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+                except Exception as e:
+                    logger.warning(f"Failed to abort multipart upload {key}: {e}")
+            raise
+
+    async def download_stream(self, key: str, chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """
+        Отдаёт содержимое объекта частями по chunk_size, не загружая его целиком в память.
+        """
+        client = await self.client()
+        response = await client.get_object(Bucket=self.bucket_name, Key=key)
+        async with response["Body"] as body:
+            async for chunk in body.iter_chunks(chunk_size):
+                yield chunk
+
+    async def presigned_url(self, key: str, expires_in: int = settings.S3_PRESIGNED_URL_TTL) -> str:
+        """
+        Возвращает временную ссылку на скачивание объекта из приватного бакета.
+        """
+        client = await self.client()
+        return await client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket_name, "Key": key}, ExpiresIn=expires_in
+        )
 
     def get_url(self, key: str) -> str:
         """
         Возвращает публичную ссылку на файл (если бакет публичный).
         """
-        return f"{self.endpoint_url}/{self.bucket_name}/{key}"
\ No newline at end of file
+        return f"{self.endpoint_url}/{self.bucket_name}/{key}"
+
+
+s3_storage = S3Storage()
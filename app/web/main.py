@@ -2,11 +2,14 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse
 from app.infra.config.logging import setup_logging
+from app.infra.db.engine import DbRole
+from app.infra.db.session import init_engine
 from app.web.routes import yookassa_webhook, admin
 import logging
 
 def create_app() -> FastAPI:
     setup_logging()
+    init_engine(DbRole.WEB)
     logger = logging.getLogger(__name__)
     
     app = FastAPI(
@@ -1,3 +1,4 @@
+from datetime import datetime, timedelta, timezone
 from uuid import UUID
 from fastapi import APIRouter, Depends, Request, Form, HTTPException
 from fastapi.responses import RedirectResponse
@@ -7,13 +8,27 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy import select, func
 import sqlalchemy as sa
-from typing import List
+from typing import List, Optional
 
 from app.web.auth import get_admin_user
 from app.web.deps import get_session
 from app.infra.db.models import Order, OrderStage, User, ProductConfig, ProviderConfig, APIKey, Payment
-from app.domain.enums import OrderStageStatus, OrderStatus, PaymentStatus, StageType, ProviderKind
+from app.domain.enums import OrderStageStatus, OrderStatus, PaymentStatus, StageType, ProviderKind, RoutingMode
+from app.domain.constants import ALLOWED_PROVIDERS
 from app.infra.utils.crypto import encryption_service
+from app.infra.ai.adaptive_routing import adaptive_router
+from app.infra.cache.config_snapshot import publish_config_invalidation
+from app.infra.cache.tts_cache import METRIC_PREFIX as TTS_CACHE_METRIC_PREFIX
+from app.infra import metrics
+from app.infra.queue.metrics_rollup import request_rollup
+from app.infra.queue.reaper import METRIC_PREFIX as REAPER_METRIC_PREFIX
+from app.infra.db.engine import METRIC_PREFIX as DB_POOL_METRIC_PREFIX, DbRole
+from app.infra.db.repositories.daily_metrics_repo import DailyMetricsRepo
+from app.infra.db.repositories.order_repo import OrderCursor, OrderFilter, OrderRepo
+from app.infra.db.repositories.outbox_repo import OutboxRepo
+from app.infra.db.repositories.provider_call_repo import ProviderCallRepo
+from app.infra.db.repositories.stage_repo import StageFilter, StageRepo
+from app.infra.queue.scheduler import STAGE_TASK_NAMES, SchedulingLane
 from app.web import texts
 
 router = APIRouter()
@@ -21,6 +36,10 @@ templates = Jinja2Templates(directory="app/web/templates")
 templates.env.globals["texts"] = texts
 templates.env.globals["STATUS_LABELS"] = texts.STATUS_LABELS
 
+ORDERS_PAGE_SIZE = 50
+# Выключенные ключи остаются в таблице навсегда; страница показывает только последние
+API_KEYS_HISTORY_LIMIT = 50
+
 def redirect_back(request: Request, fallback_url: str):
     referer = request.headers.get("referer")
     if referer:
@@ -38,33 +57,51 @@ async def admin_root():
 @router.get("/dashboard")
 async def dashboard(
     request: Request,
+    days: int = 30,
     admin: str = Depends(get_admin_user),
     session: AsyncSession = Depends(get_session)
 ):
-    # Статистика для дашборда
-    total_users = await session.scalar(select(func.count(User.id)))
-    total_orders = await session.scalar(select(func.count(Order.id)))
-    total_revenue_cents = await session.scalar(
-        select(func.sum(Payment.amount))
-        .join(Order, Payment.order_id == Order.id)
-        .where(
-            Payment.status == PaymentStatus.SUCCEEDED,
-            Order.status == OrderStatus.PAID,
-            Payment.currency == "RUB"
-        )
-    ) or 0
-    total_revenue = total_revenue_cents / 100
-     
+    # Статистика для дашборда — из сводки по дням, а не по живым таблицам
+    days = min(max(days, 7), 90)
+    metrics_repo = DailyMetricsRepo(session)
+    totals = await metrics_repo.totals()
+    if totals.updated_at is None:
+        # Сводка ещё не считалась (первый запуск после развёртывания): первый проход по всей
+        # истории долгий, поэтому он идёт в служебной очереди, а дашборд показывает пустую сводку
+        await request_rollup()
+    series = await metrics_repo.series(datetime.now(timezone.utc).date() - timedelta(days=days - 1))
+
     recent_orders = (await session.execute(
         select(Order).order_by(Order.created_at.desc()).limit(5)
     )).scalars().all()
 
+    counters = await metrics.get_counters()
+    db_pools = []
+    for role in DbRole:
+        prefix = f"{DB_POOL_METRIC_PREFIX}.{role}"
+        checkouts = counters.get(f"{prefix}.checkouts", 0)
+        if checkouts or counters.get(f"{prefix}.timeouts", 0):
+            db_pools.append({
+                "role": role,
+                "checkouts": checkouts,
+                "avg_wait_ms": counters.get(f"{prefix}.wait_ms", 0) / checkouts if checkouts else None,
+                "slow": counters.get(f"{prefix}.slow", 0),
+                "timeouts": counters.get(f"{prefix}.timeouts", 0),
+            })
+
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
-        "total_users": total_users,
-        "total_orders": total_orders,
-        "total_revenue": total_revenue,
-        "recent_orders": recent_orders
+        "totals": totals,
+        "series": series,
+        "days": days,
+        "max_revenue": max((m.revenue for m in series), default=0),
+        "max_orders": max((m.orders for m in series), default=0),
+        "recent_orders": recent_orders,
+        "tts_cache_hits": counters.get(f"{TTS_CACHE_METRIC_PREFIX}.hit", 0),
+        "tts_cache_hit_rate": metrics.hit_rate(counters, TTS_CACHE_METRIC_PREFIX),
+        "reaped_requeued": counters.get(f"{REAPER_METRIC_PREFIX}.requeued", 0),
+        "reaped_failed": counters.get(f"{REAPER_METRIC_PREFIX}.failed", 0),
+        "db_pools": db_pools,
     })
 
 @router.get("/products")
@@ -96,25 +133,35 @@ async def providers_list(
             "model": cfg.model if cfg else "Не выбрана",
             "models_cache": cfg.models_cache if cfg and cfg.models_cache else [],
             "status": cfg.status if cfg else "unknown",
-            "api_key_set": bool(cfg and cfg.api_key_encrypted)
+            "api_key_set": bool(cfg and cfg.api_key_encrypted),
+            "rate_limit_rpm": cfg.rate_limit_rpm if cfg else None,
+            "rate_limit_burst": cfg.rate_limit_burst if cfg else None,
+            "max_concurrency": cfg.max_concurrency if cfg else None,
+            "routing_mode": cfg.routing_mode if cfg else RoutingMode.MANUAL,
         }
 
-    # Allowed providers matrix
-    ALLOWED_PROVIDERS = {
-        StageType.POEM: [ProviderKind.YANDEX_GPT, ProviderKind.GEMINI, ProviderKind.OPENAI],
-        StageType.VOICE: [ProviderKind.SPEECHKIT],
-        StageType.SONG: [ProviderKind.SUNO],
-        StageType.CLIP: [ProviderKind.PIKA]
-    }
-
     # History of keys (from api_keys table)
-    api_keys_result = await session.execute(select(APIKey).order_by(APIKey.created_at.desc()))
+    # Включённые ключи — все, выключенные — только последние API_KEYS_HISTORY_LIMIT
+    active_keys = (await session.execute(
+        select(APIKey).where(APIKey.is_active.is_(True)).order_by(APIKey.created_at.desc())
+    )).scalars().all()
+    inactive_keys = (await session.execute(
+        select(APIKey)
+        .where(APIKey.is_active.is_not(True))
+        .order_by(APIKey.created_at.desc())
+        .limit(API_KEYS_HISTORY_LIMIT + 1)
+    )).scalars().all()
+    api_keys_truncated = len(inactive_keys) > API_KEYS_HISTORY_LIMIT
     api_keys_ui = []
-    for key in api_keys_result.scalars().all():
+    now = datetime.now(timezone.utc)
+    for key in [*active_keys, *inactive_keys[:API_KEYS_HISTORY_LIMIT]]:
+        # Пауза после 429 заканчивается сама, без записи в БД
+        cooling = key.status == "limit_exceeded" and key.cooldown_until and key.cooldown_until > now
         api_keys_ui.append({
             "id": str(key.id),
             "masked": f"{key.key_value[:4]}****{key.key_value[-4:]}" if len(key.key_value) > 8 else "****",
-            "status": key.status,
+            "status": key.status if cooling or key.status != "limit_exceeded" else "active",
+            "cooldown_until": key.cooldown_until.strftime("%H:%M:%S") if cooling else None,
             "is_active": key.is_active,
             "created_at": key.created_at.strftime("%Y-%m-%d %H:%M")
         })
@@ -124,19 +171,160 @@ async def providers_list(
         "configs": ui_configs,
         "allowed_providers": ALLOWED_PROVIDERS,
         "api_keys": api_keys_ui,
+        "api_keys_truncated": api_keys_truncated,
+        "routing_modes": list(RoutingMode),
+        "routing_stats": await adaptive_router.snapshot(StageType.POEM),
         "StageType": StageType
     })
 
+@router.get("/providers/analytics")
+async def providers_analytics(
+    request: Request,
+    days: int = 7,
+    stage_type: str = "",
+    admin: str = Depends(get_admin_user),
+    session: AsyncSession = Depends(get_session)
+):
+    days = min(max(days, 1), 90)
+    try:
+        selected_type = StageType(stage_type) if stage_type else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Unknown stage type: {stage_type}")
+
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    repo = ProviderCallRepo(session)
+    return templates.TemplateResponse("provider_analytics.html", {
+        "request": request,
+        "rows": await repo.daily_stats(since, selected_type),
+        "recent_errors": await repo.recent_errors(since),
+        "days": days,
+        "stage_type": stage_type,
+        "stage_types": list(StageType),
+    })
+
+@router.post("/providers/keys/{key_id}/toggle")
+async def toggle_api_key(
+    request: Request,
+    key_id: UUID,
+    admin: str = Depends(get_admin_user),
+    session: AsyncSession = Depends(get_session)
+):
+    key = await session.get(APIKey, key_id)
+    if key:
+        key.is_active = not key.is_active
+        await session.commit()
+        await publish_config_invalidation()
+    return redirect_back(request, "/admin/providers")
+
+def _parse_form_datetime(value: str) -> Optional[datetime]:
+    # datetime-local из формы; время в админке показывается в UTC
+    if not value:
+        return None
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+def _parse_form_limit(value: str, name: str) -> Optional[int]:
+    # Пустое поле — без ограничения
+    if not value.strip():
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+    if limit < 1:
+        raise ValueError(f"{name} must be positive")
+    return limit
+
 @router.get("/orders")
 async def orders_list(
     request: Request,
+    status: str = "",
+    stage_type: str = "",
+    created_from: str = "",
+    created_to: str = "",
+    user: str = "",
+    after: str = "",
+    before: str = "",
     admin: str = Depends(get_admin_user),
     session: AsyncSession = Depends(get_session)
 ):
-    orders = (await session.execute(
-        select(Order).order_by(Order.created_at.desc())
-    )).scalars().all()
-    return templates.TemplateResponse("orders.html", {"request": request, "orders": orders})
+    try:
+        order_filter = OrderFilter(
+            status=OrderStatus(status) if status else None,
+            stage_type=StageType(stage_type) if stage_type else None,
+            created_from=_parse_form_datetime(created_from),
+            created_to=_parse_form_datetime(created_to),
+            user=int(user) if user.strip() else None,
+        )
+        after_cursor = OrderCursor.decode(after) if after else None
+        before_cursor = OrderCursor.decode(before) if before else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {e}")
+
+    repo = OrderRepo(session)
+    page = await repo.page(order_filter, after=after_cursor, before=before_cursor, limit=ORDERS_PAGE_SIZE)
+    # Ссылки на соседние страницы сохраняют фильтры
+    base_url = request.url.remove_query_params(["after", "before", "saved", "affected"])
+    return templates.TemplateResponse("orders.html", {
+        "request": request,
+        "orders": page.orders,
+        "newer_url": str(base_url.include_query_params(before=page.newer.encode())) if page.newer else None,
+        "older_url": str(base_url.include_query_params(after=page.older.encode())) if page.older else None,
+        "first_url": str(base_url) if after or before else None,
+        "estimated_total": await repo.estimate_count(order_filter),
+        "filters": {
+            "status": status,
+            "stage_type": stage_type,
+            "created_from": created_from,
+            "created_to": created_to,
+            "user": user,
+        },
+        "order_statuses": list(OrderStatus),
+        "stage_statuses": list(OrderStageStatus),
+        "stage_types": list(StageType),
+        "provider_kinds": list(ProviderKind),
+        "affected": request.query_params.get("affected"),
+    })
+
+@router.post("/stages/bulk")
+async def bulk_stages(
+    request: Request,
+    action: str = Form(...),
+    statuses: List[str] = Form([]),
+    stage_type: str = Form(""),
+    provider_kind: str = Form(""),
+    created_from: str = Form(""),
+    created_to: str = Form(""),
+    admin: str = Depends(get_admin_user),
+    session: AsyncSession = Depends(get_session)
+):
+    try:
+        stage_filter = StageFilter(
+            statuses=[OrderStageStatus(s) for s in statuses],
+            stage_types=[StageType(stage_type)] if stage_type else [],
+            created_from=_parse_form_datetime(created_from),
+            created_to=_parse_form_datetime(created_to),
+            provider_kind=ProviderKind(provider_kind) if provider_kind else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {e}")
+    if not stage_filter.conditions():
+        # Операция без фильтра затронула бы все этапы — почти наверняка это ошибка
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+
+    stage_repo = StageRepo(session)
+    if action == "requeue":
+        # Этапы ставятся в фоновую полосу планировщика, которая выдаёт их по капле
+        stage_ids = await stage_repo.bulk_requeue(stage_filter, list(STAGE_TASK_NAMES))
+        await OutboxRepo(session).add_stage_enqueue_bulk(stage_ids, SchedulingLane.BULK)
+        affected = len(stage_ids)
+    elif action == "cancel":
+        affected = await stage_repo.bulk_cancel(stage_filter)
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown action: {action}")
+    await session.commit()
+
+    url = URL("/admin/orders").include_query_params(saved="1", affected=affected)
+    return RedirectResponse(url=str(url), status_code=303)
 
 @router.get("/orders/{order_id}")
 async def order_detail(
@@ -163,9 +351,16 @@ async def requeue_stage(
 ):
     stage = await session.get(OrderStage, stage_id)
     if stage:
-        stage.status = OrderStageStatus.PENDING
+        if stage.stage_type not in STAGE_TASK_NAMES:
+            stage.status = OrderStageStatus.PENDING
+            await session.commit()
+            return redirect_back(request, "/admin/orders")
+
+        # Тот же путь, что и у массового перезапуска: проверка статуса, сброс аренды и ошибки.
+        # Перезапуски идут в фоновой полосе и не задерживают оплаченные заказы
+        stage_ids = await StageRepo(session).bulk_requeue(StageFilter(stage_ids=[stage_id]), list(STAGE_TASK_NAMES))
+        await OutboxRepo(session).add_stage_enqueue_bulk(stage_ids, SchedulingLane.BULK)
         await session.commit()
-        # В реальной системе здесь бы вызывался enqueue_stage_job_uc
     return redirect_back(request, "/admin/orders")
 
 @router.post("/stages/{stage_id}/cancel")
@@ -175,10 +370,8 @@ async def cancel_stage(
     admin: str = Depends(get_admin_user),
     session: AsyncSession = Depends(get_session)
 ):
-    stage = await session.get(OrderStage, stage_id)
-    if stage:
-        stage.status = OrderStageStatus.CANCELLED
-        await session.commit()
+    await StageRepo(session).bulk_cancel(StageFilter(stage_ids=[stage_id]))
+    await session.commit()
     return redirect_back(request, "/admin/orders")
 
 @router.post("/products/update")
@@ -199,6 +392,7 @@ async def update_product(
             "enabled": enabled
         }
         await session.commit()
+        await publish_config_invalidation()
     return redirect_back(request, "/admin/products")
 
 @router.post("/providers/update")
@@ -208,11 +402,24 @@ async def update_provider(
     kind: ProviderKind = Form(...),
     api_key: str = Form(None),
     model: str = Form(None),
+    rate_limit_rpm: str = Form(""),
+    rate_limit_burst: str = Form(""),
+    max_concurrency: str = Form(""),
+    routing_mode: RoutingMode = Form(RoutingMode.MANUAL),
     admin: str = Depends(get_admin_user),
     session: AsyncSession = Depends(get_session)
 ):
     import logging
     logger = logging.getLogger(__name__)
+
+    try:
+        limits = {
+            "rate_limit_rpm": _parse_form_limit(rate_limit_rpm, "rate_limit_rpm"),
+            "rate_limit_burst": _parse_form_limit(rate_limit_burst, "rate_limit_burst"),
+            "max_concurrency": _parse_form_limit(max_concurrency, "max_concurrency"),
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid provider limits: {e}")
     
     # 1. Get or create config for this StageType
     cfg = await session.scalar(select(ProviderConfig).where(ProviderConfig.stage_type == stage_type))
@@ -226,27 +433,44 @@ async def update_provider(
         session.add(cfg)
         # Flush to get the ID for new config before using it in APIKey
         await session.flush()
-    else:
+    elif cfg.provider_kind != kind:
+        # Ключи прежнего провайдера новому не подходят: в ротации они давали бы 401
+        await session.execute(
+            sa.update(APIKey)
+            .where(APIKey.provider_id == cfg.id, APIKey.is_active.is_(True))
+            .values(is_active=False)
+        )
+        cfg.api_key_encrypted = None
         cfg.provider_kind = kind
 
+    # Квота провайдера: пустое поле — без ограничения
+    cfg.rate_limit_rpm = limits["rate_limit_rpm"]
+    cfg.rate_limit_burst = limits["rate_limit_burst"]
+    cfg.max_concurrency = limits["max_concurrency"]
+    cfg.routing_mode = routing_mode
+
     # 2. Update API Key if provided
     if api_key:
         cfg.api_key_encrypted = encryption_service.encrypt(api_key)
         
-        # Deactivate previous keys in history for this provider config
-        if cfg.id:
-            await session.execute(
-                sa.update(APIKey).where(APIKey.provider_id == cfg.id).values(is_active=False)
-            )
-
-        # Also save to history
-        new_history_key = APIKey(
-            provider_id=cfg.id,
-            key_value=api_key,
-            is_active=True,
-            status="active"
+        # Предыдущие ключи того же провайдера остаются активными: воркер распределяет запросы
+        # по всем активным ключам, лишние отключаются в истории ключей
+
+        # Also save to history; повторно введённый ключ включается заново, а не дублируется
+        history_key = await session.scalar(
+            select(APIKey).where(APIKey.provider_id == cfg.id, APIKey.key_value == api_key)
         )
-        session.add(new_history_key)
+        if history_key:
+            history_key.is_active = True
+            history_key.status = "active"
+            history_key.cooldown_until = None
+        else:
+            session.add(APIKey(
+                provider_id=cfg.id,
+                key_value=api_key,
+                is_active=True,
+                status="active"
+            ))
 
     # 3. Fetch models if key is present (or was just updated)
     current_key = api_key
@@ -255,20 +479,9 @@ async def update_provider(
 
     if current_key:
         try:
-            from app.infra.ai.gemini import GeminiProvider
-            from app.infra.ai.yandex_gpt import YandexGPTProvider
-            from app.infra.ai.openai import OpenAIProvider
-            from app.infra.ai.speechkit import SpeechKitProvider
-            
-            provider_inst = None
-            if kind == ProviderKind.GEMINI:
-                provider_inst = GeminiProvider(api_key=current_key)
-            elif kind == ProviderKind.YANDEX_GPT:
-                provider_inst = YandexGPTProvider(api_key=current_key)
-            elif kind == ProviderKind.OPENAI:
-                provider_inst = OpenAIProvider(api_key=current_key)
-            elif kind == ProviderKind.SPEECHKIT:
-                provider_inst = SpeechKitProvider(api_key=current_key)
+            from app.infra.ai.registry import PROVIDER_FACTORIES, get_provider
+
+            provider_inst = get_provider(kind, api_key=current_key) if kind in PROVIDER_FACTORIES else None
             
             if provider_inst and hasattr(provider_inst, 'list_models'):
                 models = await provider_inst.list_models()
@@ -290,4 +503,5 @@ async def update_provider(
         cfg.model = model
 
     await session.commit()
+    await publish_config_invalidation()
     return redirect_back(request, "/admin/providers")
\ No newline at end of file
@@ -64,6 +64,61 @@ ORDER = {
     "result_pending": "Результат появится после завершения этапа.",
 }
 
+ORDERS = {
+    "title": "Список заказов",
+    "status": "Статус заказа",
+    "stage_type": "Есть этап",
+    "created_from": "Создан с (UTC)",
+    "created_to": "Создан до (UTC)",
+    "user": "Пользователь",
+    "user_placeholder": "ID или Telegram ID",
+    "any": "Любой",
+    "apply": "Показать",
+    "reset": "Сбросить",
+    "estimated": "Найдено примерно: {count}",
+    "empty": "Заказов по фильтру нет.",
+    "newer": "← Новее",
+    "older": "Старее →",
+    "first": "К началу",
+}
+
+BULK = {
+    "title": "Массовые операции с этапами",
+    "subtitle": "Выберите этапы фильтром. Перезапущенные этапы выдаются воркерам постепенно, чтобы не перегрузить провайдера.",
+    "statuses": "Статусы этапа",
+    "stage_type": "Тип этапа",
+    "provider": "Провайдер",
+    "created_from": "Создан с (UTC)",
+    "created_to": "Создан до (UTC)",
+    "any": "Любой",
+    "requeue": "Перезапустить",
+    "cancel": "Отменить",
+    "affected": "Затронуто этапов: {count}",
+}
+
+ANALYTICS = {
+    "title": "Аналитика провайдеров",
+    "subtitle": "Задержки, ошибки и расход токенов по провайдерам и моделям за день (UTC). Перцентили — по успешным запросам.",
+    "period": "Период, дней",
+    "stage_type": "Тип этапа",
+    "any": "Любой",
+    "apply": "Показать",
+    "day": "День",
+    "provider": "Провайдер",
+    "model": "Модель",
+    "calls": "Запросов",
+    "error_rate": "Ошибки",
+    "cancelled": "Отменено",
+    "cancelled_helper": "Проигравшие попытки хеджирования",
+    "first_chunk": "До 1-го фрагмента p50",
+    "tokens": "Токены (вход / выход)",
+    "bytes": "Объём ответа",
+    "empty": "За выбранный период запросов к провайдерам не было.",
+    "errors_title": "Последние ошибки",
+    "error": "Ошибка",
+    "time": "Время",
+}
+
 STATUS_LABELS = {
     "stage": {
         "pending": "В ожидании",
@@ -81,11 +136,13 @@ STATUS_LABELS = {
     },
     "order": {
         "new": "Новый",
+        "pending": "Ожидает оплату",
         "paid": "Оплачен",
         "in_progress": "В обработке",
         "completed": "Завершён",
         "failed": "Ошибка",
         "canceled": "Отменён",
+        "cancelled": "Отменён",
         "waiting_payment": "Ожидает оплату",
     },
     "key": {
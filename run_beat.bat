@@ -0,0 +1,6 @@
+@echo off
+set PYTHONPATH=.
+echo Starting Celery Beat...
+echo Run exactly one beat, otherwise periodic tasks are sent twice.
+celery -A app.infra.queue.celery_app beat --loglevel=info
+pause
@@ -1,4 +1,5 @@
 @echo off
 set PYTHONPATH=.
+set DB_ROLE=bot
 python -m app.bot.main
 pause
\ No newline at end of file
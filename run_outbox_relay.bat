@@ -0,0 +1,6 @@
+@echo off
+set PYTHONPATH=.
+echo Starting outbox relay...
+echo Make sure Postgres and Redis are running!
+python -m app.infra.queue.outbox
+pause
\ No newline at end of file
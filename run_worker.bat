@@ -2,5 +2,5 @@
 set PYTHONPATH=.
 echo Starting Celery Worker...
 echo Make sure Redis is running! (e.g. via docker-compose up -d redis)
-celery -A app.infra.queue.celery_app worker --loglevel=info --pool=solo
+python -m app.infra.queue.worker --profile all --pool solo
 pause
\ No newline at end of file
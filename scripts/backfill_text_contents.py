@@ -0,0 +1,39 @@
+"""
+Перенос текстов стихов из artifacts.storage_key в text_contents.
+
+    python -m scripts.backfill_text_contents [--batch-size 500] [--pause 0.2]
+
+Работает на живой базе: каждая пачка — короткая транзакция, блокирующая только
+свои строки (занятые другими транзакциями пропускаются до следующего запуска).
+Прерванный перенос можно запустить заново — он продолжит с непереносённых строк.
+Пока перенос идёт, код читает тексты из обоих мест (ArtifactRepo.get_text).
+"""
+import argparse
+import asyncio
+
+from app.infra.db.repositories.artifact_repo import ArtifactRepo
+from app.infra.db.session import async_session_factory
+
+
+async def backfill(batch_size: int, pause: float) -> None:
+    after = None
+    total = 0
+    while True:
+        async with async_session_factory() as session:
+            after, moved = await ArtifactRepo(session).backfill_text_batch(after, batch_size)
+            await session.commit()
+        if after is None:
+            break
+        total += moved
+        print(f"Moved {total} texts, last artifact {after}")
+        # Пауза между пачками оставляет место рабочей нагрузке и репликации
+        await asyncio.sleep(pause)
+    print(f"Done, moved {total} texts")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500, help="артефактов в одной транзакции")
+    parser.add_argument("--pause", type=float, default=0.2, help="пауза между пачками, сек")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.batch_size, args.pause))
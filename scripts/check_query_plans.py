@@ -0,0 +1,250 @@
+"""
+Проверка планов горячих запросов репозиториев.
+
+Создаёт отдельную схему, заполняет её большим набором данных, выполняет запросы
+репозиториев и прогоняет каждый выданный ими SQL через EXPLAIN. Проверка падает,
+если запрос планируется последовательным сканированием большой таблицы, —
+значит, для него нет подходящего индекса.
+
+    python -m scripts.check_query_plans [--rows 200000] [--keep]
+
+Нужна база PostgreSQL (FINAL_DATABASE_URL, драйвер asyncpg) с правом создавать схемы.
+Рабочие таблицы не затрагиваются: всё происходит в схеме plan_check, которая
+удаляется по окончании (--keep оставляет её для ручного разбора).
+"""
+import argparse
+import asyncio
+import json
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from hashlib import md5
+from typing import Awaitable, Callable, Dict, List, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.domain.enums import OrderStageStatus, OrderStatus, PaymentStatus, StageType
+from app.infra.config.settings import settings
+from app.infra.db.base import Base
+from app.infra.db.models import Artifact, Payment
+from app.infra.db.repositories.artifact_repo import ArtifactRepo
+from app.infra.db.repositories.config_repo import ConfigRepo
+from app.infra.db.repositories.order_repo import OrderCursor, OrderFilter, OrderRepo
+from app.infra.db.repositories.outbox_repo import OutboxRepo
+from app.infra.db.repositories.payment_repo import PaymentRepo
+from app.infra.db.repositories.stage_repo import StageRepo
+from app.infra.db.repositories.user_repo import UserRepo
+
+SCHEMA = "plan_check"
+
+# Таблицы меньше этого числа строк планировщик честно читает целиком — это не ошибка
+SMALL_TABLE_ROWS = 1000
+
+# Данные генерируются на стороне сервера. На заказ — два этапа, текстовый артефакт
+# и платёж; почти все этапы завершены, как в рабочей базе.
+SEED_SQL = [
+    """
+    INSERT INTO users (id, telegram_id, username, created_at)
+    SELECT g, 1000000 + g, 'user' || g, now() - g * interval '1 minute'
+    FROM generate_series(1, :users) g
+    """,
+    """
+    INSERT INTO orders (id, user_id, status, context_json, current_stage, created_at)
+    SELECT md5('o' || g)::uuid, 1 + g % :users, 'paid', '{}', 'poem', now() - g * interval '10 seconds'
+    FROM generate_series(1, :orders) g
+    """,
+    """
+    INSERT INTO order_stages (id, order_id, stage_type, status, price, input_json, attempts, created_at, updated_at)
+    SELECT md5('s' || g)::uuid, md5('o' || (g + 1) / 2)::uuid,
+           CASE WHEN g % 2 = 1 THEN 'poem' ELSE 'voice' END,
+           CASE g % 200 WHEN 0 THEN 'processing' WHEN 1 THEN 'queued' WHEN 2 THEN 'paid'
+                        WHEN 3 THEN 'failed' ELSE 'completed' END,
+           100, '{}', 1, now() - g * interval '5 seconds', now() - g * interval '5 seconds'
+    FROM generate_series(1, :orders * 2) g
+    """,
+    """
+    INSERT INTO artifacts (id, order_id, stage_id, type, storage_key, created_at)
+    SELECT md5('a' || g)::uuid, md5('o' || g)::uuid, md5('s' || (2 * g - 1))::uuid,
+           'text', 'poems/' || g || '.txt', now() - g * interval '10 seconds'
+    FROM generate_series(1, :orders) g
+    """,
+    """
+    INSERT INTO payments (id, order_id, stage_id, yookassa_payment_id, status, amount, currency, created_at)
+    SELECT md5('p' || g)::uuid, md5('o' || g)::uuid, md5('s' || (2 * g - 1))::uuid, 'yk-' || g,
+           CASE WHEN g % 20 = 0 THEN 'canceled' ELSE 'succeeded' END, 100, 'RUB', now() - g * interval '10 seconds'
+    FROM generate_series(1, :orders) g
+    """,
+    """
+    INSERT INTO outbox (topic, payload, attempts, created_at, dispatched_at)
+    SELECT 'stage.enqueue', '{}', 0, now() - g * interval '1 second',
+           CASE WHEN g > 10 THEN now() - g * interval '1 second' END
+    FROM generate_series(1, :orders) g
+    """,
+    """
+    INSERT INTO provider_configs (stage_type, provider_kind, status, routing_mode, config_json, is_active)
+    VALUES ('poem', 'gemini', 'active', 'manual', '{}', true), ('voice', 'speechkit', 'active', 'manual', '{}', true)
+    """,
+]
+
+
+def _uuid(prefix: str, n: int) -> UUID:
+    # Тот же идентификатор, что md5(prefix || n)::uuid в SEED_SQL
+    return UUID(md5(f"{prefix}{n}".encode()).hexdigest())
+
+
+@dataclass
+class Check:
+    name: str
+    run: Callable[[AsyncSession], Awaitable[object]]
+    statements: List[Tuple[str, object]] = field(default_factory=list)
+
+
+def build_checks(orders: int) -> List[Check]:
+    order_id = _uuid("o", orders // 2)
+    stage_id = _uuid("s", orders - 1)
+    # Курсор из середины списка: глубокие страницы должны читаться так же, как первая
+    cursor = OrderCursor(datetime.now(timezone.utc) - timedelta(seconds=5 * orders), order_id)
+    return [
+        Check("UserRepo.get_by_telegram_id", lambda s: UserRepo(s).get_by_telegram_id(1000042)),
+        Check("OrderRepo.get_user_orders", lambda s: OrderRepo(s).get_user_orders(42)),
+        Check("OrderRepo.get_order_with_artifacts", lambda s: OrderRepo(s).get_order_with_artifacts(order_id)),
+        Check("OrderRepo.page", lambda s: OrderRepo(s).page(OrderFilter(), after=cursor)),
+        Check("OrderRepo.page (newer)", lambda s: OrderRepo(s).page(OrderFilter(), before=cursor)),
+        Check(
+            "OrderRepo.page (status)",
+            lambda s: OrderRepo(s).page(OrderFilter(status=OrderStatus.CANCELLED), after=cursor),
+        ),
+        Check("OrderRepo.page (user)", lambda s: OrderRepo(s).page(OrderFilter(user=1000042))),
+        Check(
+            "OrderRepo.page (stage type)",
+            lambda s: OrderRepo(s).page(OrderFilter(stage_type=StageType.VOICE), after=cursor),
+        ),
+        Check("ArtifactRepo.get_latest_text_artifact", lambda s: ArtifactRepo(s).get_latest_text_artifact(order_id)),
+        Check(
+            "artifacts by stage",
+            lambda s: s.execute(select(Artifact).where(Artifact.stage_id == stage_id)),
+        ),
+        Check("PaymentRepo.get_by_yookassa_id", lambda s: PaymentRepo(s).get_by_yookassa_id(f"yk-{orders // 3}")),
+        Check(
+            "payments by order and status",
+            lambda s: s.execute(
+                select(Payment).where(Payment.order_id == order_id, Payment.status == PaymentStatus.SUCCEEDED)
+            ),
+        ),
+        Check("StageRepo.get_by_id", lambda s: StageRepo(s).get_by_id(stage_id)),
+        Check("StageRepo.claim", lambda s: StageRepo(s).claim(stage_id, "plan-check", 60)),
+        Check(
+            "StageRepo.release_claim",
+            lambda s: StageRepo(s).release_claim(stage_id, "plan-check", OrderStageStatus.COMPLETED),
+        ),
+        Check("StageRepo.fail_stuck", lambda s: StageRepo(s).fail_stuck(3, timedelta(hours=1), "plan check")),
+        Check("StageRepo.requeue_stuck", lambda s: StageRepo(s).requeue_stuck(3, timedelta(hours=1), "plan check")),
+        Check(
+            "StageRepo.touch_waiting",
+            lambda s: StageRepo(s).touch_waiting([StageType.POEM, StageType.VOICE], timedelta(minutes=10)),
+        ),
+        Check("StageRepo.get_telegram_ids", lambda s: StageRepo(s).get_telegram_ids([stage_id])),
+        Check("OutboxRepo.claim_batch", lambda s: OutboxRepo(s).claim_batch(100, 10)),
+        Check("ConfigRepo.get_provider_config", lambda s: ConfigRepo(s).get_provider_config(StageType.POEM)),
+    ]
+
+
+def seq_scans(plan: dict) -> List[str]:
+    """
+    Таблицы, которые план читает последовательным сканированием.
+    """
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def seed(session: AsyncSession, rows: int) -> None:
+    params = {"orders": rows, "users": max(rows // 5, 1)}
+    for sql in SEED_SQL:
+        await session.execute(text(sql), {k: v for k, v in params.items() if f":{k}" in sql})
+    await session.execute(text("ANALYZE"))
+    # Статистика ANALYZE транзакционна: без коммита планировщик её не увидит
+    await session.commit()
+
+
+async def table_sizes(session: AsyncSession) -> Dict[str, float]:
+    result = await session.execute(
+        text("SELECT relname, reltuples FROM pg_class WHERE relnamespace = CAST(:schema AS regnamespace)"),
+        {"schema": SCHEMA},
+    )
+    return {name: tuples for name, tuples in result.all()}
+
+
+async def main(rows: int, keep: bool) -> int:
+    engine = create_async_engine(
+        settings.FINAL_DATABASE_URL,
+        connect_args={"server_settings": {"search_path": SCHEMA}},
+        # Один коннект: все перехваченные запросы идут через него
+        pool_size=1,
+        max_overflow=0,
+    )
+    checks = build_checks(rows)
+    current: List[Check] = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if current and not statement.lstrip().upper().startswith("EXPLAIN"):
+            current[0].statements.append((statement, parameters))
+
+    failed = False
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+            await conn.run_sync(Base.metadata.create_all)
+
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with session_factory() as session:
+            print(f"Seeding {rows} orders into schema {SCHEMA}...")
+            await seed(session, rows)
+            sizes = await table_sizes(session)
+
+            for check in checks:
+                current[:] = [check]
+                await check.run(session)
+                current.clear()
+                await session.rollback()
+
+                problems = []
+                conn = await session.connection()
+                for statement, parameters in check.statements:
+                    result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                    plan = result.scalar()
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    big = [t for t in seq_scans(plan[0]["Plan"]) if sizes.get(t, 0) >= SMALL_TABLE_ROWS]
+                    if big:
+                        problems.append(f"Seq Scan on {', '.join(big)}: {' '.join(statement.split())}")
+                if problems:
+                    failed = True
+                    print(f"FAIL {check.name}")
+                    for problem in problems:
+                        print(f"     {problem}")
+                else:
+                    print(f"ok   {check.name} ({len(check.statements)} queries)")
+                await session.rollback()
+    finally:
+        if not keep:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000, help="число заказов в тестовых данных")
+    parser.add_argument("--keep", action="store_true", help="не удалять схему plan_check")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.rows, args.keep)))
@@ -11,6 +11,7 @@ from app.infra.db.models import User, ProductConfig, Order, OrderStage, Payment
 from app.infra.db.repositories.order_repo import OrderRepo
 from app.infra.db.repositories.stage_repo import StageRepo
 from app.infra.db.repositories.config_repo import ConfigRepo
+from app.infra.cache.config_snapshot import ConfigSnapshot
 from app.infra.db.repositories.payment_repo import PaymentRepo
 from app.application.use_cases.create_order import CreateOrderUseCase
 from app.application.use_cases.start_payment import StartPaymentUseCase
@@ -43,8 +44,10 @@ async def verify():
         stage_repo = StageRepo(session)
         config_repo = ConfigRepo(session)
         
-        # Мокаем get_product_config чтобы он вернул наш тестовый конфиг
-        config_repo.get_product_config = AsyncMock(return_value=poem_config)
+        # Мокаем снимок конфигурации чтобы он вернул наш тестовый конфиг
+        config_repo.get_snapshot = AsyncMock(
+            return_value=ConfigSnapshot(version=0, loaded_at=0, products={"poem": poem_config.value_json})
+        )
         
         uc_create = CreateOrderUseCase(order_repo, stage_repo, config_repo)
         stage = await uc_create.execute(user_id=test_user.id, context={"theme": "test"})
@@ -0,0 +1,20 @@
+import os
+import sys
+
+# Корень проекта — в sys.path, как в test_acceptance_db.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Settings требует эти переменные при импорте; модульным тестам база, Redis и Telegram не нужны
+for name, value in {
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_DB": "test",
+    "POSTGRES_HOST": "localhost",
+    "REDIS_HOST": "localhost",
+    "BOT_TOKEN": "1:test",
+    "YOOKASSA_SHOP_ID": "test",
+    "YOOKASSA_SECRET_KEY": "test",
+    "ADMIN_PASSWORD": "test",
+    "ADMIN_SECRET_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,96 @@
+import pytest
+
+from app.infra.ai.audio import iter_synthesized_audio, split_text_for_tts
+
+# MPEG-1 Layer III, 128 кбит/с, 44.1 кГц, стерео, без CRC: фрейм 417 байт
+FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0x04])
+FRAME_LENGTH = 417
+
+
+def _frame(fill: int) -> bytes:
+    return FRAME_HEADER + bytes([fill]) * (FRAME_LENGTH - len(FRAME_HEADER))
+
+
+def _xing_frame() -> bytes:
+    # Служебный фрейм: "Xing" сразу после side info (32 байта для стерео MPEG-1)
+    body = bytes(32) + b"Xing"
+    return FRAME_HEADER + body + bytes(FRAME_LENGTH - len(FRAME_HEADER) - len(body))
+
+
+def _id3v2(payload: bytes) -> bytes:
+    size = len(payload)
+    synchsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3" + bytes([4, 0, 0]) + synchsafe + payload
+
+
+def _mp3_file(*frames: bytes) -> bytes:
+    id3v1 = b"TAG" + bytes(125)
+    return _id3v2(b"TIT2 poem") + _xing_frame() + b"".join(frames) + id3v1
+
+
+def test_short_text_is_one_chunk():
+    assert split_text_for_tts("Короткая строфа.", 100) == ["Короткая строфа."]
+
+
+def test_split_by_stanzas():
+    text = "Первая строфа,\nвторая строка.\n\n\nВторая строфа."
+
+    assert split_text_for_tts(text, 100) == ["Первая строфа,\nвторая строка.", "Вторая строфа."]
+
+
+def test_long_stanza_is_split_by_sentences_within_limit():
+    stanza = "Раз два три. Четыре пять шесть! Семь восемь девять? Десять."
+
+    chunks = split_text_for_tts(stanza, 30)
+
+    assert all(len(chunk) <= 30 for chunk in chunks)
+    assert " ".join(chunk.replace("\n", " ") for chunk in chunks) == stanza
+
+
+def test_sentence_longer_than_limit_is_cut_on_spaces():
+    chunks = split_text_for_tts("слово " * 20, 25)
+
+    assert all(len(chunk) <= 25 for chunk in chunks)
+    assert " ".join(chunks).split() == ["слово"] * 20
+
+
+class _FakeProvider:
+    provider_key = "fake"
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.calls = []
+
+    async def list_models(self):
+        return []
+
+    async def synthesize(self, text, params):
+        self.calls.append(text)
+        return self.parts[text]
+
+
+@pytest.mark.asyncio
+async def test_mp3_parts_are_stitched_as_frames_in_order():
+    provider = _FakeProvider({
+        "Первая строфа.": _mp3_file(_frame(1), _frame(2)),
+        "Вторая строфа.": _mp3_file(_frame(3)),
+    })
+
+    audio = b"".join([
+        part async for part in iter_synthesized_audio(
+            provider, "Первая строфа.\n\nВторая строфа.", {"format": "mp3"}, max_chars=100, max_concurrency=2
+        )
+    ])
+
+    # Теги и фреймы Xing сняты, аудиофреймы обоих кусков идут подряд
+    assert audio == _frame(1) + _frame(2) + _frame(3)
+
+
+@pytest.mark.asyncio
+async def test_single_chunk_is_passed_through():
+    original = _mp3_file(_frame(1))
+    provider = _FakeProvider({"Одна строфа.": original})
+
+    parts = [part async for part in iter_synthesized_audio(provider, "Одна строфа.", {"format": "mp3"})]
+
+    assert parts == [original]
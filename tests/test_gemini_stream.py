@@ -0,0 +1,31 @@
+import pytest
+
+from app.infra.ai.gemini import GeminiProvider
+
+POEM = "```html\n<blockquote>Мороз и солнце; день чудесный!</blockquote>\n```"
+
+
+def _stream(chunks):
+    # Повторяет stream_poem: наружу уходит прирост очищенного накопленного текста
+    raw, sent, out = "", "", []
+    for chunk in chunks:
+        raw += chunk
+        text = GeminiProvider._clean_stable(raw)
+        assert text.startswith(sent)
+        out.append(text[len(sent):])
+        sent = text
+    out.append(GeminiProvider._clean(raw)[len(sent):])
+    return "".join(out)
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8, len(POEM)])
+def test_markup_split_between_chunks_is_removed(size):
+    chunks = [POEM[i:i + size] for i in range(0, len(POEM), size)]
+
+    assert _stream(chunks) == GeminiProvider._clean(POEM)
+    assert "`" not in _stream(chunks)
+    assert "blockquote" not in _stream(chunks)
+
+
+def test_plain_text_is_not_held_back():
+    assert GeminiProvider._clean_stable("Мороз и солнце") == "Мороз и солнце"
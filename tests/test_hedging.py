@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from app.infra.ai.hedging import HedgeAttempt, LatencyTracker, run_hedged
+
+
+def test_percentile_over_window():
+    tracker = LatencyTracker(window=100)
+    for value in range(1, 101):
+        tracker.record("gemini", float(value))
+
+    assert tracker.percentile("gemini", 0.5) == 51
+    assert tracker.percentile("gemini", 0.9) == 91
+    assert tracker.percentile("gemini", 1.0) == 100
+    assert tracker.percentile("openai", 0.9) is None
+    assert tracker.percentile("gemini", 0.9, min_samples=101) is None
+
+
+def test_percentile_keeps_only_the_last_window():
+    tracker = LatencyTracker(window=3)
+    for value in [100.0, 1.0, 2.0, 3.0]:
+        tracker.record("gemini", value)
+
+    assert tracker.percentile("gemini", 1.0) == 3.0
+
+
+def _attempt(label: str, delay: float, cancelled: list, fail: bool = False) -> HedgeAttempt:
+    async def factory(commit):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(label)
+            raise
+        if fail:
+            raise RuntimeError(f"{label} failed")
+        return label.upper()
+
+    return HedgeAttempt(label, factory)
+
+
+@pytest.mark.asyncio
+async def test_fastest_hedge_wins_and_the_slow_attempt_is_cancelled():
+    cancelled = []
+    tracker = LatencyTracker()
+
+    label, result = await run_hedged(
+        [_attempt("slow", 1.0, cancelled), _attempt("fast", 0.01, cancelled)], hedge_delay=0.05, tracker=tracker
+    )
+
+    assert (label, result) == ("fast", "FAST")
+    # Проигравшая попытка отменена; отмена обрабатывается на следующем шаге loop'а
+    await asyncio.sleep(0)
+    assert cancelled == ["slow"]
+    assert tracker.percentile("fast", 0.5) is not None
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_when_first_attempt_is_fast():
+    cancelled = []
+    started = []
+
+    async def second(commit):
+        started.append("second")
+        return "SECOND"
+
+    label, _ = await run_hedged(
+        [_attempt("first", 0.01, cancelled), HedgeAttempt("second", second)], hedge_delay=0.5
+    )
+
+    assert label == "first"
+    assert started == []
+
+
+@pytest.mark.asyncio
+async def test_commit_cancels_others_before_the_winner_finishes():
+    cancelled = []
+    committed = asyncio.Event()
+
+    async def streaming(commit):
+        await asyncio.sleep(0.01)
+        assert commit()
+        committed.set()
+        await asyncio.sleep(0.05)
+        return "STREAMED"
+
+    label, result = await run_hedged(
+        [_attempt("slow", 1.0, cancelled), HedgeAttempt("streaming", streaming)], hedge_delay=0.01
+    )
+
+    assert (label, result) == ("streaming", "STREAMED")
+    assert committed.is_set()
+    assert cancelled == ["slow"]
+
+
+@pytest.mark.asyncio
+async def test_failed_attempt_yields_to_the_next_one():
+    cancelled = []
+
+    label, _ = await run_hedged(
+        [_attempt("broken", 0.0, cancelled, fail=True), _attempt("backup", 0.01, cancelled)], hedge_delay=10
+    )
+
+    assert label == "backup"
+
+
+@pytest.mark.asyncio
+async def test_all_attempts_failed_raises_the_last_error():
+    cancelled = []
+
+    with pytest.raises(RuntimeError, match="second failed"):
+        await run_hedged(
+            [_attempt("first", 0.0, cancelled, fail=True), _attempt("second", 0.0, cancelled, fail=True)],
+            hedge_delay=10,
+        )
@@ -0,0 +1,28 @@
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+
+from app.infra.db.repositories.order_repo import OrderCursor
+
+
+def test_round_trip_keeps_microseconds_and_timezone():
+    cursor = OrderCursor(datetime(2026, 10, 17, 12, 30, 45, 123456, tzinfo=timezone.utc), uuid4())
+
+    assert OrderCursor.decode(cursor.encode()) == cursor
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "",
+        "garbage",
+        "2026-10-17T12:30:45+00:00",
+        "2026-10-17T12:30:45+00:00_not-a-uuid",
+        f"yesterday_{uuid4()}",
+    ],
+)
+def test_decode_rejects_bad_input(value):
+    # Админка превращает ValueError в ответ 400
+    with pytest.raises(ValueError):
+        OrderCursor.decode(value)
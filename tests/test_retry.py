@@ -0,0 +1,47 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.infra.ai.limiter import ProviderBusyError
+from app.infra.queue.retry import is_transient_error, retry_countdown
+
+
+def _status_error(status: int, headers: dict = None) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://provider.test/v1/generate")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"HTTP {status}", request=request, response=response)
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        _status_error(429),
+        _status_error(503),
+        httpx.ConnectError("connection refused"),
+        httpx.ReadTimeout("read timeout"),
+        asyncio.TimeoutError(),
+        ProviderBusyError(),
+    ],
+)
+def test_transient_errors(error):
+    assert is_transient_error(error)
+
+
+@pytest.mark.parametrize("error", [_status_error(400), _status_error(401), ValueError("no text")])
+def test_permanent_errors(error):
+    assert not is_transient_error(error)
+
+
+def test_countdown_grows_with_attempts_and_is_capped():
+    error = httpx.ConnectError("connection refused")
+    for attempt, ceiling in [(1, 10), (2, 20), (3, 40), (10, 120)]:
+        for _ in range(50):
+            delay = retry_countdown(attempt, error, base=10, max_delay=120)
+            assert ceiling / 2 <= delay <= ceiling
+
+
+def test_countdown_respects_retry_after_up_to_max_delay():
+    assert retry_countdown(1, _status_error(429, {"retry-after": "60"}), base=10, max_delay=120) == 60
+    assert retry_countdown(1, _status_error(429, {"retry-after": "600"}), base=10, max_delay=120) == 120
+    assert retry_countdown(1, _status_error(429, {"retry-after": "soon"}), base=10, max_delay=120) <= 10
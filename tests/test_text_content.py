@@ -0,0 +1,20 @@
+from app.infra.db.repositories.text_content_repo import content_hash, pack_text, text_storage_key, unpack_text
+
+POEM = "Мороз и солнце; день чудесный!\nЕщё ты дремлешь, друг прелестный —"
+
+
+def test_content_hash_is_stable_sha256():
+    assert content_hash(POEM) == content_hash(POEM)
+    assert len(content_hash(POEM)) == 64
+    assert content_hash(POEM) != content_hash(POEM + " ")
+
+
+def test_storage_key_fits_the_text_hash():
+    assert text_storage_key(content_hash(POEM)) == f"text:{content_hash(POEM)}"
+
+
+def test_pack_round_trip():
+    body = pack_text(POEM * 20)
+
+    assert unpack_text(body) == POEM * 20
+    assert len(body) < len((POEM * 20).encode("utf-8"))